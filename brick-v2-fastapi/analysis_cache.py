@@ -0,0 +1,134 @@
+import atexit
+import json
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+from rich import print
+
+# The tokens and root words analyze_and_add_roots produces for a string, kept in a
+# bounded LRU cache so the same reply or sentence isn't run through spaCy twice.
+# Entries expire after ANALYSIS_CACHE_TTL seconds (0 keeps them until evicted) and are
+# keyed on the text plus a version of everything the analysis depends on (the lookup
+# table and the spaCy model), so changing either starts from an empty cache.
+#
+# The cache can be saved to ANALYSIS_CACHE_FILE (empty turns that off) on shutdown and
+# is read back on the first lookup, so a restart comes up warm.
+
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "4096"))
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", str(7 * 24 * 60 * 60)))
+ANALYSIS_CACHE_FILE = os.getenv("ANALYSIS_CACHE_FILE", "analysis_cache.json")
+
+
+# analysis runs on the NFC form, so the same sentence typed with combining accents shares an entry
+def normalize_text(text: str) -> str:
+    return unicodedata.normalize("NFC", text)
+
+
+class AnalysisCache:
+    def __init__(self, max_size: int = ANALYSIS_CACHE_SIZE, ttl: float = ANALYSIS_CACHE_TTL, path: Optional[str] = ANALYSIS_CACHE_FILE):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path or None
+        self.version: Optional[str] = None
+
+        # (language, text) -> (stored at, token dicts), least recently used first
+        self._entries: OrderedDict[tuple[str, str], tuple[float, list[dict]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    # must be set before the first lookup, entries of other versions are dropped when loading
+    def set_version(self, version: str) -> None:
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self._entries.clear()
+                self._loaded = False
+
+    def load(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if self.path is None:
+                return
+            try:
+                with open(self.path, "r") as f:
+                    saved = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return
+            if saved.get("version") != self.version:
+                return
+            now = time.time()
+            for language, text, stored_at, token_dicts in saved["entries"][-self.max_size:]:
+                if not self._is_expired(stored_at, now):
+                    self._entries[(language, text)] = (stored_at, token_dicts)
+        print(f"[green]Loaded {len(self._entries)} cached sentence analyses[/green]")
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [[language, text, stored_at, token_dicts] for (language, text), (stored_at, token_dicts) in self._entries.items()]
+            self._dirty = False
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": self.version, "entries": entries}, f)
+        os.replace(tmp_path, self.path)
+
+    def _is_expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - stored_at > self.ttl
+
+    def get(self, text: str, language: str) -> Optional[list[dict]]:
+        self.load()
+        key = (language, text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_expired(entry[0], time.time()):
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, text: str, language: str, token_dicts: list[dict]) -> None:
+        if self.max_size <= 0:
+            return
+        self.load()
+        with self._lock:
+            self._entries[(language, text)] = (time.time(), token_dicts)
+            self._entries.move_to_end((language, text))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._dirty = True
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
+
+
+analysis_cache = AnalysisCache()
+atexit.register(analysis_cache.save)
@@ -0,0 +1,278 @@
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Optional, Union
+from dotenv import load_dotenv
+from fsrs import Card
+from rich import print
+
+load_dotenv()
+
+# Cards are stored per user as word -> Card.to_compact() lists; stores written before
+# that hold Card.to_dict() dicts, card_from_stored reads both. Which backend holds
+# them is picked with the CARD_STORE env var: "journal" (db.json + append-only
+# journal, the default) or "sqlite" (a local SQLite file, see SqliteCardStore).
+#
+# The journal backend keeps the learner state in a snapshot (db.json, user ->
+# {"words": {word -> stored card}}, with compact lists and older dicts side by side)
+# plus an append-only journal with one record per reviewed card. A review only
+# appends to the journal, so its cost grows with the number of words reviewed, not
+# with the vocabulary size. Every so often the journal is folded back into the snapshot in
+# a background thread.
+#
+# Recovery is snapshot + journal replay. Journal records hold the full card state
+# (not a delta), so replaying a record twice is harmless, and a torn last line from
+# a crash mid-append is simply skipped.
+
+CARD_STORE = os.getenv("CARD_STORE", "journal")
+DB_FILE = "db.json"
+JOURNAL_FILE = "db.journal.jsonl"
+SQLITE_DB_FILE = os.getenv("SQLITE_DB_FILE", "cards.db")
+# number of journal records after which a background compaction is started
+COMPACT_EVERY = 500
+DEFAULT_USER = "user"
+
+# a card as stored, see card_from_stored
+StoredCard = Union[list, dict]
+
+
+def card_from_stored(card: StoredCard) -> Card:
+    if isinstance(card, list):
+        return Card.from_compact(card)
+    return Card.from_dict(card)
+
+
+# the interface every card store backend implements
+class CardStore(ABC):
+    # all cards of a user as word -> stored card, in the order the words were first added
+    @abstractmethod
+    def load_words(self, user: str = DEFAULT_USER) -> dict[str, StoredCard]:
+        ...
+
+    def get_card(self, word: str, user: str = DEFAULT_USER) -> Optional[StoredCard]:
+        return self.load_words(user).get(word)
+
+    # the cards of the given words that exist, as word -> stored card
+    def get_cards(self, words: list[str], user: str = DEFAULT_USER) -> dict[str, StoredCard]:
+        words_data = self.load_words(user)
+        return {word: words_data[word] for word in words if word in words_data}
+
+    # the set of words the user has a card for
+    def words(self, user: str = DEFAULT_USER) -> set[str]:
+        return set(self.load_words(user))
+
+    def count(self, user: str = DEFAULT_USER) -> int:
+        return len(self.load_words(user))
+
+    # the n cards with the soonest due dates as (word, stored card) pairs, soonest first
+    def soonest_due(self, n: int, user: str = DEFAULT_USER) -> list[tuple[str, StoredCard]]:
+        words_data = self.load_words(user)
+        return sorted(words_data.items(), key=lambda x: _due_timestamp(x[1]))[:n]
+
+    # insert or replace the given cards
+    @abstractmethod
+    def put_cards(self, cards: dict[str, StoredCard], user: str = DEFAULT_USER) -> None:
+        ...
+
+
+def _due_timestamp(card: StoredCard) -> float:
+    if isinstance(card, list):
+        return card[0]
+    return datetime.fromisoformat(card["due"]).timestamp()
+
+
+class JournaledCardStore(CardStore):
+    def __init__(self, snapshot_path: str = DB_FILE, journal_path: str = JOURNAL_FILE, compact_every: int = COMPACT_EVERY):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        # the journal is rotated to this file while it is being compacted
+        self.compacting_path = journal_path + ".compacting"
+        self.compact_every = compact_every
+
+        # guards appends to the journal and its rotation
+        self._journal_lock = threading.Lock()
+        # held while a compaction rewrites the snapshot, so readers never see a half-compacted state
+        self._compact_lock = threading.Lock()
+        self._pending_records = 0
+        self._compaction_thread: Optional[threading.Thread] = None
+
+    def load(self) -> dict:
+        with self._compact_lock:
+            return self._load()
+
+    def load_words(self, user: str = DEFAULT_USER) -> dict[str, StoredCard]:
+        return self.load().get(user, {}).get("words", {})
+
+    def put_cards(self, cards: dict[str, StoredCard], user: str = DEFAULT_USER) -> None:
+        if not cards:
+            return
+        lines = "".join(json.dumps({"user": user, "word": word, "card": card}) + "\n" for word, card in cards.items())
+        with self._journal_lock:
+            with open(self.journal_path, "ab+") as journal_file:
+                # if the last append was torn by a crash, start on a fresh line so only that record is lost
+                end = journal_file.seek(0, os.SEEK_END)
+                if end > 0:
+                    journal_file.seek(end - 1)
+                    if journal_file.read(1) != b"\n":
+                        lines = "\n" + lines
+                journal_file.write(lines.encode())
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+            self._pending_records += len(cards)
+            should_compact = self._pending_records >= self.compact_every
+        if should_compact:
+            self.compact_in_background()
+
+    def compact_in_background(self) -> None:
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        self._compaction_thread = threading.Thread(target=self.compact, name="card-store-compaction", daemon=True)
+        self._compaction_thread.start()
+
+    def compact(self) -> None:
+        with self._compact_lock:
+            with self._journal_lock:
+                # a previous compaction may have crashed after rotating; fold that file in first
+                if not os.path.exists(self.compacting_path) and os.path.exists(self.journal_path):
+                    os.replace(self.journal_path, self.compacting_path)
+                self._pending_records = 0
+
+            if not os.path.exists(self.compacting_path):
+                return
+
+            db_data = self._load_snapshot()
+            self._replay(db_data, self.compacting_path)
+            self._write_snapshot(db_data)
+            os.remove(self.compacting_path)
+        print(f"[green]Compacted card journal into {self.snapshot_path}[/green]")
+
+    def _load(self) -> dict:
+        db_data = self._load_snapshot()
+        self._replay(db_data, self.compacting_path)
+        self._pending_records = self._replay(db_data, self.journal_path)
+        return db_data
+
+    def _load_snapshot(self) -> dict:
+        try:
+            with open(self.snapshot_path, "r") as db_file:
+                return json.load(db_file)
+        except FileNotFoundError:
+            return {DEFAULT_USER: {"words": {}}}
+
+    def _write_snapshot(self, db_data: dict) -> None:
+        # write to a temp file and swap it in, so a crash never leaves a truncated snapshot behind
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w") as tmp_file:
+            json.dump(db_data, tmp_file, indent=4)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    # apply every journal record in path to db_data, returns the number of records applied
+    def _replay(self, db_data: dict, path: str) -> int:
+        applied = 0
+        try:
+            with open(path, "r") as journal_file:
+                for line_number, line in enumerate(journal_file, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # most likely a torn write from a crash, the card keeps its previous state
+                        print(f"[red]Skipping unreadable record on line {line_number} of {path}[/red]")
+                        continue
+                    words_data = db_data.setdefault(record["user"], {}).setdefault("words", {})
+                    words_data[record["word"]] = record["card"]
+                    applied += 1
+        except FileNotFoundError:
+            pass
+        return applied
+
+
+# Cards live in a single table with the stored card as JSON next to its due
+# time in epoch seconds. The (user, due) index makes "N soonest due cards" an index
+# scan and the unique (user, word) index makes a single card update a point upsert.
+class SqliteCardStore(CardStore):
+    def __init__(self, path: str = SQLITE_DB_FILE):
+        self.path = path
+        # sqlite connections can't be shared across threads, FastAPI runs sync endpoints in a thread pool
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cards (
+                    user TEXT NOT NULL,
+                    word TEXT NOT NULL,
+                    due REAL NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS cards_user_word ON cards (user, word)")
+            conn.execute("CREATE INDEX IF NOT EXISTS cards_user_due ON cards (user, due)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load_words(self, user: str = DEFAULT_USER) -> dict[str, StoredCard]:
+        rows = self._connection().execute("SELECT word, data FROM cards WHERE user = ? ORDER BY rowid", (user,))
+        return {word: json.loads(data) for word, data in rows}
+
+    def get_card(self, word: str, user: str = DEFAULT_USER) -> Optional[StoredCard]:
+        row = self._connection().execute("SELECT data FROM cards WHERE user = ? AND word = ?", (user, word)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_cards(self, words: list[str], user: str = DEFAULT_USER) -> dict[str, StoredCard]:
+        if not words:
+            return {}
+        placeholders = ", ".join("?" for _ in words)
+        rows = self._connection().execute(
+            f"SELECT word, data FROM cards WHERE user = ? AND word IN ({placeholders})", (user, *words)
+        )
+        return {word: json.loads(data) for word, data in rows}
+
+    def words(self, user: str = DEFAULT_USER) -> set[str]:
+        return {word for (word,) in self._connection().execute("SELECT word FROM cards WHERE user = ?", (user,))}
+
+    def count(self, user: str = DEFAULT_USER) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM cards WHERE user = ?", (user,)).fetchone()[0]
+
+    def soonest_due(self, n: int, user: str = DEFAULT_USER) -> list[tuple[str, StoredCard]]:
+        rows = self._connection().execute(
+            "SELECT word, data FROM cards WHERE user = ? ORDER BY due LIMIT ?", (user, n)
+        )
+        return [(word, json.loads(data)) for word, data in rows]
+
+    def put_cards(self, cards: dict[str, StoredCard], user: str = DEFAULT_USER) -> None:
+        if not cards:
+            return
+        rows = [(user, word, _due_timestamp(card), json.dumps(card)) for word, card in cards.items()]
+        # a single transaction for all the cards of one sentence result
+        with self._connection() as conn:
+            conn.executemany(
+                """
+                INSERT INTO cards (user, word, due, data) VALUES (?, ?, ?, ?)
+                ON CONFLICT (user, word) DO UPDATE SET due = excluded.due, data = excluded.data
+                """,
+                rows,
+            )
+
+
+def create_card_store(kind: str = CARD_STORE) -> CardStore:
+    if kind == "journal":
+        return JournaledCardStore()
+    elif kind == "sqlite":
+        return SqliteCardStore()
+    else:
+        raise ValueError(f"Unknown card store: {kind}")
+
+
+card_store = create_card_store()
@@ -1,8 +1,12 @@
 import random
 from fsrs import FSRS, Card, Rating, State
 from datetime import datetime, timedelta, timezone
-from sentences import load_full_word_list
-import json
+from word_data import load_full_word_list
+from learner_state import learner_state
+import heapq
+import threading
+from collections import Counter
+from typing import Optional
 
 # HOW TO BUILD from FSRS:
 # git clone py-fsrs whatever it is,
@@ -10,8 +14,8 @@ import json
 # pip install -e .
 # and now you've built!
 
-# Create FSRS instance
-fsrs = FSRS()
+# Create FSRS instance, with the active learner's fitted weights (see scripts/fit_fsrs_parameters.py)
+fsrs = FSRS(user=learner_state.user)
 
 def create_new_review_card_multiple_times(times=5):
     card = Card()
@@ -25,21 +29,118 @@ def create_new_review_card_multiple_times(times=5):
 
 
 # a quick average of the estimated retrivability of all words
-def calc_total_proficiency():
+def calc_total_proficiency(exact: bool = False):
+    if not exact:
+        return proficiency_aggregate.proficiency()
+
     proficiency_sum = 0
     due_cards_count = 0
     full_word_list = load_full_word_list()
     count = 0 
+    cards = learner_state.cards()
     for word in full_word_list:
-        with open("db.json", "r") as db_file:
-            db_data = json.load(db_file).get("user", {}).get("words", {})
-            if word in db_data:
-                count += 1
-                card = Card.from_dict(db_data[word])
-                retrivability = fsrs.approximate_retrievability(card)
-                proficiency_sum += retrivability
-                if card.due <= datetime.now(timezone.utc):
-                    due_cards_count += 1
+        if word in cards:
+            count += 1
+            card = cards[word]
+            retrivability = fsrs.approximate_retrievability(card)
+            proficiency_sum += retrivability
+            if card.due <= datetime.now(timezone.utc):
+                due_cards_count += 1
     print(f"count: {count} / {len(full_word_list)}")
     print(f"Due cards count: {due_cards_count}")
-    return float((proficiency_sum / len(full_word_list)).real)
\ No newline at end of file
+    # the full recompute also wipes out any float drift in the running sum
+    proficiency_aggregate.on_load(cards)
+    return float((proficiency_sum / len(full_word_list)).real)
+
+
+# Keeps calc_total_proficiency's numbers up to date as cards change, instead of
+# recomputing them over the whole word list on every request.
+# The retrievability sum only changes when a card is reviewed, so it is adjusted by
+# the old and new card's contribution. The due count depends on the clock: cards
+# that aren't due yet sit in a min-heap by due time and are only counted once a
+# read happens after their due time, so a read costs O(cards changed + cards that
+# became due since the last read).
+class ProficiencyAggregate:
+    def __init__(self, tracked_words: list[str]):
+        # the word list has a few duplicates, which calc_total_proficiency counts once per occurrence
+        self.tracked_words = Counter(tracked_words)
+        self.word_count = len(tracked_words)
+        self._lock = threading.Lock()
+        self._reset({})
+
+    def _reset(self, cards: dict[str, Card]) -> None:
+        self._retrievability_sum = 0.0
+        self._retrievability: dict[str, float] = {}
+        self._due_count = 0
+        self._is_due: dict[str, bool] = {}
+        # (due timestamp, word, version) for cards that weren't due at the last read
+        self._not_due_heap: list[tuple[float, str, int]] = []
+        self._versions: dict[str, int] = {}
+        now = datetime.now(timezone.utc).timestamp()
+        for word, card in cards.items():
+            self._add(word, card, now)
+
+    def _add(self, word: str, card: Card, now: float) -> None:
+        if word not in self.tracked_words:
+            return
+        retrivability = float(fsrs.approximate_retrievability(card).real) * self.tracked_words[word]
+        self._retrievability[word] = retrivability
+        self._retrievability_sum += retrivability
+
+        version = self._versions.get(word, 0) + 1
+        self._versions[word] = version
+        due = card.due_timestamp
+        if due <= now:
+            self._is_due[word] = True
+            self._due_count += self.tracked_words[word]
+        else:
+            self._is_due[word] = False
+            heapq.heappush(self._not_due_heap, (due, word, version))
+            # updated cards leave their old heap entries behind, don't let those pile up
+            if len(self._not_due_heap) > 2 * len(self._is_due) + 64:
+                self._compact_not_due_heap()
+
+    def _compact_not_due_heap(self) -> None:
+        self._not_due_heap = [entry for entry in self._not_due_heap if self._versions.get(entry[1]) == entry[2] and self._is_due.get(entry[1]) is False]
+        heapq.heapify(self._not_due_heap)
+
+    def _remove(self, word: str) -> None:
+        if word not in self._retrievability:
+            return
+        self._retrievability_sum -= self._retrievability.pop(word)
+        if self._is_due.pop(word):
+            self._due_count -= self.tracked_words[word]
+        # a heap entry left behind for this word is skipped later because its version is outdated
+
+    def _advance(self, now: float) -> None:
+        while self._not_due_heap and self._not_due_heap[0][0] <= now:
+            _, word, version = heapq.heappop(self._not_due_heap)
+            if self._versions.get(word) == version and self._is_due.get(word) is False:
+                self._is_due[word] = True
+                self._due_count += self.tracked_words[word]
+
+    # LearnerState listener interface
+
+    def on_load(self, cards: dict[str, Card]) -> None:
+        with self._lock:
+            self._reset(cards)
+
+    def on_update(self, word: str, old_card: Optional[Card], new_card: Card) -> None:
+        with self._lock:
+            self._remove(word)
+            self._add(word, new_card, datetime.now(timezone.utc).timestamp())
+
+    # Reads
+
+    def due_cards_count(self) -> int:
+        with self._lock:
+            self._advance(datetime.now(timezone.utc).timestamp())
+            return self._due_count
+
+    def proficiency(self) -> float:
+        with self._lock:
+            return self._retrievability_sum / self.word_count
+
+
+proficiency_aggregate = ProficiencyAggregate(load_full_word_list())
+learner_state.add_listener(proficiency_aggregate)
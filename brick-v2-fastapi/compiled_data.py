@@ -0,0 +1,49 @@
+import os
+import pickle
+from typing import Callable, TypeVar
+from rich import print
+
+# Data built from the big JSON files (the word list, the root index) is pickled to
+# COMPILED_DATA_DIR the first time it is built, and later processes load the pickle
+# instead of parsing and compiling the JSON again. A pickle is rebuilt whenever its
+# source file changes (size or modification time) or the key changes, which callers
+# use for anything else the result depends on, like configuration.
+# scripts/compile_data.py builds everything ahead of time, e.g. on deploy.
+
+COMPILED_DATA_DIR = os.getenv("COMPILED_DATA_DIR", ".compiled")
+# bump when the shape of a compiled object changes
+COMPILED_DATA_FORMAT = 1
+
+T = TypeVar("T")
+
+
+def _stamp(source_path: str, key: str) -> str:
+    stat = os.stat(source_path)
+    return f"{COMPILED_DATA_FORMAT}:{stat.st_size}:{stat.st_mtime_ns}:{key}"
+
+
+def load_compiled(name: str, source_path: str, build: Callable[[bytes], T], key: str = "", rebuild: bool = False) -> T:
+    path = os.path.join(COMPILED_DATA_DIR, name + ".pickle")
+    stamp = _stamp(source_path, key)
+    if not rebuild:
+        try:
+            with open(path, "rb") as f:
+                # the stamp is pickled first, so a stale file is detected without unpickling the rest
+                if pickle.load(f) == stamp:
+                    return pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            pass
+
+    with open(source_path, "rb") as f:
+        value = build(f.read())
+    try:
+        os.makedirs(COMPILED_DATA_DIR, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(stamp, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        # a read-only checkout still works, just without the speedup
+        print(f"[yellow]Couldn't write compiled {name}: {e}[/yellow]")
+    return value
@@ -0,0 +1,319 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from functools import cached_property
+from typing import Any, AsyncIterator, Optional
+from dotenv import load_dotenv
+from word_data import WORD_DATA_FILE, load_word_data
+
+# Sentence generation goes through a SentenceGenerator, so the pipeline around it
+# (validation, retries, the bank) doesn't care where the text comes from.
+# SENTENCE_GENERATOR picks the backend:
+#   anthropic  Claude with prompt caching (default)
+#   openai     the OpenAI chat completions API
+#   local      builds sentences from the word data file, no network calls. Meant for
+#              load tests and benchmarks, see scripts/benchmark_generation.py
+#
+# A generator gets the allowed word list, the focus words and the conversation so far
+# (create_initial_messages plus corrective retry messages) and returns the raw reply,
+# <thinking> and <answer> tags included. astream yields the same reply in chunks as
+# it is produced, closing the iterator early cancels the request.
+#
+# The API SDKs take a while to import, so they are imported and the clients created
+# on first use, or by warm_up() once the server is up.
+
+load_dotenv()
+CLAUDE_API_KEY = os.getenv('CLAUDE_API_KEY')
+
+SENTENCE_GENERATOR = os.getenv("SENTENCE_GENERATOR", "anthropic")
+CLAUDE_MODEL = os.getenv("CLAUDE_MODEL", "claude-3-5-sonnet-20241022")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+# seconds the local generator takes per reply, to stand in for the API round trip
+LOCAL_GENERATOR_LATENCY = float(os.getenv("LOCAL_GENERATOR_LATENCY", "0"))
+# chance that a local reply uses a word that is not on the list, so retries get exercised
+LOCAL_GENERATOR_INVALID_RATE = float(os.getenv("LOCAL_GENERATOR_INVALID_RATE", "0"))
+LOCAL_GENERATOR_SEED = int(os.getenv("LOCAL_GENERATOR_SEED", "0"))
+
+
+# must use build constraint when install spacy
+# must install numpy<2
+def create_system_prompt(focus_word: str, word_list: str, language: str = 'German') -> str:
+
+    wordList = '\n'.join(word_list)
+    return f"""
+    You are an expert in the {language} language. You are creative, playful, witty. Your job is to help the learner learn by generating whimsical practice sentences that meet the specified requirements. You will be given a word list, and asked to only generate 
+    Only use words based on the following word list: 
+    {wordList}
+
+    It can be different versions of each of these words, including different case, plurality, gender, or conjugation.
+    For instance, "das" or "dem" would count as a version of "der". 
+    If "Sie" is on the list, you could use "Ihnen".
+    If "sein" is on the list, you could use "bin" or "ist".
+    If "Berg" is on the list, you could use "Bergen".
+    If "Haus" is on the list, you could use "Hause".
+    If "verstecken" is on the list, you could use "Verstecke".
+    If "essen" is on the list, you could use "aß".
+    If "unterer" is on the list, you could use "untere".
+    If "nächster" is on the list, you could use "nächste".
+    If "dieser" is on the list, you could use "dies".
+    
+
+    But *ONLY* use words and versions of words from this list. DO NOT use any other words. Let me reiterate, do NOT, use any other words.
+    
+    Additionally, your main requirement is to use the focus words specified. Create a great example sentence with these focus words in context in order for the user to get a good grasp on how they might be used.
+    You are a native speaker, and you actually don't know English. Make sure that your <answer> always contains only German. Make sure that you only provide one, great sentence, and not an alternative or several sentences.
+    
+    Before you reply, consider the word list and how you might structure your reply given your limited vocabulary. Write out this thinking within <thinking> tags.
+    Always reply in this XML format:
+    ```
+    <thinking></thinking>
+    <answer></answer>
+    ```
+    """
+
+
+class SentenceGenerator(ABC):
+    name = "base"
+
+    @abstractmethod
+    def generate(self, word_list: list[str], focus_words: list[str], messages: list[dict]) -> str:
+        ...
+
+    @abstractmethod
+    async def agenerate(self, word_list: list[str], focus_words: list[str], messages: list[dict]) -> str:
+        ...
+
+    # backends that can't stream hand out the whole reply as one chunk
+    async def astream(self, word_list: list[str], focus_words: list[str], messages: list[dict]) -> AsyncIterator[str]:
+        yield await self.agenerate(word_list, focus_words, messages)
+
+    # loads whatever the first request would otherwise wait for
+    def warm_up(self) -> None:
+        pass
+
+
+class AnthropicGenerator(SentenceGenerator):
+    name = "anthropic"
+
+    def __init__(self, model: str = CLAUDE_MODEL, api_key: Optional[str] = CLAUDE_API_KEY):
+        self.model = model
+        self.api_key = api_key
+
+    # long-lived clients, so connections to the API are pooled and reused across requests
+    @cached_property
+    def client(self):
+        import anthropic
+        return anthropic.Anthropic(api_key=self.api_key)
+
+    @cached_property
+    def async_client(self):
+        import anthropic
+        return anthropic.AsyncAnthropic(api_key=self.api_key)
+
+    def warm_up(self) -> None:
+        self.client
+        self.async_client
+
+    def create_request(self, word_list: list[str], focus_words: list[str], messages: list[dict]) -> dict[str, Any]:
+        return dict(
+            model=self.model,
+            max_tokens=1024,
+            temperature=1,
+            system=[{
+                "text": create_system_prompt(focus_word=focus_words, word_list=word_list),
+                "type": "text",
+                "cache_control": {"type": "ephemeral"}
+            }],
+            messages=messages,
+            extra_headers={"anthropic-beta": "prompt-caching-2024-07-31"}
+        )
+
+    @staticmethod
+    def get_text(message_block) -> str:
+        # handle edge case
+        if len(message_block.content) == 0:
+            raise Exception(f"message_block has no content. See: {message_block}")
+        return message_block.content[0].text
+
+    def generate(self, word_list: list[str], focus_words: list[str], messages: list[dict]) -> str:
+        message_block = self.client.beta.prompt_caching.messages.create(**self.create_request(word_list, focus_words, messages))
+        return self.get_text(message_block)
+
+    async def agenerate(self, word_list: list[str], focus_words: list[str], messages: list[dict]) -> str:
+        message_block = await self.async_client.beta.prompt_caching.messages.create(**self.create_request(word_list, focus_words, messages))
+        return self.get_text(message_block)
+
+    async def astream(self, word_list: list[str], focus_words: list[str], messages: list[dict]) -> AsyncIterator[str]:
+        # leaving the context manager closes the connection, which stops generation (and billing)
+        async with self.async_client.beta.prompt_caching.messages.stream(**self.create_request(word_list, focus_words, messages)) as stream:
+            async for text in stream.text_stream:
+                yield text
+
+
+class OpenAIGenerator(SentenceGenerator):
+    name = "openai"
+
+    def __init__(self, model: str = OPENAI_MODEL):
+        self.model = model
+
+    @cached_property
+    def client(self):
+        import openai
+        return openai.OpenAI()
+
+    @cached_property
+    def async_client(self):
+        import openai
+        return openai.AsyncOpenAI()
+
+    def warm_up(self) -> None:
+        self.client
+        self.async_client
+
+    def create_request(self, word_list: list[str], focus_words: list[str], messages: list[dict]) -> dict[str, Any]:
+        system_message = {"role": "system", "content": create_system_prompt(focus_word=focus_words, word_list=word_list)}
+        return dict(
+            model=self.model,
+            max_tokens=1024,
+            temperature=1,
+            messages=[system_message] + [{"role": m["role"], "content": _message_text(m["content"])} for m in messages],
+        )
+
+    @staticmethod
+    def get_text(completion) -> str:
+        if len(completion.choices) == 0 or completion.choices[0].message.content is None:
+            raise Exception(f"completion has no content. See: {completion}")
+        return completion.choices[0].message.content
+
+    def generate(self, word_list: list[str], focus_words: list[str], messages: list[dict]) -> str:
+        return self.get_text(self.client.chat.completions.create(**self.create_request(word_list, focus_words, messages)))
+
+    async def agenerate(self, word_list: list[str], focus_words: list[str], messages: list[dict]) -> str:
+        return self.get_text(await self.async_client.chat.completions.create(**self.create_request(word_list, focus_words, messages)))
+
+    async def astream(self, word_list: list[str], focus_words: list[str], messages: list[dict]) -> AsyncIterator[str]:
+        stream = await self.async_client.chat.completions.create(**self.create_request(word_list, focus_words, messages), stream=True)
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+
+
+# the messages are in the Anthropic format, where content can be a list of blocks
+def _message_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(block["text"] for block in content if block.get("type") == "text")
+
+
+# Stands in for the LLM without any network calls. Every reply is a simple
+# subject-verb-rest sentence built from versions (inflected forms) of the focus words
+# and of random allowed words, so it passes validation the same way a good LLM reply
+# does. With LOCAL_GENERATOR_INVALID_RATE a reply uses a word that is not on the list,
+# which sends the pipeline through its corrective retries. The output only depends
+# on the seed and the order of the calls.
+class LocalGenerator(SentenceGenerator):
+    name = "local"
+
+    NOUN_POS = {"der", "die", "das", "der, die", "die (pl)", "der, das", "die, das", "der, die, das", "das, die (pl)", "(pl)"}
+    FILLER_POS = ("adv", "adj")
+
+    def __init__(self, word_data_file: str = WORD_DATA_FILE, latency: float = LOCAL_GENERATOR_LATENCY, invalid_rate: float = LOCAL_GENERATOR_INVALID_RATE, seed: int = LOCAL_GENERATOR_SEED):
+        self.latency = latency
+        self.invalid_rate = invalid_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+        word_data = load_word_data(word_data_file)
+        self._pos: dict[str, str] = word_data.pos
+        self._versions: dict[str, list[str]] = word_data.versions
+        self._words_in_order = list(self._versions)
+
+    def _is_noun(self, word: str) -> bool:
+        return self._pos.get(word) in self.NOUN_POS
+
+    def _version(self, rng: random.Random, word: str) -> str:
+        return rng.choice(self._versions.get(word, [word]))
+
+    def _phrase(self, rng: random.Random, word: str, allowed: set[str]) -> list[str]:
+        if self._is_noun(word) and "der" in allowed:
+            return [self._version(rng, "der"), self._version(rng, word)]
+        return [self._version(rng, word)]
+
+    def compose(self, rng: random.Random, word_list: list[str], focus_words: list[str]) -> str:
+        allowed = set(word_list)
+        by_pos: dict[str, list[str]] = {}
+        for word in word_list:
+            if word in self._pos and word not in focus_words:
+                pos = "noun" if self._is_noun(word) else self._pos[word]
+                by_pos.setdefault(pos, []).append(word)
+
+        focus_nouns = [word for word in focus_words if self._is_noun(word)]
+        focus_verbs = [word for word in focus_words if self._pos.get(word) == "verb"]
+        others = [word for word in focus_words if word not in focus_nouns and word not in focus_verbs]
+
+        # subject, then verb, then everything else
+        subject = focus_nouns.pop(0) if focus_nouns else (rng.choice(by_pos["noun"]) if by_pos.get("noun") else None)
+        verb = focus_verbs.pop(0) if focus_verbs else (rng.choice(by_pos["verb"]) if by_pos.get("verb") else None)
+        rest = focus_verbs + others + focus_nouns
+        filler_pos = [pos for pos in self.FILLER_POS if by_pos.get(pos)]
+        if filler_pos:
+            rest.append(rng.choice(by_pos[rng.choice(filler_pos)]))
+
+        tokens: list[str] = []
+        for word in [subject, verb] + rest:
+            if word is not None:
+                tokens.extend(self._phrase(rng, word, allowed))
+
+        if rng.random() < self.invalid_rate:
+            outside = [word for word in self._words_in_order if word not in allowed]
+            if outside:
+                tokens.insert(rng.randrange(1, len(tokens) + 1), self._version(rng, rng.choice(outside)))
+
+        sentence = " ".join(tokens)
+        return sentence[:1].upper() + sentence[1:] + "."
+
+    def _reply(self, word_list: list[str], focus_words: list[str]) -> str:
+        with self._rng_lock:
+            rng = random.Random(self._rng.random())
+        sentence = self.compose(rng, word_list, focus_words)
+        return f"<thinking>local generator, focus words: {', '.join(focus_words)}</thinking>\n<answer>{sentence}</answer>"
+
+    def generate(self, word_list: list[str], focus_words: list[str], messages: list[dict]) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._reply(word_list, focus_words)
+
+    async def agenerate(self, word_list: list[str], focus_words: list[str], messages: list[dict]) -> str:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._reply(word_list, focus_words)
+
+    # one word per chunk, with the latency spread evenly over the chunks like a token stream
+    async def astream(self, word_list: list[str], focus_words: list[str], messages: list[dict]) -> AsyncIterator[str]:
+        chunks = self._reply(word_list, focus_words).split(" ")
+        for i, chunk in enumerate(chunks):
+            if self.latency:
+                await asyncio.sleep(self.latency / len(chunks))
+            yield chunk if i == len(chunks) - 1 else chunk + " "
+
+
+GENERATORS = {
+    AnthropicGenerator.name: AnthropicGenerator,
+    OpenAIGenerator.name: OpenAIGenerator,
+    LocalGenerator.name: LocalGenerator,
+}
+
+
+def create_sentence_generator(kind: str = SENTENCE_GENERATOR) -> SentenceGenerator:
+    if kind not in GENERATORS:
+        raise ValueError(f"Unknown SENTENCE_GENERATOR {kind!r}, expected one of: {', '.join(GENERATORS)}")
+    return GENERATORS[kind]()
+
+
+sentence_generator = create_sentence_generator()
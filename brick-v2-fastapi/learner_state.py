@@ -0,0 +1,243 @@
+import atexit
+import heapq
+import os
+import threading
+from datetime import datetime
+from typing import Optional
+from rich import print
+from fsrs import FSRS, Card, Rating, ReviewLog
+from card_store import CardStore, DEFAULT_USER, card_from_stored, card_store
+from review_log import ReviewLogStore, ReviewRecord, review_log
+
+# The learner's cards, parsed once and kept in memory for the lifetime of the process.
+# Reviews mutate this state in place and mark the cards dirty, a background thread
+# writes the dirty cards to the card store (write-behind), either every
+# FLUSH_INTERVAL seconds or as soon as FLUSH_DIRTY_THRESHOLD cards are dirty.
+# Reads never touch the disk once the state is loaded.
+#
+# Anything derived from the cards (aggregates, indexes) can register a listener to
+# stay in sync: listener.on_load(cards) is called with all cards once they are
+# loaded, and listener.on_update(word, old_card, new_card) for every changed card.
+#
+# With a review log, apply_reviews also queues a ReviewRecord per review, the flush
+# appends them to the log.
+
+FLUSH_INTERVAL = float(os.getenv("LEARNER_STATE_FLUSH_INTERVAL", "5"))
+FLUSH_DIRTY_THRESHOLD = int(os.getenv("LEARNER_STATE_FLUSH_DIRTY_THRESHOLD", "50"))
+
+
+class LearnerState:
+    def __init__(self, store: CardStore, user: str = DEFAULT_USER, flush_interval: float = FLUSH_INTERVAL, flush_dirty_threshold: int = FLUSH_DIRTY_THRESHOLD, review_log: Optional[ReviewLogStore] = None):
+        self.store = store
+        self.review_log = review_log
+        self.user = user
+        self.flush_interval = flush_interval
+        self.flush_dirty_threshold = flush_dirty_threshold
+
+        self._cards: dict[str, Card] = {}
+        # min-heap of (due timestamp, word, version), entries whose version is outdated are skipped
+        self._due_heap: list[tuple[float, str, int]] = []
+        self._versions: dict[str, int] = {}
+        self._dirty: set[str] = set()
+        self._pending_reviews: list[ReviewRecord] = []
+        self._loaded = False
+        # guards _cards and _dirty, reviews come in on FastAPI's thread pool
+        self._lock = threading.RLock()
+        # serializes flushes, so a timer flush and a shutdown flush can't interleave writes
+        self._flush_lock = threading.Lock()
+        self._wake_flusher = threading.Event()
+        self._stopping = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._listeners: list = []
+
+    def add_listener(self, listener) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+            if self._loaded:
+                listener.on_load(dict(self._cards))
+
+    def load(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            self._cards = {word: card_from_stored(card) for word, card in self.store.load_words(self.user).items()}
+            self._rebuild_due_heap()
+            self._dirty.clear()
+            self._loaded = True
+            for listener in self._listeners:
+                listener.on_load(dict(self._cards))
+        print(f"[green]Loaded {len(self._cards)} cards for {self.user}[/green]")
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.load()
+
+    # Reads
+
+    def get_card(self, word: str) -> Optional[Card]:
+        self._ensure_loaded()
+        return self._cards.get(word)
+
+    def get_cards(self, words: list[str]) -> dict[str, Card]:
+        self._ensure_loaded()
+        with self._lock:
+            return {word: self._cards[word] for word in words if word in self._cards}
+
+    def has_card(self, word: str) -> bool:
+        self._ensure_loaded()
+        return word in self._cards
+
+    def count(self) -> int:
+        self._ensure_loaded()
+        return len(self._cards)
+
+    # a point-in-time copy of all cards, safe to iterate while reviews come in
+    def cards(self) -> dict[str, Card]:
+        self._ensure_loaded()
+        with self._lock:
+            return dict(self._cards)
+
+    # the n cards with the soonest due dates as (word, card) pairs, soonest first. O(n log cards)
+    def soonest_due(self, n: int) -> list[tuple[str, Card]]:
+        self._ensure_loaded()
+        with self._lock:
+            soonest = []
+            while self._due_heap and len(soonest) < n:
+                entry = heapq.heappop(self._due_heap)
+                # drop entries of cards that were reviewed since they were pushed
+                if self._versions.get(entry[1]) == entry[2]:
+                    soonest.append(entry)
+            for entry in soonest:
+                heapq.heappush(self._due_heap, entry)
+            return [(word, self._cards[word]) for _, word, _ in soonest]
+
+    def _push_due(self, word: str, card: Card) -> None:
+        version = self._versions.get(word, 0) + 1
+        self._versions[word] = version
+        heapq.heappush(self._due_heap, (card.due_timestamp, word, version))
+
+    def _rebuild_due_heap(self) -> None:
+        self._versions = {word: 0 for word in self._cards}
+        self._due_heap = [(card.due_timestamp, word, 0) for word, card in self._cards.items()]
+        heapq.heapify(self._due_heap)
+
+    # Writes
+
+    def update_cards(self, cards: dict[str, Card]) -> None:
+        self._ensure_loaded()
+        with self._lock:
+            for word, card in cards.items():
+                old_card = self._cards.get(word)
+                self._cards[word] = card
+                self._push_due(word, card)
+                for listener in self._listeners:
+                    listener.on_update(word, old_card, card)
+            self._dirty.update(cards)
+            # reviewed cards leave their old heap entries behind, don't let those pile up
+            if len(self._due_heap) > 2 * len(self._cards) + 64:
+                self._rebuild_due_heap()
+            should_flush = len(self._dirty) >= self.flush_dirty_threshold
+        if should_flush:
+            self._wake_flusher.set()
+
+    # reviews the given words (new words start from a new card) at one time, all cards of a
+    # sentence result in one go, and returns word -> (reviewed card, review log)
+    def apply_reviews(self, ratings: dict[str, Rating], scheduler: FSRS, now: Optional[datetime] = None, sentence: Optional[str] = None) -> dict[str, tuple[Card, ReviewLog]]:
+        self._ensure_loaded()
+        words = list(ratings)
+        # under the lock, so a concurrent review of the same word isn't lost
+        with self._lock:
+            cards = [self._cards.get(word) or Card() for word in words]
+            reviewed = scheduler.review_many(cards, [ratings[word] for word in words], now)
+            results = dict(zip(words, reviewed))
+            if self.review_log is not None:
+                self._pending_reviews.extend(
+                    ReviewRecord(word, log.review_timestamp, log.rating.value, log.elapsed_days, log.state.value, card.stability, card.difficulty, reviewed_card.stability, reviewed_card.difficulty, log.scheduled_days, sentence)
+                    for word, card, (reviewed_card, log) in zip(words, cards, reviewed)
+                )
+            self.update_cards({word: card for word, (card, _) in results.items()})
+        return results
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                dirty_cards = {word: self._cards[word].to_compact() for word in self._dirty}
+                self._dirty.clear()
+                pending_reviews, self._pending_reviews = self._pending_reviews, []
+            try:
+                if dirty_cards:
+                    self.store.put_cards(dirty_cards, user=self.user)
+            except Exception:
+                # keep them dirty so the next flush retries
+                with self._lock:
+                    self._dirty.update(dirty_cards)
+                    self._pending_reviews[:0] = pending_reviews
+                raise
+            try:
+                if pending_reviews:
+                    self.review_log.append(pending_reviews, user=self.user)
+            except Exception:
+                with self._lock:
+                    self._pending_reviews[:0] = pending_reviews
+                raise
+
+    # Background flushing
+
+    def start(self) -> None:
+        self.load()
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        self._stopping.clear()
+        self._flusher = threading.Thread(target=self._flush_loop, name="learner-state-flusher", daemon=True)
+        self._flusher.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wake_flusher.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        # flush whatever is left, this is the flush-on-shutdown
+        self.flush()
+
+    def _flush_loop(self) -> None:
+        while not self._stopping.is_set():
+            self._wake_flusher.wait(self.flush_interval)
+            self._wake_flusher.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[red]Flushing learner state failed, will retry: {e}[/red]")
+
+
+# Walks a frequency-ordered word list and hands out the next words the learner
+# has no card for yet. The cursor only ever moves forward past words that have a
+# card, so finding the next k new words is amortized O(k) instead of a scan of the
+# whole list every time.
+class NewWordCursor:
+    def __init__(self, words: list[str], state: LearnerState):
+        self.words = words
+        self.state = state
+        self._position = 0
+        self._lock = threading.Lock()
+
+    def next_words(self, k: int) -> list[str]:
+        with self._lock:
+            # everything before the first word without a card is introduced for good
+            while self._position < len(self.words) and self.state.has_card(self.words[self._position]):
+                self._position += 1
+
+            new_words: list[str] = []
+            position = self._position
+            while len(new_words) < k and position < len(self.words):
+                word = self.words[position]
+                # the list has a few duplicates, hand every word out once
+                if not self.state.has_card(word) and word not in new_words:
+                    new_words.append(word)
+                position += 1
+            return new_words
+
+
+learner_state = LearnerState(card_store, review_log=review_log)
+# last line of defense for scripts and servers that don't go through the FastAPI shutdown
+atexit.register(learner_state.flush)
@@ -1,15 +1,49 @@
+import asyncio
 import json
+from contextlib import asynccontextmanager
+from rich import print
 from fastapi import FastAPI, Body
-from openai import OpenAI
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from sentences import MessageData, ResultMessageData, generate_sentence  # Import the function
-from cards import calc_total_proficiency
+from sentences import MessageData, ResultMessageData, get_nlp_de, nlp_executor
+from cards import calc_total_proficiency, proficiency_aggregate
+from learner_state import learner_state
+from sentence_pool import sentence_pool
+from analysis_cache import analysis_cache
+from generators import sentence_generator
 from fsrs import Card, Rating, FSRS
 
-fsrs = FSRS()
-
-app = FastAPI()
+# the active learner's fitted weights, see scripts/fit_fsrs_parameters.py
+fsrs = FSRS(user=learner_state.user)
+
+
+# background startup work fails without anyone awaiting it, so its errors are printed
+# here instead of surfacing only in the first request that needs it
+def report_failure(name: str):
+    def callback(future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            print(f"[red]{name} failed at startup, retrying on first use: {future.exception()!r}[/red]")
+    return callback
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # parse the learner's cards once, then keep flushing reviews to disk in the background
+    learner_state.start()
+    # the spaCy model and the generator's API client load in the background while the
+    # server is already accepting connections, so neither holds up startup
+    nlp_loading = nlp_executor.submit(get_nlp_de)
+    nlp_loading.add_done_callback(report_failure("Loading the spaCy model"))
+    warming_up = asyncio.get_running_loop().run_in_executor(None, sentence_generator.warm_up)
+    warming_up.add_done_callback(report_failure(f"Warming up the {sentence_generator.name} generator"))
+    # keep a few sentences generated ahead of time
+    sentence_pool.start()
+    yield
+    await sentence_pool.stop()
+    learner_state.stop()
+    analysis_cache.save()
+
+app = FastAPI(lifespan=lifespan)
 # Add this after creating the FastAPI app instance
 app.add_middleware(
     CORSMiddleware,
@@ -18,7 +52,6 @@ app.add_middleware(
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
 )
-client = OpenAI()
 
 
 
@@ -35,15 +68,25 @@ async def read_root():
 @app.get("/sentence")
 async def get_sentence():
 
-    messageData = generate_sentence()
+    messageData = await sentence_pool.get()
 
     return messageData
 
 
+@app.get("/sentence_pool/stats")
+async def get_sentence_pool_stats():
+    return sentence_pool.stats()
+
+@app.get("/analysis_cache/stats")
+async def get_analysis_cache_stats():
+    return analysis_cache.stats()
+
+
 @app.get("/proficiency")
-async def get_proficiency():
-    proficiency = calc_total_proficiency()
-    return {"proficiency": proficiency}
+async def get_proficiency(exact: bool = False):
+    # exact=true recomputes from every card instead of using the running aggregate
+    proficiency = calc_total_proficiency(exact=exact)
+    return {"proficiency": proficiency, "due_cards_count": proficiency_aggregate.due_cards_count()}
 
 def store_sentence_result(sentence_result: SentenceResult):
     # Load or create sentence results history
@@ -96,31 +139,16 @@ def sentence_result(body: dict = Body(...)):
     # not_clicked_token_weight = 1 / not_clicked_tokens_count
     # print(f"not_clicked_token_weight: {not_clicked_token_weight}")\
     
-    with open("db.json", "r+") as db_file:
-        db_data = json.load(db_file)
-        user_data = db_data.get("user", {})
-        words_data = user_data.get("words", [])
-        
-        for word, is_correct in sentence_result.word_validations.items():
-            if word in words_data:
-                card = Card.from_dict(words_data[word])
-            else:
-                card = Card()
-
-            if is_correct:
-                card, _ = fsrs.review_card(card, Rating.Good)
-                print(f"Reviewed card for {word} with rating Good")
-            else:
-                card, _ = fsrs.review_card(card, Rating.Again)
-                print(f"Reviewed card for {word} with rating Again")
-            
-                
-            words_data[word] = card.to_dict()
-
-        # Write the updated data back to the file
-        db_file.seek(0)
-        json.dump(db_data, db_file, indent=4)
-        db_file.truncate()
+    ratings = {word: Rating.Good if is_correct else Rating.Again for word, is_correct in sentence_result.word_validations.items()}
+    # every card of the sentence is reviewed at the same time, the in-memory state is updated
+    # right away, the store gets the reviewed cards in one write and the review log the
+    # reviews on the next flush
+    reviewed = learner_state.apply_reviews(ratings, fsrs, sentence=sentence_data.message)
+    good = [word for word, rating in ratings.items() if rating == Rating.Good]
+    again = [word for word, rating in ratings.items() if rating == Rating.Again]
+    print(f"Reviewed {len(reviewed)} cards, Good: {', '.join(good)}; Again: {', '.join(again)}")
+    # pooled sentences built around these words are no longer what the learner should see next
+    sentence_pool.invalidate(list(reviewed))
     
     # Process your data here
     
@@ -16,12 +16,18 @@ from .models import (
     SchedulingCards,
     SchedulingInfo,
     Parameters,
+    DEFAULT_PARAMETERS_USER,
 )
 import math
 from datetime import datetime, timezone, timedelta
 from typing import Optional
 import copy
 
+# how many minutes after the review a new card is due again, per rating other than Easy
+NEW_CARD_MINUTES = {Rating.Again: 1, Rating.Hard: 5, Rating.Good: 10}
+# from this many cards on, review_many reviews them together with numpy (if it is installed)
+VECTORIZED_REVIEW_MIN_CARDS = 128
+
 
 class FSRS:
     """
@@ -44,16 +50,18 @@ class FSRS:
         w: Optional[tuple[float, ...]] = None,
         request_retention: Optional[float] = None,
         maximum_interval: Optional[int] = None,
+        user: str = DEFAULT_PARAMETERS_USER,
     ) -> None:
         """
         Initializes the FSRS scheduler.
 
         Args:
-            w (Optional[tuple[float, ...]]): The 19 model weights of the FSRS scheduler.
+            w (Optional[tuple[float, ...]]): The 19 model weights of the FSRS scheduler. Read from the user's entry in the parameters file (see fsrs.models.load_parameters) if not given.
             request_retention (Optional[float]): The desired retention of the scheduler. Corresponds to the maximum retrievability a Card object can have before it is due.
             maximum_interval (Optional[int]): The maximum number of days into the future a Card object can be scheduled for next review.
+            user (str): The user whose weights are read from the parameters file.
         """
-        self.p = Parameters(w, request_retention, maximum_interval)
+        self.p = Parameters(w, request_retention, maximum_interval, user)
         self.DECAY = -0.5
         self.FACTOR = 0.9 ** (1 / self.DECAY) - 1
 
@@ -63,9 +71,13 @@ class FSRS:
         """
         Reviews a card for a given rating.
 
+        Only the given rating is scheduled, the result is the same as picking it from `repeat`,
+        which schedules all four ratings.
+
         Args:
             card (Card): The card being reviewed.
             rating (Rating): The chosen rating for the card being reviewed.
+            weight (Optional[float]): Scales the due date of a new card.
             now (Optional[datetime]): The date and time of the review.
 
         Returns:
@@ -74,23 +86,168 @@ class FSRS:
         Raises:
             ValueError: If the `now` argument is not timezone-aware and set to UTC.
         """
-        scheduling_cards = self.repeat(card, now, weight)
+        now = self._review_time(now)
+        weight = 1.0 if weight is None else weight
 
-        card = scheduling_cards[rating].card
-        review_log = scheduling_cards[rating].review_log
+        if card.state == State.New:
+            elapsed_days = 0
+        else:
+            elapsed_days = (now - card.last_review).days
+        lapses = card.lapses
+        scheduled_days = card.scheduled_days
 
-        return card, review_log
+        if card.state == State.New:
+            difficulty = self.init_difficulty(rating)
+            stability = self.init_stability(rating)
+            if rating == Rating.Easy:
+                state = State.Review
+                scheduled_days = self.next_interval(stability)
+                due = now + timedelta(days=scheduled_days * weight)
+            else:
+                state = State.Learning
+                due = now + timedelta(minutes=NEW_CARD_MINUTES[rating] * weight)
+        else:
+            last_d = card.difficulty
+            last_s = card.stability
+            difficulty = self.next_difficulty(last_d, rating)
+
+            if card.state == State.Review:
+                retrievability = self.forgetting_curve(elapsed_days, last_s)
+                if rating == Rating.Again:
+                    stability = self.next_forget_stability(last_d, last_s, retrievability)
+                else:
+                    # the hard, good and easy intervals are adjusted against each other
+                    hard_stability = self.next_recall_stability(last_d, last_s, retrievability, Rating.Hard)
+                    good_stability = self.next_recall_stability(last_d, last_s, retrievability, Rating.Good)
+                    hard_interval = self.next_interval(hard_stability)
+                    good_interval = self.next_interval(good_stability)
+                    hard_interval = min(hard_interval, good_interval)
+                    good_interval = max(good_interval, hard_interval + 1)
+                    if rating == Rating.Hard:
+                        stability = hard_stability
+                        scheduled_days = hard_interval
+                    elif rating == Rating.Good:
+                        stability = good_stability
+                        scheduled_days = good_interval
+                    else:
+                        stability = self.next_recall_stability(last_d, last_s, retrievability, Rating.Easy)
+                        scheduled_days = max(self.next_interval(stability), good_interval + 1)
+            else:
+                stability = self.short_term_stability(last_s, rating)
+                if rating == Rating.Hard:
+                    scheduled_days = 0
+                elif rating == Rating.Good:
+                    scheduled_days = self.next_interval(stability)
+                elif rating == Rating.Easy:
+                    good_interval = self.next_interval(self.short_term_stability(last_s, Rating.Good))
+                    scheduled_days = max(self.next_interval(stability), good_interval + 1)
+
+            if rating == Rating.Again:
+                scheduled_days = 0
+                due = now + timedelta(minutes=5)
+                if card.state == State.Review:
+                    state = State.Relearning
+                    lapses += 1 * weight
+                else:
+                    state = card.state
+            elif rating == Rating.Hard and card.state != State.Review:
+                state = card.state
+                due = now + timedelta(minutes=10)
+            else:
+                state = State.Review
+                due = now + timedelta(days=scheduled_days)
+
+        reviewed_card = Card(
+            due,
+            stability,
+            difficulty,
+            elapsed_days,
+            scheduled_days,
+            card.reps + 1,
+            lapses,
+            state,
+            now,
+        )
+        review_log = ReviewLog(rating, scheduled_days, elapsed_days, now, card.state)
 
-    def repeat(
-        self, card: Card, now: Optional[datetime] = None, weight: Optional[float] = 1
-    ) -> dict[Rating, SchedulingInfo]:
+        return reviewed_card, review_log
+
+    def review_many(
+        self,
+        cards: list[Card],
+        ratings: list[Rating],
+        now: Optional[datetime] = None,
+        weight: Optional[float] = 1,
+    ) -> list[tuple[Card, ReviewLog]]:
+        """
+        Reviews many cards at the same date and time.
+
+        The result is the same as calling `review_card` for every card. With at least VECTORIZED_REVIEW_MIN_CARDS cards,
+        and numpy installed, the cards are reviewed together with `fsrs.vectorized.review_cards`.
+
+        Args:
+            cards (list[Card]): The cards being reviewed.
+            ratings (list[Rating]): The rating of each card.
+            now (Optional[datetime]): The date and time of the reviews, the current time if not given.
+            weight (Optional[float]): Scales the due dates of new cards.
+
+        Returns:
+            list[tuple[Card, ReviewLog]]: The reviewed card and its review log, for each card.
+
+        Raises:
+            ValueError: If the number of cards and ratings differ, or the `now` argument is not timezone-aware and set to UTC.
+        """
+        if len(cards) != len(ratings):
+            raise ValueError("review_many needs one rating per card")
+        now = self._review_time(now)
+        weight = 1.0 if weight is None else weight
+
+        if len(cards) >= VECTORIZED_REVIEW_MIN_CARDS:
+            try:
+                from .vectorized import CardTable, review_cards
+            except ImportError:
+                pass
+            else:
+                table = review_cards(self, CardTable.from_cards(cards), ratings, now, weight)
+                return [
+                    (
+                        reviewed_card,
+                        ReviewLog(rating, reviewed_card.scheduled_days, reviewed_card.elapsed_days, now, card.state),
+                    )
+                    for card, rating, reviewed_card in zip(cards, ratings, table.to_cards())
+                ]
+
+        return [self.review_card(card, rating, weight, now) for card, rating in zip(cards, ratings)]
+
+    def _review_time(self, now: Optional[datetime]) -> datetime:
         if now is None:
-            now = datetime.now(timezone.utc)
+            return datetime.now(timezone.utc)
 
         if (now.tzinfo is None) or (now.tzinfo != timezone.utc):
             raise ValueError("datetime must be timezone-aware and set to UTC")
 
-        card = copy.deepcopy(card)
+        return now
+
+    def repeat(
+        self, card: Card, now: Optional[datetime] = None, weight: Optional[float] = 1
+    ) -> dict[Rating, SchedulingInfo]:
+        """
+        Schedules a card for each of the four ratings, e.g. to preview the next intervals.
+
+        Args:
+            card (Card): The card being reviewed.
+            now (Optional[datetime]): The date and time of the review.
+            weight (Optional[float]): Scales the due dates of a new card.
+
+        Returns:
+            dict[Rating, SchedulingInfo]: The updated card and review log for each rating.
+
+        Raises:
+            ValueError: If the `now` argument is not timezone-aware and set to UTC.
+        """
+        now = self._review_time(now)
+
+        card = copy.copy(card)
         if card.state == State.New:
             card.elapsed_days = 0
         else:
@@ -12,14 +12,125 @@ Classes:
     SchedulingInfo: Simple data class that bundles together an updated Card object and it's corresponding ReviewLog object.
     SchedulingCards: Manages the scheduling of a Card object for each of the four potential ratings.
     Parameters: The parameters used to configure the FSRS scheduler.
+
+Functions:
+    load_parameters: Reads a user's model weights from a parameters file.
+    save_parameters: Writes a user's model weights to a parameters file.
+
+Card and ReviewLog use __slots__ and keep their times as epoch seconds, they convert to datetimes on access.
 """
 
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 import copy
+import json
+import os
 from typing import Any, Optional, Union
 from enum import IntEnum
 
+# the model weights used when neither given nor found in a parameters file
+DEFAULT_W = (
+    0.4072,
+    1.1829,
+    3.1262,
+    15.4722,
+    7.2102,
+    0.5316,
+    1.0651,
+    0.0234,
+    1.616,
+    0.1544,
+    1.0824,
+    1.9813,
+    0.0953,
+    0.2975,
+    2.2042,
+    0.2407,
+    2.9466,
+    0.5034,
+    0.6567,
+)
+# where fitted weights are kept, overridden by the FSRS_PARAMETERS_FILE environment variable.
+# The file maps each user to their weights: {user: {"w": [...19 weights], ...details}}
+DEFAULT_PARAMETERS_FILE = "fsrs_parameters.json"
+# the user whose weights are read and written when none is given
+DEFAULT_PARAMETERS_USER = "default"
+
+
+def parameters_file() -> str:
+    return os.getenv("FSRS_PARAMETERS_FILE", DEFAULT_PARAMETERS_FILE)
+
+
+def _read_parameters_file(path: str) -> dict[str, Any]:
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if not isinstance(data, dict):
+        raise ValueError(f"{path} must map each user to their model weights")
+    # files written before weights were kept per user hold one entry, with its user as a detail
+    if isinstance(data.get("w"), list):
+        return {str(data.get("user", DEFAULT_PARAMETERS_USER)): data}
+    return data
+
+
+def load_parameters(path: Optional[str] = None, user: str = DEFAULT_PARAMETERS_USER) -> Optional[tuple[float, ...]]:
+    """
+    Reads a user's model weights from a parameters file, e.g. ones written after fitting them with fsrs.optimizer.
+
+    Args:
+        path (Optional[str]): The parameters file, FSRS_PARAMETERS_FILE or fsrs_parameters.json if not given.
+        user (str): The user whose weights are read.
+
+    Returns:
+        Optional[tuple[float, ...]]: The 19 model weights, None if the file doesn't exist or has none for the user.
+
+    Raises:
+        ValueError: If the file doesn't map users to entries with 19 weights.
+    """
+    path = path or parameters_file()
+    entry = _read_parameters_file(path).get(user)
+    if entry is None:
+        return None
+
+    w = entry.get("w") if isinstance(entry, dict) else None
+    if not isinstance(w, list) or len(w) != len(DEFAULT_W):
+        raise ValueError(f"{path} must hold the {len(DEFAULT_W)} model weights of {user!r} under 'w'")
+    return tuple(float(weight) for weight in w)
+
+
+def save_parameters(w: tuple[float, ...], path: Optional[str] = None, user: str = DEFAULT_PARAMETERS_USER, **info: Any) -> str:
+    """
+    Writes a user's model weights to a parameters file, where Parameters and so FSRS(user=user) pick them up.
+
+    The weights of other users in the file are kept.
+
+    Args:
+        w (tuple[float, ...]): The 19 model weights.
+        path (Optional[str]): The parameters file, FSRS_PARAMETERS_FILE or fsrs_parameters.json if not given.
+        user (str): The user the weights were fitted to.
+        **info (Any): JSON-serializable details stored next to the weights, e.g. the loss of a fit.
+
+    Returns:
+        str: The path written to.
+
+    Raises:
+        ValueError: If `w` doesn't have 19 weights, or the file isn't a parameters file.
+    """
+    if len(w) != len(DEFAULT_W):
+        raise ValueError(f"expected {len(DEFAULT_W)} model weights, got {len(w)}")
+
+    path = path or parameters_file()
+    data = _read_parameters_file(path)
+    data[user] = {"w": [float(weight) for weight in w], **info}
+    # written to a temporary file first, so a scheduler starting meanwhile never reads half of it
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
 
 class State(IntEnum):
     """
@@ -43,22 +154,64 @@ class Rating(IntEnum):
     Easy = 4
 
 
+# enum members by value, looking them up is much cheaper than calling the enum
+_STATES = {state.value: state for state in State}
+_RATINGS = {rating.value: rating for rating in Rating}
+
+
+def _state(value: Union[int, str]) -> State:
+    try:
+        return _STATES[int(value)]
+    except KeyError:
+        return State(int(value))
+
+
+def _rating(value: Union[int, str]) -> Rating:
+    try:
+        return _RATINGS[int(value)]
+    except KeyError:
+        return Rating(int(value))
+
+
+def _to_timestamp(value: datetime) -> float:
+    # naive datetimes are taken to be in UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _from_timestamp(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+def _read_timestamp(value: Union[str, float, int]) -> float:
+    # ISO strings as written by to_dict, or epoch seconds
+    if isinstance(value, str):
+        return _to_timestamp(datetime.fromisoformat(value))
+    return float(value)
+
+
 class ReviewLog:
     """
     Represents the log entry of Card that has been reviewed.
 
+    The review time is stored as epoch seconds, `review` converts it to and from a datetime.
+
     Attributes:
         rating (Rating): The rating given to the card during the review.
         scheduled_days (int): The number of days until the card is due next.
         elapsed_days (int): The number of days since the card was last reviewed.
         review (datetime): The date and time of the review.
+        review_timestamp (float): The date and time of the review, in epoch seconds.
         state (State): The learning state of the card before the review.
     """
 
+    __slots__ = ("rating", "scheduled_days", "elapsed_days", "review_timestamp", "state")
+
     rating: Rating
     scheduled_days: int
     elapsed_days: int
-    review: datetime
+    review_timestamp: float
     state: State
 
     def __init__(
@@ -82,9 +235,17 @@ class ReviewLog:
         self.rating = rating
         self.scheduled_days = scheduled_days
         self.elapsed_days = elapsed_days
-        self.review = review
+        self.review_timestamp = _to_timestamp(review)
         self.state = state
 
+    @property
+    def review(self) -> datetime:
+        return _from_timestamp(self.review_timestamp)
+
+    @review.setter
+    def review(self, value: datetime) -> None:
+        self.review_timestamp = _to_timestamp(value)
+
     def to_dict(self) -> dict[str, Union[int, str]]:
         """
         Returns a JSON-serializable dictionary representation of the ReviewLog object.
@@ -110,51 +271,99 @@ class ReviewLog:
         Creates a ReviewLog object from an existing dictionary.
 
         Args:
-            source_dict (dict[str, Any]): A dictionary representing an existing ReviewLog object.
+            source_dict (dict[str, Any]): A dictionary representing an existing ReviewLog object. The review time can be an ISO string or epoch seconds.
 
         Returns:
             ReviewLog: A ReviewLog object created from the provided dictionary.
         """
-        rating = Rating(int(source_dict["rating"]))
-        scheduled_days = int(source_dict["scheduled_days"])
-        elapsed_days = int(source_dict["elapsed_days"])
-        review = datetime.fromisoformat(source_dict["review"])
-        state = State(int(source_dict["state"]))
-
-        return ReviewLog(
-            rating,
-            scheduled_days,
-            elapsed_days,
-            review,
-            state,
+        return ReviewLog.from_compact(
+            [
+                source_dict["rating"],
+                source_dict["scheduled_days"],
+                source_dict["elapsed_days"],
+                _read_timestamp(source_dict["review"]),
+                source_dict["state"],
+            ]
         )
 
+    def to_compact(self) -> list:
+        """
+        Returns a compact JSON-serializable representation of the ReviewLog object.
+
+        The fields are stored in a list, in the order of the attributes, with the review time in epoch seconds.
+
+        Returns:
+            list: A compact representation of the ReviewLog object.
+        """
+        return [
+            self.rating.value,
+            self.scheduled_days,
+            self.elapsed_days,
+            self.review_timestamp,
+            self.state.value,
+        ]
+
+    @staticmethod
+    def from_compact(source: list) -> "ReviewLog":
+        """
+        Creates a ReviewLog object from its compact representation.
+
+        Args:
+            source (list): A list as returned by `to_compact`.
+
+        Returns:
+            ReviewLog: A ReviewLog object created from the provided list.
+        """
+        review_log = ReviewLog.__new__(ReviewLog)
+        review_log.rating = _rating(source[0])
+        review_log.scheduled_days = int(source[1])
+        review_log.elapsed_days = int(source[2])
+        review_log.review_timestamp = float(source[3])
+        review_log.state = _state(source[4])
+        return review_log
+
 
 class Card:
     """
     Represents a flashcard in the FSRS system.
 
+    The due date and last review are stored as epoch seconds, `due` and `last_review` convert them to and from datetimes.
+
     Attributes:
         due (datetime): The date and time when the card is due next.
+        due_timestamp (float): The date and time when the card is due next, in epoch seconds.
         stability (float): Core FSRS parameter used for scheduling.
         difficulty (float): Core FSRS parameter used for scheduling.
         elapsed_days (int): The number of days since the card was last reviewed.
         scheduled_days (int): The number of days until the card is due next.
         reps (int): The number of times the card has been reviewed in its history.
-        lapses (int): The number of times the card has been lapsed in its history.
+        lapses (float): The number of times the card has been lapsed in its history. A whole number unless a weighted review added a fraction.
         state (State): The card's current learning state.
-        last_review (datetime): The date and time of the card's last review.
+        last_review (datetime): The date and time of the card's last review. Not set for cards that were never reviewed.
+        last_review_timestamp (Optional[float]): The date and time of the card's last review, in epoch seconds. None for cards that were never reviewed.
     """
 
-    due: datetime
+    __slots__ = (
+        "due_timestamp",
+        "stability",
+        "difficulty",
+        "elapsed_days",
+        "scheduled_days",
+        "reps",
+        "lapses",
+        "state",
+        "last_review_timestamp",
+    )
+
+    due_timestamp: float
     stability: float
     difficulty: float
     elapsed_days: int
     scheduled_days: int
     reps: int
-    lapses: int
+    lapses: float
     state: State
-    last_review: datetime
+    last_review_timestamp: Optional[float]
 
     def __init__(
         self,
@@ -164,7 +373,7 @@ class Card:
         elapsed_days: int = 0,
         scheduled_days: int = 0,
         reps: int = 0,
-        lapses: int = 0,
+        lapses: float = 0,
         state: State = State.New,
         last_review: Optional[datetime] = None,
     ) -> None:
@@ -180,14 +389,14 @@ class Card:
             elapsed_days (int): The number of days since the card was last reviewed.
             scheduled_days (int): The number of days until the card is due next.
             reps (int): The number of times the card has been reviewed in its history.
-            lapses (int): The number of times the card has been lapsed in its history.
+            lapses (float): The number of times the card has been lapsed in its history.
             state (State): The card's current learning state.
             last_review (Optional[datetime]): The date and time of the card's last review.
         """
         if due is None:
-            self.due = datetime.now(timezone.utc)
+            self.due_timestamp = _to_timestamp(datetime.now(timezone.utc))
         else:
-            self.due = due
+            self.due_timestamp = _to_timestamp(due)
 
         self.stability = stability
         self.difficulty = difficulty
@@ -198,7 +407,28 @@ class Card:
         self.state = state
 
         if last_review is not None:
-            self.last_review = last_review
+            self.last_review_timestamp = _to_timestamp(last_review)
+        else:
+            self.last_review_timestamp = None
+
+    @property
+    def due(self) -> datetime:
+        return _from_timestamp(self.due_timestamp)
+
+    @due.setter
+    def due(self, value: datetime) -> None:
+        self.due_timestamp = _to_timestamp(value)
+
+    @property
+    def last_review(self) -> datetime:
+        # like an unset attribute, so hasattr(card, "last_review") tells if the card was reviewed
+        if self.last_review_timestamp is None:
+            raise AttributeError("card has never been reviewed")
+        return _from_timestamp(self.last_review_timestamp)
+
+    @last_review.setter
+    def last_review(self, value: datetime) -> None:
+        self.last_review_timestamp = _to_timestamp(value)
 
     def to_dict(self) -> dict[str, Any]:
         """
@@ -220,7 +450,7 @@ class Card:
             "state": self.state.value,
         }
 
-        if hasattr(self, "last_review"):
+        if self.last_review_timestamp is not None:
             return_dict["last_review"] = self.last_review.isoformat()
 
         return return_dict
@@ -231,36 +461,70 @@ class Card:
         Creates a Card object from an existing dictionary.
 
         Args:
-            source_dict (dict[str, Any]): A dictionary representing an existing Card object.
+            source_dict (dict[str, Any]): A dictionary representing an existing Card object. Times can be ISO strings or epoch seconds.
 
         Returns:
             ReviewLog: A Card object created from the provided dictionary.
         """
-        due = datetime.fromisoformat(source_dict["due"])
-        stability = float(source_dict["stability"])
-        difficulty = float(source_dict["difficulty"])
-        elapsed_days = int(source_dict["elapsed_days"])
-        scheduled_days = int(source_dict["scheduled_days"])
-        reps = int(source_dict["reps"])
-        lapses = int(source_dict["lapses"])
-        state = State(int(source_dict["state"]))
-
-        if "last_review" in source_dict:
-            last_review = datetime.fromisoformat(source_dict["last_review"])
-        else:
-            last_review = None
-
-        return Card(
-            due,
-            stability,
-            difficulty,
-            elapsed_days,
-            scheduled_days,
-            reps,
-            lapses,
-            state,
-            last_review,
-        )
+        card = Card.__new__(Card)
+        card.due_timestamp = _read_timestamp(source_dict["due"])
+        card.stability = float(source_dict["stability"])
+        card.difficulty = float(source_dict["difficulty"])
+        card.elapsed_days = int(source_dict["elapsed_days"])
+        card.scheduled_days = int(source_dict["scheduled_days"])
+        card.reps = int(source_dict["reps"])
+        card.lapses = int(source_dict["lapses"])
+        card.state = _state(source_dict["state"])
+
+        last_review = source_dict.get("last_review")
+        card.last_review_timestamp = _read_timestamp(last_review) if last_review is not None else None
+
+        return card
+
+    def to_compact(self) -> list:
+        """
+        Returns a compact JSON-serializable representation of the Card object.
+
+        The fields are stored in a list, in the order of the `__init__` arguments, with the due date and last review in epoch seconds.
+        Reading it back needs no datetime parsing, which makes it much faster to load than `to_dict`.
+
+        Returns:
+            list: A compact representation of the Card object.
+        """
+        return [
+            self.due_timestamp,
+            self.stability,
+            self.difficulty,
+            self.elapsed_days,
+            self.scheduled_days,
+            self.reps,
+            self.lapses,
+            self.state.value,
+            self.last_review_timestamp,
+        ]
+
+    @staticmethod
+    def from_compact(source: list) -> "Card":
+        """
+        Creates a Card object from its compact representation.
+
+        Args:
+            source (list): A list as returned by `to_compact`.
+
+        Returns:
+            Card: A Card object created from the provided list.
+        """
+        card = Card.__new__(Card)
+        card.due_timestamp = float(source[0])
+        card.stability = float(source[1])
+        card.difficulty = float(source[2])
+        card.elapsed_days = int(source[3])
+        card.scheduled_days = int(source[4])
+        card.reps = int(source[5])
+        card.lapses = source[6] if isinstance(source[6], float) else int(source[6])
+        card.state = _state(source[7])
+        card.last_review_timestamp = float(source[8]) if source[8] is not None else None
+        return card
 
     def get_retrievability(self, now: Optional[datetime] = None) -> float:
         """
@@ -279,7 +543,9 @@ class Card:
             now = datetime.now(timezone.utc)
 
         if self.state in (State.Learning, State.Review, State.Relearning):
-            elapsed_days = max(0, (now - self.last_review).days)
+            # cards leave the New state with their first review
+            assert self.last_review_timestamp is not None
+            elapsed_days = max(0, int((_to_timestamp(now) - self.last_review_timestamp) // 86400))
             return (1 + FACTOR * elapsed_days / self.stability) ** DECAY
         else:
             return 0
@@ -317,10 +583,11 @@ class SchedulingCards:
     easy: Card
 
     def __init__(self, card: Card, weight: float) -> None:
-        self.again = copy.deepcopy(card)
-        self.hard = copy.deepcopy(card)
-        self.good = copy.deepcopy(card)
-        self.easy = copy.deepcopy(card)
+        # a Card only holds immutable values, so shallow copies are independent
+        self.again = copy.copy(card)
+        self.hard = copy.copy(card)
+        self.good = copy.copy(card)
+        self.easy = copy.copy(card)
         self.weight = weight
     def update_state(self, state: State) -> None:
         if state == State.New:
@@ -466,7 +733,7 @@ class Parameters:
     Attributes:
         request_retention (float): The desired retention of the scheduler. Corresponds to the maximum retrievability a Card object can have before it is due.
         maximum_interval (int): The maximum number of days into the future a Card object can be scheduled for next review.
-        w (tuple[float, ...]): The 19 model weights of the FSRS scheduler.
+        w (tuple[float, ...]): The 19 model weights of the FSRS scheduler. Read from the user's entry in the parameters file (see load_parameters) if not given, DEFAULT_W if there is none.
     """
 
     request_retention: float
@@ -478,32 +745,9 @@ class Parameters:
         w: Optional[tuple[float, ...]] = None,
         request_retention: Optional[float] = None,
         maximum_interval: Optional[int] = None,
+        user: str = DEFAULT_PARAMETERS_USER,
     ) -> None:
-        self.w = (
-            w
-            if w is not None
-            else (
-                0.4072,
-                1.1829,
-                3.1262,
-                15.4722,
-                7.2102,
-                0.5316,
-                1.0651,
-                0.0234,
-                1.616,
-                0.1544,
-                1.0824,
-                1.9813,
-                0.0953,
-                0.2975,
-                2.2042,
-                0.2407,
-                2.9466,
-                0.5034,
-                0.6567,
-            )
-        )
+        self.w = w if w is not None else (load_parameters(user=user) or DEFAULT_W)
         self.request_retention = (
             request_retention if request_retention is not None else 0.9
         )
@@ -0,0 +1,415 @@
+"""
+fsrs.optimizer
+--------------
+
+This module fits the FSRS model weights to a learner's review history.
+
+The history is replayed through the FSRS memory model with candidate weights, which predicts the
+retrievability of the card before every review after the first. The weights are fitted by minimizing
+the log loss of those predictions against what happened (recalled or forgotten, any rating but Again
+counts as recalled), with Adam on exact gradients. The gradients are carried forward through the replay
+together with stability and difficulty, so one pass over the history gives the loss and its gradient,
+and every step of the replay handles all cards at once with NumPy.
+
+It requires numpy, which can be installed with `pip install fsrs[numpy]`.
+
+Classes:
+    ReviewHistory: The reviews of many cards, padded into one column per card.
+    OptimizationResult: The fitted weights and the loss before and after fitting.
+
+Functions:
+    log_loss: The log loss of the model's recall predictions for a history.
+    optimize: Fits the FSRS model weights to a history.
+"""
+
+from .models import ReviewLog, Rating, State, DEFAULT_W
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+import numpy.typing as npt
+
+DECAY = -0.5
+FACTOR = 0.9 ** (1 / DECAY) - 1
+# the range each weight is kept in while fitting
+W_BOUNDS = np.array(
+    [
+        (0.1, 100),
+        (0.1, 100),
+        (0.1, 100),
+        (0.1, 100),
+        (1, 10),
+        (0.001, 4),
+        (0.001, 4),
+        (0.001, 0.75),
+        (0, 4.5),
+        (0, 0.8),
+        (0.001, 3.5),
+        (0.001, 5),
+        (0.001, 0.25),
+        (0.001, 0.9),
+        (0, 4),
+        (0, 1),
+        (1, 6),
+        (0, 2),
+        (0, 2),
+    ]
+)
+# the smallest stability the replay carries forward
+MIN_STABILITY = 0.01
+# optimize stops after this many steps without improvement
+PATIENCE = 10
+# predictions are clipped to [EPSILON, 1 - EPSILON] so the loss stays finite
+EPSILON = 1e-6
+
+
+class ReviewHistory:
+    """
+    The reviews of many cards, padded into one column per card.
+
+    Row t of every array holds each card's (t+1)-th review, cards are sorted by their number of
+    reviews, longest first, so the cards with a (t+1)-th review are the first `lengths[t]` columns.
+
+    Attributes:
+        rating (npt.NDArray[np.int8]): The rating of each review, 0 for padding.
+        elapsed_days (npt.NDArray[np.float64]): The days since the card's previous review.
+        state (npt.NDArray[np.int8]): The card's state before each review.
+        initial_stability (npt.NDArray[np.float64]): The stability of each card before its first review, unused for new cards.
+        initial_difficulty (npt.NDArray[np.float64]): The difficulty of each card before its first review, unused for new cards.
+        lengths (npt.NDArray[np.int64]): The number of cards with at least t+1 reviews, per row.
+        reviews (int): The number of reviews.
+        predictions (int): The number of reviews the loss is computed on, those of cards already studied and a day or more after the previous review.
+    """
+
+    def __init__(
+        self,
+        card_ids: npt.ArrayLike,
+        ratings: npt.ArrayLike,
+        elapsed_days: npt.ArrayLike,
+        states: npt.ArrayLike,
+        stability: Optional[npt.ArrayLike] = None,
+        difficulty: Optional[npt.ArrayLike] = None,
+    ) -> None:
+        """
+        Creates a ReviewHistory from one array-like per column, one entry per review.
+
+        The reviews of a card must be contiguous and in the order they happened. A card whose
+        history doesn't start when it was new needs its stability and difficulty before its first
+        review, cards without them are left out.
+
+        Args:
+            card_ids (npt.ArrayLike): Which card was reviewed.
+            ratings (npt.ArrayLike): The rating of each review.
+            elapsed_days (npt.ArrayLike): The days since the card's previous review.
+            states (npt.ArrayLike): The card's state before each review.
+            stability (Optional[npt.ArrayLike]): The card's stability before each review.
+            difficulty (Optional[npt.ArrayLike]): The card's difficulty before each review.
+
+        Raises:
+            ValueError: If the columns don't all have the same length.
+        """
+        ids: np.ndarray = np.asarray(card_ids)
+        rating_column: np.ndarray = np.asarray(ratings, dtype=np.int8)
+        elapsed: np.ndarray = np.asarray(elapsed_days, dtype=np.float64)
+        state_column: np.ndarray = np.asarray(states, dtype=np.int8)
+        columns = [ids, rating_column, elapsed, state_column]
+        stability_column: Optional[np.ndarray] = None
+        difficulty_column: Optional[np.ndarray] = None
+        if stability is not None and difficulty is not None:
+            stability_column = np.asarray(stability, dtype=np.float64)
+            difficulty_column = np.asarray(difficulty, dtype=np.float64)
+            columns += [stability_column, difficulty_column]
+        if len({len(column) for column in columns}) > 1:
+            raise ValueError("all ReviewHistory columns must have the same length")
+
+        # the start of each card's run of reviews
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else np.zeros(0, dtype=np.int64)
+        lengths = np.diff(np.r_[starts, len(ids)])
+        keep = state_column[starts] == State.New
+        if stability_column is not None:
+            keep |= stability_column[starts] > 0
+        starts, lengths = starts[keep], lengths[keep]
+
+        order = np.argsort(-lengths, kind="stable")
+        starts, lengths = starts[order], lengths[order]
+        max_length = int(lengths[0]) if len(lengths) else 0
+        n_cards = len(starts)
+
+        # review t of card i sits at starts[i] + t
+        step = np.arange(max_length)[:, None]
+        padding = step >= lengths[None, :]
+        index = np.where(padding, 0, starts[None, :] + step)
+        self.rating = np.where(padding, 0, rating_column[index]).astype(np.int8)
+        self.elapsed_days = np.where(padding, 0, elapsed[index]).astype(np.float64)
+        self.state = np.where(padding, State.New, state_column[index]).astype(np.int8)
+        self.initial_stability: np.ndarray
+        self.initial_difficulty: np.ndarray
+        if stability_column is not None and difficulty_column is not None:
+            self.initial_stability = stability_column[starts]
+            self.initial_difficulty = difficulty_column[starts]
+        else:
+            self.initial_stability = np.zeros(n_cards)
+            self.initial_difficulty = np.zeros(n_cards)
+        self.lengths = (lengths[None, :] > step).sum(axis=1)
+        self.reviews = int(lengths.sum())
+        self.predictions = int(((self.state != State.New) & (self.elapsed_days > 0) & ~padding).sum())
+
+    def __len__(self) -> int:
+        return len(self.initial_stability)
+
+    @staticmethod
+    def from_review_logs(histories: list[list[ReviewLog]]) -> "ReviewHistory":
+        """
+        Creates a ReviewHistory from the review logs of each card, oldest first.
+
+        ReviewLog objects don't record stability and difficulty, so only histories that start when
+        the card was new are used.
+
+        Args:
+            histories (list[list[ReviewLog]]): The review logs of each card.
+
+        Returns:
+            ReviewHistory: The reviews of the cards.
+        """
+        logs = [(card_id, log) for card_id, history in enumerate(histories) for log in history]
+        return ReviewHistory(
+            [card_id for card_id, _ in logs],
+            [log.rating for _, log in logs],
+            [log.elapsed_days for _, log in logs],
+            [log.state for _, log in logs],
+        )
+
+
+@dataclass
+class OptimizationResult:
+    """
+    The fitted weights and the loss before and after fitting.
+
+    Attributes:
+        w (tuple[float, ...]): The 19 fitted model weights.
+        initial_loss (float): The log loss with the starting weights.
+        loss (float): The log loss with the fitted weights.
+        steps (int): The number of optimizer steps taken.
+        predictions (int): The number of reviews the loss is computed on.
+    """
+
+    w: tuple[float, ...]
+    initial_loss: float
+    loss: float
+    steps: int
+    predictions: int
+
+
+def log_loss(history: ReviewHistory, w: npt.ArrayLike = DEFAULT_W) -> float:
+    """
+    The log loss of the model's recall predictions for a history.
+
+    Args:
+        history (ReviewHistory): The reviews to predict.
+        w (npt.ArrayLike): The 19 model weights.
+
+    Returns:
+        float: The mean log loss per prediction, 0 if the history has nothing to predict.
+    """
+    return _replay(history, np.asarray(w, dtype=np.float64), gradient=False)[0]
+
+
+def optimize(
+    history: ReviewHistory,
+    w: npt.ArrayLike = DEFAULT_W,
+    steps: int = 100,
+    learning_rate: float = 0.04,
+    tolerance: float = 1e-6,
+) -> OptimizationResult:
+    """
+    Fits the FSRS model weights to a history by minimizing the log loss of its recall predictions.
+
+    Adam steps on the full history, every weight kept within W_BOUNDS, the learning rate decays along
+    a cosine to a tenth of its start. The best weights seen are returned.
+
+    Args:
+        history (ReviewHistory): The reviews to fit.
+        w (npt.ArrayLike): The 19 model weights to start from.
+        steps (int): The most optimizer steps to take.
+        learning_rate (float): The starting learning rate, in weight units per step.
+        tolerance (float): Stops early once the loss hasn't improved by this much for PATIENCE steps.
+
+    Returns:
+        OptimizationResult: The fitted weights and the loss before and after fitting.
+
+    Raises:
+        ValueError: If the history has nothing to predict.
+    """
+    if history.predictions == 0:
+        raise ValueError("the history has no reviews to fit the weights on")
+
+    weights: np.ndarray = np.clip(np.asarray(w, dtype=np.float64), W_BOUNDS[:, 0], W_BOUNDS[:, 1])
+    first_moment = np.zeros_like(weights)
+    second_moment = np.zeros_like(weights)
+    beta1, beta2 = 0.9, 0.999
+
+    initial_loss, _ = _replay(history, weights, gradient=False)
+    best_w, best_loss = weights, initial_loss
+    improved_at, improved_loss = 0, initial_loss
+    step = 0
+    for step in range(1, steps + 1):
+        loss, gradient = _replay(history, weights, gradient=True)
+        if loss < best_loss:
+            best_w, best_loss = weights, loss
+        if loss < improved_loss - tolerance:
+            improved_at, improved_loss = step, loss
+        elif step - improved_at >= PATIENCE:
+            break
+
+        first_moment = beta1 * first_moment + (1 - beta1) * gradient
+        second_moment = beta2 * second_moment + (1 - beta2) * gradient**2
+        rate = learning_rate * (0.55 + 0.45 * np.cos(np.pi * (step - 1) / steps))
+        update = rate * (first_moment / (1 - beta1**step)) / (np.sqrt(second_moment / (1 - beta2**step)) + 1e-8)
+        weights = np.clip(weights - update, W_BOUNDS[:, 0], W_BOUNDS[:, 1])
+
+    loss, _ = _replay(history, weights, gradient=False)
+    if loss < best_loss:
+        best_w, best_loss = weights, loss
+
+    return OptimizationResult(
+        w=tuple(float(weight) for weight in best_w),
+        initial_loss=initial_loss,
+        loss=best_loss,
+        steps=step,
+        predictions=history.predictions,
+    )
+
+
+def _replay(
+    history: ReviewHistory, w: npt.NDArray[np.float64], gradient: bool
+) -> tuple[float, npt.NDArray[np.float64]]:
+    # Replays every card's reviews one step at a time: the retrievability before each review is
+    # predicted from the stability so far, then stability and difficulty are updated the way
+    # FSRS.repeat does for the card's state and rating.
+    #
+    # With gradient set, ds and dd carry the derivative of stability and difficulty with respect to
+    # every weight, one column per weight. Each update's derivative is the previous ds and dd rows
+    # scaled by a per-card factor, plus terms in the few weights the update uses directly, so a step
+    # costs a few in-place operations on the whole (cards, weights) arrays.
+    n_weights = len(w)
+    n_cards = len(history)
+    s = history.initial_stability.copy()
+    d = history.initial_difficulty.copy()
+    ds = np.zeros((n_cards, n_weights))
+    dd = np.zeros((n_cards, n_weights))
+
+    # mean reversion pulls difficulty towards the initial difficulty of an Easy rating
+    d_easy, dd_easy_w4, dd_easy_w5 = (value[0] for value in _init_difficulty(w, np.full(1, float(Rating.Easy))))
+
+    total_loss = 0.0
+    total_gradient = np.zeros(n_weights)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for t, k in enumerate(history.lengths):
+            rating = history.rating[t, :k].astype(np.float64)
+            elapsed = history.elapsed_days[t, :k]
+            state = history.state[t, :k]
+            last_s, last_d = s[:k], d[:k]
+
+            new = state == State.New
+            short_term = (state == State.Learning) | (state == State.Relearning)
+            recalled = rating > Rating.Again
+            recall = ~new & ~short_term & recalled
+            forget = ~new & ~short_term & ~recalled
+            hard = rating == Rating.Hard
+            easy = rating == Rating.Easy
+
+            # the prediction, 1 for new cards, whose stability and difficulty are meaningless
+            safe_s = np.where(new, 1, last_s)
+            safe_d = np.where(new, 1, last_d)
+            base = 1 + FACTOR * elapsed / safe_s
+            r = np.where(new, 1.0, base**DECAY)
+            predicted = ~new & (elapsed > 0)
+            p = np.clip(np.where(recalled, r, 1 - r), EPSILON, 1 - EPSILON)
+            total_loss -= float(np.log(p, where=predicted, out=np.zeros(k)).sum())
+
+            # difficulty
+            init_d, dinit_d_w4, dinit_d_w5 = _init_difficulty(w, rating)
+            shifted = last_d - w[6] * (rating - 3)
+            reverted = w[7] * d_easy + (1 - w[7]) * shifted
+            next_d = np.where(new, init_d, np.clip(reverted, 1, 10))
+
+            # stability
+            rating_index = rating.astype(np.int64) - 1
+            init_s = np.maximum(w[rating_index], 0.1)
+            short_factor = np.exp(w[17] * (rating - 3 + w[18]))
+            short_s = last_s * short_factor
+            # recall: s * (1 + c * b)
+            growth = np.exp(w[8]) * (11 - last_d) * safe_s ** -w[9]
+            hard_penalty = np.where(hard, w[15], 1)
+            easy_bonus = np.where(easy, w[16], 1)
+            c = growth * hard_penalty * easy_bonus
+            exp_b = np.exp((1 - r) * w[10])
+            b = exp_b - 1
+            recall_s = last_s * (1 + c * b)
+            # forget: k * p
+            forget_k = w[11] * safe_d ** -w[12] * np.exp((1 - r) * w[14])
+            power = (last_s + 1) ** w[13]
+            forget_p = power - 1
+            forget_s = forget_k * forget_p
+            next_s = np.select([new, short_term, recalled], [init_s, short_s, recall_s], forget_s)
+            clamped = next_s < MIN_STABILITY
+
+            if gradient:
+                kept = ~clamped
+                dr_ds = np.where(predicted, DECAY * r / base * (-FACTOR * elapsed / safe_s**2), 0)
+                dloss_dr = np.where(predicted, np.where(recalled, -1, 1) / p, 0)
+                # the derivatives so far, updated in place below
+                last_ds, last_dd = ds[:k], dd[:k]
+                total_gradient += (dloss_dr * dr_ds) @ last_ds
+
+                # d(next_s) = by_s * ds + by_d * dd + terms in the weights of the update,
+                # computed before dd is updated
+                recall_growth = np.where(recall & kept, last_s * b * growth, 0)
+                recall_term = recall_growth * hard_penalty * easy_bonus
+                forget_term = np.where(forget & kept, forget_s, 0)
+                short_term_s = np.where(short_term & kept, short_s, 0)
+                by_s = np.select(
+                    [new | clamped, short_term, recalled],
+                    [0, short_factor, 1 + c * b + last_s * c * (-w[9] * b / safe_s - w[10] * exp_b * dr_ds)],
+                    forget_k * (-w[14] * dr_ds * forget_p + power * w[13] / (last_s + 1)),
+                )
+                by_d = -recall_term / (11 - last_d) - forget_term * w[12] / safe_d
+                last_ds *= by_s[:, None]
+                last_ds += last_dd * by_d[:, None]
+                init_rows = np.flatnonzero(new & kept)
+                last_ds[init_rows, rating_index[init_rows]] += w[rating_index[init_rows]] > 0.1
+                last_ds[:, 8] += recall_term
+                last_ds[:, 9] -= recall_term * np.log(safe_s)
+                last_ds[:, 10] += np.where(recall & kept, last_s * c * exp_b * (1 - r), 0)
+                last_ds[:, 15] += np.where(hard, recall_growth, 0)
+                last_ds[:, 16] += np.where(easy, recall_growth, 0)
+                last_ds[:, 11] += forget_term / w[11]
+                last_ds[:, 12] -= forget_term * np.log(safe_d)
+                last_ds[:, 13] += np.where(forget & kept, forget_k * power * np.log(last_s + 1), 0)
+                last_ds[:, 14] += forget_term * (1 - r)
+                last_ds[:, 17] += short_term_s * (rating - 3 + w[18])
+                last_ds[:, 18] += short_term_s * w[17]
+
+                # d(next_d) = (1 - w7) dd + terms in w4..w7
+                reverting = ~new & (reverted > 1) & (reverted < 10)
+                last_dd *= np.where(reverting, 1 - w[7], 0)[:, None]
+                last_dd[:, 4] += np.where(reverting, w[7] * dd_easy_w4, np.where(new, dinit_d_w4, 0))
+                last_dd[:, 5] += np.where(reverting, w[7] * dd_easy_w5, np.where(new, dinit_d_w5, 0))
+                last_dd[:, 6] -= np.where(reverting, (1 - w[7]) * (rating - 3), 0)
+                last_dd[:, 7] += np.where(reverting, d_easy - shifted, 0)
+
+            s[:k] = np.where(clamped, MIN_STABILITY, next_s)
+            d[:k] = next_d
+
+    if history.predictions == 0:
+        return 0.0, total_gradient
+    return total_loss / history.predictions, total_gradient / history.predictions
+
+
+def _init_difficulty(
+    w: npt.NDArray[np.float64], rating: npt.NDArray[np.float64]
+) -> tuple[npt.NDArray[np.float64], npt.NDArray[np.float64], npt.NDArray[np.float64]]:
+    # FSRS.init_difficulty and its derivatives with respect to w4 and w5 (the others are 0)
+    power = np.exp(w[5] * (rating - 1))
+    unclipped = w[4] - power + 1
+    inside = (unclipped > 1) & (unclipped < 10)
+    return np.clip(unclipped, 1, 10), inside.astype(np.float64), np.where(inside, -(rating - 1) * power, 0)
@@ -0,0 +1,444 @@
+"""
+fsrs.vectorized
+---------------
+
+This module defines a columnar representation of many cards and NumPy batch versions of the FSRS scheduler's computations.
+
+It requires numpy, which can be installed with `pip install fsrs[numpy]`.
+
+Classes:
+    CardTable: Columnar table of card state backed by NumPy arrays.
+
+Functions:
+    forgetting_curve: Batch version of FSRS.forgetting_curve.
+    approximate_retrievability: Batch version of FSRS.approximate_retrievability.
+    next_interval: Batch version of FSRS.next_interval.
+    review_cards: Batch version of FSRS.review_card.
+"""
+
+from .models import Card, Rating, State
+from .fsrs import FSRS
+from datetime import datetime, timezone
+from typing import Optional, Union
+import numpy as np
+import numpy.typing as npt
+
+SECONDS_PER_DAY = 86400
+# how many minutes after the review a new card is due again, indexed by rating (Easy is scheduled in days)
+NEW_CARD_MINUTES = np.array([0, 1, 5, 10, 0])
+
+
+class CardTable:
+    """
+    Columnar table of card state backed by NumPy arrays.
+
+    Row i of every array describes the same card. Datetimes are stored as UTC epoch seconds.
+
+    Attributes:
+        due (npt.NDArray[np.float64]): When each card is due next, in epoch seconds.
+        stability (npt.NDArray[np.float64]): Core FSRS parameter used for scheduling.
+        difficulty (npt.NDArray[np.float64]): Core FSRS parameter used for scheduling.
+        elapsed_days (npt.NDArray[np.int64]): The number of days between each card's last two reviews.
+        scheduled_days (npt.NDArray[np.int64]): The number of days until each card is due next.
+        reps (npt.NDArray[np.int64]): The number of times each card has been reviewed.
+        lapses (npt.NDArray[np.float64]): The number of times each card has lapsed. Float since lapses can be weighted.
+        state (npt.NDArray[np.int8]): Each card's current learning state.
+        last_review (npt.NDArray[np.float64]): When each card was last reviewed, in epoch seconds. NaN for cards never reviewed.
+    """
+
+    due: npt.NDArray[np.float64]
+    stability: npt.NDArray[np.float64]
+    difficulty: npt.NDArray[np.float64]
+    elapsed_days: npt.NDArray[np.int64]
+    scheduled_days: npt.NDArray[np.int64]
+    reps: npt.NDArray[np.int64]
+    lapses: npt.NDArray[np.float64]
+    state: npt.NDArray[np.int8]
+    last_review: npt.NDArray[np.float64]
+
+    def __init__(
+        self,
+        due: npt.ArrayLike,
+        stability: npt.ArrayLike,
+        difficulty: npt.ArrayLike,
+        elapsed_days: npt.ArrayLike,
+        scheduled_days: npt.ArrayLike,
+        reps: npt.ArrayLike,
+        lapses: npt.ArrayLike,
+        state: npt.ArrayLike,
+        last_review: npt.ArrayLike,
+    ) -> None:
+        """
+        Creates a CardTable from one array-like per column. All columns must have the same length.
+
+        Args:
+            due (npt.ArrayLike): When each card is due next, in epoch seconds.
+            stability (npt.ArrayLike): Core FSRS parameter used for scheduling.
+            difficulty (npt.ArrayLike): Core FSRS parameter used for scheduling.
+            elapsed_days (npt.ArrayLike): The number of days between each card's last two reviews.
+            scheduled_days (npt.ArrayLike): The number of days until each card is due next.
+            reps (npt.ArrayLike): The number of times each card has been reviewed.
+            lapses (npt.ArrayLike): The number of times each card has lapsed.
+            state (npt.ArrayLike): Each card's current learning state.
+            last_review (npt.ArrayLike): When each card was last reviewed, in epoch seconds. NaN for cards never reviewed.
+
+        Raises:
+            ValueError: If the columns don't all have the same length.
+        """
+        self.due = np.asarray(due, dtype=np.float64)
+        self.stability = np.asarray(stability, dtype=np.float64)
+        self.difficulty = np.asarray(difficulty, dtype=np.float64)
+        self.elapsed_days = np.asarray(elapsed_days, dtype=np.int64)
+        self.scheduled_days = np.asarray(scheduled_days, dtype=np.int64)
+        self.reps = np.asarray(reps, dtype=np.int64)
+        self.lapses = np.asarray(lapses, dtype=np.float64)
+        self.state = np.asarray(state, dtype=np.int8)
+        self.last_review = np.asarray(last_review, dtype=np.float64)
+
+        lengths = {len(column) for column in self._columns()}
+        if len(lengths) > 1:
+            raise ValueError("all CardTable columns must have the same length")
+
+    def _columns(self) -> tuple[np.ndarray, ...]:
+        return (
+            self.due,
+            self.stability,
+            self.difficulty,
+            self.elapsed_days,
+            self.scheduled_days,
+            self.reps,
+            self.lapses,
+            self.state,
+            self.last_review,
+        )
+
+    def __len__(self) -> int:
+        return len(self.due)
+
+    @staticmethod
+    def from_cards(cards: list[Card]) -> "CardTable":
+        """
+        Creates a CardTable from a list of Card objects.
+
+        Args:
+            cards (list[Card]): The cards to store, row i holds cards[i].
+
+        Returns:
+            CardTable: A CardTable holding the state of the given cards.
+        """
+        return CardTable(
+            due=[card.due_timestamp for card in cards],
+            stability=[card.stability for card in cards],
+            difficulty=[card.difficulty for card in cards],
+            elapsed_days=[card.elapsed_days for card in cards],
+            scheduled_days=[card.scheduled_days for card in cards],
+            reps=[card.reps for card in cards],
+            lapses=[card.lapses for card in cards],
+            state=[card.state for card in cards],
+            last_review=[
+                card.last_review_timestamp if card.last_review_timestamp is not None else np.nan
+                for card in cards
+            ],
+        )
+
+    def to_cards(self) -> list[Card]:
+        """
+        Converts every row of the CardTable back to a Card object.
+
+        Returns:
+            list[Card]: One Card object per row.
+        """
+        cards = []
+        for i in range(len(self)):
+            cards.append(
+                Card.from_compact(
+                    [
+                        self.due[i],
+                        self.stability[i],
+                        self.difficulty[i],
+                        self.elapsed_days[i],
+                        self.scheduled_days[i],
+                        self.reps[i],
+                        _as_python_number(self.lapses[i]),
+                        self.state[i],
+                        None if np.isnan(self.last_review[i]) else self.last_review[i],
+                    ]
+                )
+            )
+        return cards
+
+    def get_retrievability(self, now: Optional[datetime] = None) -> npt.NDArray[np.float64]:
+        """
+        Calculates the current retrievability of every card for a given date and time.
+
+        Batch version of Card.get_retrievability.
+
+        Args:
+            now (Optional[datetime]): The current date and time.
+
+        Returns:
+            npt.NDArray[np.float64]: The retrievability of each card, 0 for New cards.
+        """
+        DECAY = -0.5
+        FACTOR = 0.9 ** (1 / DECAY) - 1
+
+        now_ts = _timestamp(now)
+        reviewed = self.state != State.New
+        # the same whole days timedelta.days gives, clamped at 0
+        elapsed_days = np.maximum(
+            0, np.floor((now_ts - self.last_review[reviewed]) / SECONDS_PER_DAY)
+        )
+
+        retrievability = np.zeros(len(self), dtype=np.float64)
+        retrievability[reviewed] = (
+            1 + FACTOR * elapsed_days / self.stability[reviewed]
+        ) ** DECAY
+        return retrievability
+
+    def due_mask(self, now: Optional[datetime] = None) -> npt.NDArray[np.bool_]:
+        """
+        Returns which cards are due at a given date and time.
+
+        Args:
+            now (Optional[datetime]): The current date and time.
+
+        Returns:
+            npt.NDArray[np.bool_]: True for every card whose due date is at or before `now`.
+        """
+        return self.due <= _timestamp(now)
+
+
+def forgetting_curve(
+    scheduler: FSRS, elapsed_days: npt.ArrayLike, stability: npt.ArrayLike
+) -> npt.NDArray[np.float64]:
+    """
+    Batch version of FSRS.forgetting_curve.
+
+    Args:
+        scheduler (FSRS): The scheduler whose constants are used.
+        elapsed_days (npt.ArrayLike): The number of days since each card was last reviewed.
+        stability (npt.ArrayLike): The stability of each card.
+
+    Returns:
+        npt.NDArray[np.float64]: The probability of recalling each card.
+            Where the scalar version returns a complex number (negative elapsed days), this is its real part.
+    """
+    elapsed_days = np.asarray(elapsed_days, dtype=np.float64)
+    stability = np.asarray(stability, dtype=np.float64)
+    base = 1 + scheduler.FACTOR * elapsed_days / stability
+    # a negative base raised to DECAY has the argument pi, the real part is scaled by cos(pi * DECAY)
+    return np.abs(base) ** scheduler.DECAY * np.where(
+        base < 0, np.cos(np.pi * scheduler.DECAY), 1.0
+    )
+
+
+def approximate_retrievability(
+    scheduler: FSRS, table: CardTable
+) -> npt.NDArray[np.float64]:
+    """
+    Batch version of FSRS.approximate_retrievability.
+
+    Args:
+        scheduler (FSRS): The scheduler whose constants are used.
+        table (CardTable): The cards.
+
+    Returns:
+        npt.NDArray[np.float64]: The approximate retrievability of each card.
+    """
+    return forgetting_curve(scheduler, table.elapsed_days, table.stability)
+
+
+def next_interval(scheduler: FSRS, stability: npt.ArrayLike) -> npt.NDArray[np.int64]:
+    """
+    Batch version of FSRS.next_interval.
+
+    Args:
+        scheduler (FSRS): The scheduler whose parameters are used.
+        stability (npt.ArrayLike): The stability of each card.
+
+    Returns:
+        npt.NDArray[np.int64]: The next interval of each card in days.
+    """
+    stability = np.asarray(stability, dtype=np.float64)
+    new_interval = (
+        stability
+        / scheduler.FACTOR
+        * (scheduler.p.request_retention ** (1 / scheduler.DECAY) - 1)
+    )
+    # np.round rounds half to even, just like the built-in round
+    return np.clip(np.round(new_interval), 1, scheduler.p.maximum_interval).astype(
+        np.int64
+    )
+
+
+def review_cards(
+    scheduler: FSRS,
+    table: CardTable,
+    ratings: npt.ArrayLike,
+    now: Optional[datetime] = None,
+    weight: float = 1,
+) -> CardTable:
+    """
+    Reviews every card of a CardTable at the same time.
+
+    Batch version of FSRS.review_card: row i of the result is the card row i is reviewed to with ratings[i].
+    The review logs follow from the result: the rating, the result's scheduled_days and elapsed_days,
+    `now` and the state of the card before the review.
+
+    Args:
+        scheduler (FSRS): The scheduler whose parameters are used.
+        table (CardTable): The cards being reviewed.
+        ratings (npt.ArrayLike): The rating of each card, or one rating for all of them.
+        now (Optional[datetime]): The date and time of the reviews.
+        weight (float): Scales the due dates of new cards.
+
+    Returns:
+        CardTable: The reviewed cards.
+    """
+    w = scheduler.p.w
+    now_ts = _timestamp(now)
+    n = len(table)
+    ratings = np.broadcast_to(np.asarray(ratings, dtype=np.int64), (n,))
+
+    state = table.state
+    new = state == State.New
+    review = state == State.Review
+    learning = ~new & ~review
+
+    elapsed_days = np.zeros(n, dtype=np.int64)
+    elapsed_days[~new] = np.floor(
+        (now_ts - table.last_review[~new]) / SECONDS_PER_DAY
+    )
+
+    stability = np.empty(n, dtype=np.float64)
+    difficulty = np.empty(n, dtype=np.float64)
+    scheduled_days = table.scheduled_days.copy()
+    due = np.empty(n, dtype=np.float64)
+    next_state = state.copy()
+    lapses = table.lapses.copy()
+
+    # New cards get their initial stability and difficulty, and are due again in minutes unless rated Easy
+    r = ratings[new]
+    stability[new] = np.maximum(np.asarray(w[:4])[r - 1], 0.1)
+    difficulty[new] = _init_difficulty(w, r)
+    due[new] = now_ts + NEW_CARD_MINUTES[r] * 60 * weight
+    next_state[new] = np.where(r == Rating.Easy, State.Review, State.Learning)
+    easy = np.flatnonzero(new)[r == Rating.Easy]
+    scheduled_days[easy] = next_interval(scheduler, stability[easy])
+    due[easy] = now_ts + scheduled_days[easy] * SECONDS_PER_DAY * weight
+
+    reviewed = ~new
+    r = ratings[reviewed]
+    last_d = table.difficulty[reviewed]
+    # mean reversion towards the initial difficulty of an Easy rating
+    difficulty[reviewed] = np.clip(
+        w[7] * _init_difficulty(w, Rating.Easy) + (1 - w[7]) * (last_d - w[6] * (r - 3)),
+        1,
+        10,
+    )
+
+    # Learning and Relearning cards get short term stabilities
+    r = ratings[learning]
+    last_s = table.stability[learning]
+    stability[learning] = _short_term_stability(w, last_s, r)
+    good_interval = next_interval(scheduler, _short_term_stability(w, last_s, Rating.Good))
+    interval = next_interval(scheduler, stability[learning])
+    scheduled_days[learning] = np.select(
+        [r == Rating.Good, r == Rating.Easy],
+        [interval, np.maximum(interval, good_interval + 1)],
+        0,
+    )
+
+    # Review cards, where the hard, good and easy intervals are adjusted against each other
+    r = ratings[review]
+    last_d = table.difficulty[review]
+    last_s = table.stability[review]
+    retrievability = forgetting_curve(scheduler, elapsed_days[review], last_s)
+    hard_stability = _recall_stability(w, last_d, last_s, retrievability, Rating.Hard)
+    good_stability = _recall_stability(w, last_d, last_s, retrievability, Rating.Good)
+    easy_stability = _recall_stability(w, last_d, last_s, retrievability, Rating.Easy)
+    forget_stability = (
+        w[11]
+        * np.power(last_d, -w[12])
+        * (np.power(last_s + 1, w[13]) - 1)
+        * np.exp((1 - retrievability) * w[14])
+    )
+    hard_interval = next_interval(scheduler, hard_stability)
+    good_interval = next_interval(scheduler, good_stability)
+    hard_interval = np.minimum(hard_interval, good_interval)
+    good_interval = np.maximum(good_interval, hard_interval + 1)
+    easy_interval = np.maximum(next_interval(scheduler, easy_stability), good_interval + 1)
+    stability[review] = np.choose(
+        r - 1, [forget_stability, hard_stability, good_stability, easy_stability]
+    )
+    scheduled_days[review] = np.choose(
+        r - 1, [np.zeros_like(hard_interval), hard_interval, good_interval, easy_interval]
+    )
+
+    # Again is due in 5 minutes and lapses Review cards, Hard keeps Learning and Relearning
+    # cards where they are for 10 minutes, everything else moves to Review
+    again = reviewed & (ratings == Rating.Again)
+    hard_learning = learning & (ratings == Rating.Hard)
+    to_review = reviewed & ~again & ~hard_learning
+    scheduled_days[again] = 0
+    due[again] = now_ts + 5 * 60
+    next_state[again & review] = State.Relearning
+    lapses[again & review] += 1 * weight
+    due[hard_learning] = now_ts + 10 * 60
+    next_state[to_review] = State.Review
+    due[to_review] = now_ts + scheduled_days[to_review] * SECONDS_PER_DAY
+
+    return CardTable(
+        due=due,
+        stability=stability,
+        difficulty=difficulty,
+        elapsed_days=elapsed_days,
+        scheduled_days=scheduled_days,
+        reps=table.reps + 1,
+        lapses=lapses,
+        state=next_state,
+        last_review=np.full(n, now_ts),
+    )
+
+
+def _init_difficulty(
+    w: tuple[float, ...], ratings: npt.ArrayLike
+) -> npt.NDArray[np.float64]:
+    return np.clip(w[4] - np.exp(w[5] * (np.asarray(ratings) - 1)) + 1, 1, 10)
+
+
+def _short_term_stability(
+    w: tuple[float, ...], stability: npt.NDArray[np.float64], ratings: npt.ArrayLike
+) -> npt.NDArray[np.float64]:
+    return stability * np.exp(w[17] * (np.asarray(ratings) - 3 + w[18]))
+
+
+def _recall_stability(
+    w: tuple[float, ...],
+    d: npt.NDArray[np.float64],
+    s: npt.NDArray[np.float64],
+    r: npt.NDArray[np.float64],
+    rating: Rating,
+) -> npt.NDArray[np.float64]:
+    hard_penalty = w[15] if rating == Rating.Hard else 1
+    easy_bonus = w[16] if rating == Rating.Easy else 1
+    return s * (
+        1
+        + np.exp(w[8])
+        * (11 - d)
+        * np.power(s, -w[9])
+        * (np.exp((1 - r) * w[10]) - 1)
+        * hard_penalty
+        * easy_bonus
+    )
+
+
+def _timestamp(now: Optional[datetime]) -> float:
+    if now is None:
+        now = datetime.now(timezone.utc)
+    return now.timestamp()
+
+
+def _as_python_number(value: np.floating) -> Union[float, int]:
+    # lapses are whole numbers unless a weighted review added a fraction
+    return int(value) if float(value).is_integer() else float(value)
@@ -1,6 +1,7 @@
 from fsrs import FSRS, Card, ReviewLog, State, Rating
 from datetime import datetime, timedelta, timezone
 import json
+import random
 import pytest
 
 test_w = (
@@ -146,7 +147,7 @@ class TestPyFSRS:
 
         # card object is not naturally JSON serializable
         with pytest.raises(TypeError):
-            json.dumps(card.__dict__)
+            json.dumps(card)
 
         # card object's to_dict() method makes it JSON serializable
         assert type(json.dumps(card.to_dict())) == str
@@ -155,7 +156,7 @@ class TestPyFSRS:
         card_dict = card.to_dict()
         copied_card = Card.from_dict(card_dict)
 
-        assert vars(card) == vars(copied_card)
+        assert card.to_compact() == copied_card.to_compact()
         assert card.to_dict() == copied_card.to_dict()
 
         # (x2) perform the above tests once more with a repeated card
@@ -163,20 +164,50 @@ class TestPyFSRS:
         repeated_card = scheduling_cards[Rating.Good].card
 
         with pytest.raises(TypeError):
-            json.dumps(repeated_card.__dict__)
+            json.dumps(repeated_card)
 
         assert type(json.dumps(repeated_card.to_dict())) == str
 
         repeated_card_dict = repeated_card.to_dict()
         copied_repeated_card = Card.from_dict(repeated_card_dict)
 
-        assert vars(repeated_card) == vars(copied_repeated_card)
+        assert repeated_card.to_compact() == copied_repeated_card.to_compact()
         assert repeated_card.to_dict() == copied_repeated_card.to_dict()
 
         # original card and repeated card are different
-        assert vars(card) != vars(repeated_card)
+        assert card.to_compact() != repeated_card.to_compact()
         assert card.to_dict() != repeated_card.to_dict()
 
+    def test_Card_compact(self):
+        f = FSRS()
+        now = datetime(2022, 11, 29, 12, 30, 0, 123456, timezone.utc)
+
+        card = Card(due=now)
+        # slotted, and never reviewed
+        assert not hasattr(card, "__dict__")
+        assert not hasattr(card, "last_review")
+        assert Card.from_compact(json.loads(json.dumps(card.to_compact()))).to_dict() == card.to_dict()
+
+        for rating in (Rating.Good, Rating.Good, Rating.Again):
+            card, review_log = f.review_card(card, rating, now=now)
+            now = card.due
+
+            # the compact form survives JSON and gives back the same card
+            copied_card = Card.from_compact(json.loads(json.dumps(card.to_compact())))
+            assert copied_card.to_compact() == card.to_compact()
+            assert copied_card.due == card.due
+            assert copied_card.last_review == card.last_review
+
+            # dicts with ISO times (db.json) and with epoch seconds are both read
+            card_dict = card.to_dict()
+            assert Card.from_dict(card_dict).to_compact() == card.to_compact()
+            card_dict["due"] = card.due_timestamp
+            card_dict["last_review"] = card.last_review_timestamp
+            assert Card.from_dict(card_dict).to_compact() == card.to_compact()
+
+            copied_review_log = ReviewLog.from_compact(json.loads(json.dumps(review_log.to_compact())))
+            assert copied_review_log.to_dict() == review_log.to_dict()
+
     def test_ReviewLog_serialize(self):
         f = FSRS()
 
@@ -190,7 +221,7 @@ class TestPyFSRS:
 
         # ReviewLog object is not naturally JSON serializable
         with pytest.raises(TypeError):
-            json.dumps(review_log.__dict__)
+            json.dumps(review_log)
 
         # review_log object's to_dict() method makes it JSON serializable
         assert type(json.dumps(review_log.to_dict())) == str
@@ -198,7 +229,7 @@ class TestPyFSRS:
         # we can reconstruct a copy of the review_log object equivalent to the original
         review_log_dict = review_log.to_dict()
         copied_review_log = ReviewLog.from_dict(review_log_dict)
-        assert vars(review_log) == vars(copied_review_log)
+        assert review_log.to_compact() == copied_review_log.to_compact()
         assert review_log.to_dict() == copied_review_log.to_dict()
 
         # (x2) perform the above tests once more with a review_log from a repeated card
@@ -208,18 +239,18 @@ class TestPyFSRS:
         next_review_log = scheduling_cards[rating].review_log
 
         with pytest.raises(TypeError):
-            json.dumps(next_review_log.__dict__)
+            json.dumps(next_review_log)
 
         assert type(json.dumps(next_review_log.to_dict())) == str
 
         next_review_log_dict = next_review_log.to_dict()
         copied_next_review_log = ReviewLog.from_dict(next_review_log_dict)
 
-        assert vars(next_review_log) == vars(copied_next_review_log)
+        assert next_review_log.to_compact() == copied_next_review_log.to_compact()
         assert next_review_log.to_dict() == copied_next_review_log.to_dict()
 
         # original review log and next review log are different
-        assert vars(review_log) != vars(next_review_log)
+        assert review_log.to_compact() != next_review_log.to_compact()
         assert review_log.to_dict() != next_review_log.to_dict()
 
     def test_custom_scheduler_args(self):
@@ -338,3 +369,85 @@ class TestPyFSRS:
         assert card.state == State.Relearning
         retrievability = card.get_retrievability()
         assert 0 <= retrievability <= 1
+
+    def test_review_card_matches_repeat(self):
+        f = FSRS(w=test_w)
+        rng = random.Random(42)
+
+        for _ in range(200):
+            card = Card(due=datetime(2022, 11, 29, 12, 30, 0, 0, timezone.utc))
+            now = card.due
+            weight = rng.choice([1, 0.5, 2])
+            for _ in range(12):
+                rating = rng.choice(list(Rating))
+                expected = f.repeat(card, now, weight)[rating]
+                reviewed_card, review_log = f.review_card(card, rating, weight, now)
+
+                assert reviewed_card.to_dict() == expected.card.to_dict()
+                assert review_log.to_dict() == expected.review_log.to_dict()
+
+                card = reviewed_card
+                now = card.due + timedelta(days=rng.choice([0, 0, 1, 3, 10]))
+
+    def test_review_many(self):
+        f = FSRS(w=test_w)
+        now = datetime(2022, 11, 29, 12, 30, 0, 0, timezone.utc)
+        cards = [Card(due=now)]
+        for rating in (Rating.Good, Rating.Good, Rating.Again, Rating.Easy):
+            cards.append(f.review_card(cards[-1], rating, now=now)[0])
+            now = cards[-1].due
+
+        ratings = [Rating.Good, Rating.Again, Rating.Hard, Rating.Easy, Rating.Good]
+        reviewed = f.review_many(cards, ratings, now)
+
+        # the same as reviewing the cards one by one, at one time
+        for card, rating, (reviewed_card, review_log) in zip(cards, ratings, reviewed):
+            expected_card, expected_log = f.review_card(card, rating, now=now)
+            assert reviewed_card.to_dict() == expected_card.to_dict()
+            assert review_log.to_dict() == expected_log.to_dict()
+            assert reviewed_card.last_review == now
+
+        with pytest.raises(ValueError):
+            f.review_many(cards, ratings[:2], now)
+
+    def test_parameters_file(self, tmp_path, monkeypatch):
+        from fsrs.models import DEFAULT_W, load_parameters, save_parameters
+
+        path = str(tmp_path / "fsrs_parameters.json")
+        assert load_parameters(path) is None
+
+        save_parameters(test_w, path, log_loss=0.3)
+        assert load_parameters(path) == test_w
+        with open(path) as f:
+            assert json.load(f)["default"]["log_loss"] == 0.3
+
+        # weights are kept per user, saving one user's keeps the others'
+        other_w = tuple(weight * 1.1 for weight in test_w)
+        save_parameters(other_w, path, user="alice")
+        assert load_parameters(path, user="alice") == other_w
+        assert load_parameters(path) == test_w
+        assert load_parameters(path, user="bob") is None
+
+        # FSRS() picks up the user's entry, given weights win
+        monkeypatch.setenv("FSRS_PARAMETERS_FILE", path)
+        assert FSRS().p.w == test_w
+        assert FSRS(user="alice").p.w == other_w
+        assert FSRS(user="bob").p.w == DEFAULT_W
+        assert FSRS(w=DEFAULT_W, user="alice").p.w == DEFAULT_W
+
+        # a file from before weights were kept per user belongs to the user it was fitted to
+        with open(path, "w") as f:
+            json.dump({"w": list(other_w), "user": "alice"}, f)
+        assert load_parameters(path, user="alice") == other_w
+        assert load_parameters(path) is None
+
+        monkeypatch.setenv("FSRS_PARAMETERS_FILE", str(tmp_path / "missing.json"))
+        assert FSRS().p.w == DEFAULT_W
+
+        with open(path, "w") as f:
+            json.dump({"default": {"w": [1.0, 2.0]}}, f)
+        monkeypatch.setenv("FSRS_PARAMETERS_FILE", path)
+        with pytest.raises(ValueError):
+            FSRS()
+        with pytest.raises(ValueError):
+            save_parameters((1.0, 2.0), path)
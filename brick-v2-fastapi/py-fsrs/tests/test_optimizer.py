@@ -0,0 +1,140 @@
+from fsrs import FSRS, Card, Rating, State
+from fsrs.models import DEFAULT_W
+from datetime import datetime, timedelta, timezone
+import math
+import random
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from fsrs.optimizer import (  # noqa: E402
+    W_BOUNDS,
+    ReviewHistory,
+    _replay,
+    log_loss,
+    optimize,
+)
+
+TRUE_W = (1.0, 2.5, 6.0, 25.0) + DEFAULT_W[4:8] + (1.3, DEFAULT_W[9], 1.4) + DEFAULT_W[11:16] + (2.0,) + DEFAULT_W[17:]
+
+
+def simulate(w, n=300, reviews=10, seed=42):
+    # reviews scheduled by FSRS with weights w, recalled with the probability the model predicts
+    rng = random.Random(seed)
+    f = FSRS(w=w)
+    start = datetime(2024, 11, 1, 12, 0, 0, 0, timezone.utc)
+    columns = {"card_ids": [], "ratings": [], "elapsed_days": [], "states": []}
+    predictions = []
+    for card_id in range(n):
+        card = Card(due=start)
+        review_time = start
+        for i in range(reviews):
+            if i:
+                review_time = max(
+                    card.due + timedelta(days=rng.uniform(-0.3, 1.0) * card.scheduled_days),
+                    card.last_review + timedelta(minutes=1),
+                )
+            elapsed_days = (review_time - card.last_review).days if i else 0
+            retrievability = f.forgetting_curve(elapsed_days, card.stability) if i else 1.0
+            if rng.random() < retrievability:
+                rating = rng.choice((Rating.Hard, Rating.Good, Rating.Good, Rating.Easy))
+            else:
+                rating = Rating.Again
+            if i and elapsed_days > 0:
+                predictions.append(retrievability if rating != Rating.Again else 1 - retrievability)
+            columns["card_ids"].append(card_id)
+            columns["ratings"].append(rating)
+            columns["elapsed_days"].append(elapsed_days)
+            columns["states"].append(card.state)
+            card, _ = f.review_card(card, rating, now=review_time)
+    return columns, predictions
+
+
+class TestOptimizer:
+    def test_history_layout(self):
+        # card 7 starts new, card 3 starts mid-way without stability and is left out
+        history = ReviewHistory(
+            [7, 7, 7, 3, 3],
+            [3, 3, 1, 3, 4],
+            [0, 0, 4, 2, 9],
+            [State.New, State.Learning, State.Review, State.Review, State.Review],
+        )
+        assert len(history) == 1
+        assert history.reviews == 3
+        assert history.predictions == 1
+        assert list(history.lengths) == [1, 1, 1]
+
+        history = ReviewHistory(
+            [7, 7, 7, 3, 3],
+            [3, 3, 1, 3, 4],
+            [0, 0, 4, 2, 9],
+            [State.New, State.Learning, State.Review, State.Review, State.Review],
+            stability=[0, 0.5, 3, 10, 12],
+            difficulty=[0, 5, 5, 4, 4],
+        )
+        assert len(history) == 2
+        assert history.reviews == 5
+        assert history.predictions == 3
+        assert list(history.lengths) == [2, 2, 1]
+        assert list(history.initial_stability) == [0, 10]
+
+    def test_columns_must_have_same_length(self):
+        with pytest.raises(ValueError):
+            ReviewHistory([1, 1], [3], [0, 1], [0, 1])
+
+    def test_log_loss_matches_scalar(self):
+        columns, predictions = simulate(DEFAULT_W)
+        history = ReviewHistory(**columns)
+
+        assert history.predictions == len(predictions)
+        expected = -sum(math.log(p) for p in predictions) / len(predictions)
+        assert log_loss(history) == pytest.approx(expected)
+
+    def test_gradient_matches_finite_differences(self):
+        columns, _ = simulate(DEFAULT_W, n=50)
+        history = ReviewHistory(**columns)
+        rng = np.random.default_rng(0)
+        lower, upper = W_BOUNDS[:, 0], W_BOUNDS[:, 1]
+        w = rng.uniform(lower + 0.1 * (upper - lower), upper - 0.1 * (upper - lower))
+
+        _, gradient = _replay(history, w, gradient=True)
+        for i in range(len(w)):
+            step = np.eye(len(w))[i] * 1e-6
+            expected = (log_loss(history, w + step) - log_loss(history, w - step)) / 2e-6
+            assert gradient[i] == pytest.approx(expected, rel=1e-4, abs=1e-7)
+
+    def test_optimize(self):
+        columns, _ = simulate(TRUE_W)
+        history = ReviewHistory(**columns)
+
+        result = optimize(history)
+        assert result.initial_loss == pytest.approx(log_loss(history))
+        assert result.loss == pytest.approx(log_loss(history, result.w))
+        assert result.loss < result.initial_loss
+        # as good as the weights the reviews were simulated with
+        assert result.loss < log_loss(history, TRUE_W) + 0.002
+        assert all(low <= weight <= high for weight, (low, high) in zip(result.w, W_BOUNDS))
+
+        f = FSRS(w=result.w)
+        assert f.p.w == result.w
+
+    def test_optimize_needs_predictions(self):
+        history = ReviewHistory([1], [3], [0], [State.New])
+        with pytest.raises(ValueError):
+            optimize(history)
+
+    def test_from_review_logs(self):
+        f = FSRS()
+        now = datetime(2024, 11, 1, 12, 0, 0, 0, timezone.utc)
+        histories = []
+        for ratings in ((Rating.Good, Rating.Good, Rating.Again), (Rating.Easy, Rating.Good)):
+            card = Card(due=now)
+            logs = []
+            for rating in ratings:
+                card, review_log = f.review_card(card, rating, now=max(card.due, now))
+                logs.append(review_log)
+            histories.append(logs)
+
+        history = ReviewHistory.from_review_logs(histories)
+        assert len(history) == 2
+        assert history.reviews == 5
@@ -0,0 +1,134 @@
+from fsrs import FSRS, Card, Rating, State
+from datetime import datetime, timedelta, timezone
+import random
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from fsrs.vectorized import (  # noqa: E402
+    CardTable,
+    approximate_retrievability,
+    forgetting_curve,
+    next_interval,
+    review_cards,
+)
+
+
+def make_cards(n=200, seed=42):
+    rng = random.Random(seed)
+    f = FSRS()
+    now = datetime(2024, 11, 1, 12, 0, 0, 0, timezone.utc)
+    cards = []
+    for _ in range(n):
+        card = Card(due=now)
+        review_time = now
+        for _ in range(rng.randint(0, 8)):
+            rating = rng.choice((Rating.Again, Rating.Hard, Rating.Good, Rating.Easy))
+            card, _ = f.review_card(card, rating, now=review_time)
+            review_time = card.due + timedelta(hours=rng.randint(0, 72))
+        cards.append(card)
+    return cards
+
+
+class TestVectorized:
+    def test_round_trip(self):
+        cards = make_cards()
+        table = CardTable.from_cards(cards)
+
+        assert len(table) == len(cards)
+        assert [card.to_dict() for card in table.to_cards()] == [
+            card.to_dict() for card in cards
+        ]
+
+    def test_columns_must_have_same_length(self):
+        with pytest.raises(ValueError):
+            CardTable([0.0], [1.0], [1.0], [0], [0], [0], [0], [0], [0.0, 1.0])
+
+    def test_retrievability_matches_scalar(self):
+        cards = make_cards()
+        table = CardTable.from_cards(cards)
+
+        for days in (0, 1, 7, 30, 365):
+            now = datetime(2024, 12, 1, 12, 0, 0, 0, timezone.utc) + timedelta(days=days)
+            expected = [card.get_retrievability(now) for card in cards]
+            assert np.allclose(table.get_retrievability(now), expected)
+
+        # new cards have no retrievability
+        assert State.New in table.state
+        assert np.all(table.get_retrievability()[table.state == State.New] == 0)
+
+    def test_approximate_retrievability_matches_scalar(self):
+        f = FSRS()
+        cards = [card for card in make_cards() if card.state != State.New]
+        table = CardTable.from_cards(cards)
+
+        expected = [f.approximate_retrievability(card) for card in cards]
+        assert np.allclose(approximate_retrievability(f, table), expected)
+
+        # cards reviewed before their last review have negative elapsed days,
+        # the scalar version returns a complex number for those
+        elapsed_days = [-61, -5, 0, 3]
+        stability = [6.98, 0.5, 1.2, 4.0]
+        expected = [complex(f.forgetting_curve(e, s)).real for e, s in zip(elapsed_days, stability)]
+        assert np.allclose(forgetting_curve(f, elapsed_days, stability), expected)
+
+        elapsed_days = np.arange(100)
+        stability = np.linspace(0.1, 500, 100)
+        expected = [f.forgetting_curve(e, s) for e, s in zip(elapsed_days, stability)]
+        assert np.allclose(forgetting_curve(f, elapsed_days, stability), expected)
+
+    def test_next_interval_matches_scalar(self):
+        f = FSRS(request_retention=0.85, maximum_interval=3650)
+        stability = np.concatenate(
+            [np.linspace(0.01, 20000, 5000), np.array([0.5, 1.5, 2.5, 1e6])]
+        )
+
+        expected = [f.next_interval(s) for s in stability]
+        assert next_interval(f, stability).tolist() == expected
+
+    def test_due_mask(self):
+        cards = make_cards()
+        table = CardTable.from_cards(cards)
+        now = datetime(2024, 11, 20, 0, 0, 0, 0, timezone.utc)
+
+        assert table.due_mask(now).tolist() == [card.due <= now for card in cards]
+
+    def test_review_cards_matches_scalar(self):
+        f = FSRS()
+        rng = random.Random(7)
+        cards = make_cards(500)
+        table = CardTable.from_cards(cards)
+        last_review = max(card.last_review for card in cards if hasattr(card, "last_review"))
+
+        for weight in (1, 0.5):
+            for days in (0.01, 3, 40):
+                now = last_review + timedelta(days=days)
+                ratings = [rng.choice(list(Rating)) for _ in cards]
+                reviewed = review_cards(f, table, ratings, now, weight).to_cards()
+
+                for card, rating, reviewed_card in zip(cards, ratings, reviewed):
+                    expected, _ = f.review_card(card, rating, weight, now)
+                    assert reviewed_card.state == expected.state
+                    assert reviewed_card.scheduled_days == expected.scheduled_days
+                    assert reviewed_card.elapsed_days == expected.elapsed_days
+                    assert reviewed_card.reps == expected.reps
+                    assert reviewed_card.lapses == expected.lapses
+                    assert reviewed_card.last_review == expected.last_review
+                    assert reviewed_card.due_timestamp == pytest.approx(expected.due_timestamp, abs=1e-6)
+                    assert reviewed_card.stability == pytest.approx(expected.stability, rel=1e-9)
+                    assert reviewed_card.difficulty == pytest.approx(expected.difficulty, rel=1e-9)
+
+    def test_review_many_vectorized(self):
+        f = FSRS()
+        cards = make_cards(300)
+        now = max(card.last_review for card in cards if hasattr(card, "last_review")) + timedelta(days=2)
+        ratings = [Rating.Good if i % 3 else Rating.Again for i in range(len(cards))]
+
+        reviewed = f.review_many(cards, ratings, now)
+
+        assert len(reviewed) == len(cards)
+        for card, rating, (reviewed_card, review_log) in zip(cards, ratings, reviewed):
+            expected_card, expected_log = f.review_card(card, rating, now=now)
+            assert reviewed_card.scheduled_days == expected_card.scheduled_days
+            assert reviewed_card.stability == pytest.approx(expected_card.stability, rel=1e-9)
+            assert review_log.to_dict() == expected_log.to_dict()
@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import threading
+from typing import NamedTuple, Optional
+from dotenv import load_dotenv
+from card_store import DEFAULT_USER
+
+load_dotenv()
+
+# Every review, with the card state before and after it, appended to a SQLite table
+# (REVIEW_LOG_FILE). Words and sentences are stored once in their own tables and
+# referenced by integer id, so a review row is a handful of numbers. The
+# (user, word_id, reviewed_at) and (user, reviewed_at) indexes make the history of a
+# word and a time range index scans, and columns() hands a range to analytics and
+# parameter fitting as numpy arrays.
+#
+# LearnerState.apply_reviews queues the rows and its background flush appends them.
+
+# empty turns the review log off
+REVIEW_LOG_FILE = os.getenv("REVIEW_LOG_FILE", "reviews.db")
+
+
+class ReviewRecord(NamedTuple):
+    word: str
+    # epoch seconds
+    reviewed_at: float
+    rating: int
+    elapsed_days: int
+    # the card's state before the review
+    state: int
+    stability_before: float
+    difficulty_before: float
+    stability_after: float
+    difficulty_after: float
+    scheduled_days: int
+    # the sentence the word was reviewed in
+    sentence: Optional[str] = None
+
+
+# the numeric columns of a review, in table order
+COLUMNS = (
+    "reviewed_at",
+    "rating",
+    "elapsed_days",
+    "state",
+    "stability_before",
+    "difficulty_before",
+    "stability_after",
+    "difficulty_after",
+    "scheduled_days",
+)
+INTEGER_COLUMNS = {"rating", "elapsed_days", "state", "scheduled_days"}
+
+
+class ReviewLogStore:
+    def __init__(self, path: str = REVIEW_LOG_FILE):
+        self.path = path
+        # sqlite connections can't be shared across threads, see SqliteCardStore
+        self._local = threading.local()
+        # word / sentence -> id, filled as they are looked up
+        self._ids: dict[tuple[str, str], int] = {}
+        self._ids_lock = threading.Lock()
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS review_words (id INTEGER PRIMARY KEY, word TEXT NOT NULL UNIQUE)")
+            conn.execute("CREATE TABLE IF NOT EXISTS review_sentences (id INTEGER PRIMARY KEY, text TEXT NOT NULL UNIQUE)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS reviews (
+                    user TEXT NOT NULL,
+                    word_id INTEGER NOT NULL,
+                    reviewed_at REAL NOT NULL,
+                    rating INTEGER NOT NULL,
+                    elapsed_days INTEGER NOT NULL,
+                    state INTEGER NOT NULL,
+                    stability_before REAL NOT NULL,
+                    difficulty_before REAL NOT NULL,
+                    stability_after REAL NOT NULL,
+                    difficulty_after REAL NOT NULL,
+                    scheduled_days INTEGER NOT NULL,
+                    sentence_id INTEGER
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS reviews_user_word ON reviews (user, word_id, reviewed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS reviews_user_time ON reviews (user, reviewed_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ids looked up or inserted in a transaction go to new_ids, and only into the shared
+    # cache once it commits, so a rolled back insert never leaves an id behind
+    def _id(self, conn: sqlite3.Connection, table: str, column: str, value: str, new_ids: dict[tuple[str, str], int]) -> int:
+        key = (table, value)
+        with self._ids_lock:
+            row_id = self._ids.get(key)
+        if row_id is None:
+            row_id = new_ids.get(key)
+        if row_id is None:
+            conn.execute(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (value,))
+            row_id = conn.execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,)).fetchone()[0]
+            new_ids[key] = row_id
+        return row_id
+
+    def _lookup_id(self, table: str, column: str, value: str) -> Optional[int]:
+        row = self._connection().execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,)).fetchone()
+        return row[0] if row else None
+
+    def append(self, records: list[ReviewRecord], user: str = DEFAULT_USER) -> None:
+        if not records:
+            return
+        new_ids: dict[tuple[str, str], int] = {}
+        # one transaction for everything queued since the last flush
+        with self._connection() as conn:
+            rows = []
+            for record in records:
+                word_id = self._id(conn, "review_words", "word", record.word, new_ids)
+                sentence_id = self._id(conn, "review_sentences", "text", record.sentence, new_ids) if record.sentence else None
+                rows.append((user, word_id, *(getattr(record, column) for column in COLUMNS), sentence_id))
+            conn.executemany(f"INSERT INTO reviews (user, word_id, {', '.join(COLUMNS)}, sentence_id) VALUES ({', '.join('?' * (len(COLUMNS) + 3))})", rows)
+        with self._ids_lock:
+            self._ids.update(new_ids)
+
+    def _select(self, where: str, params: tuple) -> list[ReviewRecord]:
+        rows = self._connection().execute(
+            f"""
+            SELECT w.word, {', '.join('r.' + column for column in COLUMNS)}, s.text
+            FROM reviews r JOIN review_words w ON w.id = r.word_id LEFT JOIN review_sentences s ON s.id = r.sentence_id
+            WHERE {where} ORDER BY r.reviewed_at, r.rowid
+            """,
+            params,
+        )
+        return [ReviewRecord(*row) for row in rows]
+
+    # a word's reviews, oldest first, optionally only those in [start, end)
+    def for_word(self, word: str, user: str = DEFAULT_USER, start: float = float("-inf"), end: float = float("inf")) -> list[ReviewRecord]:
+        word_id = self._lookup_id("review_words", "word", word)
+        if word_id is None:
+            return []
+        return self._select("r.user = ? AND r.word_id = ? AND r.reviewed_at >= ? AND r.reviewed_at < ?", (user, word_id, start, end))
+
+    # every review in [start, end), oldest first
+    def between(self, start: float, end: float, user: str = DEFAULT_USER) -> list[ReviewRecord]:
+        return self._select("r.user = ? AND r.reviewed_at >= ? AND r.reviewed_at < ?", (user, start, end))
+
+    def count(self, user: str = DEFAULT_USER) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM reviews WHERE user = ?", (user,)).fetchone()[0]
+
+    # the reviews in [start, end) as one numpy array per column (COLUMNS plus word_id and
+    # sentence_id, -1 for none), ordered by word and then time, so each word's history is
+    # one contiguous run. words() maps the ids back.
+    def columns(self, user: str = DEFAULT_USER, start: float = float("-inf"), end: float = float("inf")) -> dict:
+        import numpy as np
+
+        rows = self._connection().execute(
+            f"""
+            SELECT word_id, {', '.join(COLUMNS)}, COALESCE(sentence_id, -1) FROM reviews
+            WHERE user = ? AND reviewed_at >= ? AND reviewed_at < ?
+            ORDER BY word_id, reviewed_at, rowid
+            """,
+            (user, start, end),
+        ).fetchall()
+        table = np.array(rows, dtype=np.float64).reshape(len(rows), len(COLUMNS) + 2)
+        columns = {"word_id": table[:, 0].astype(np.int64)}
+        for i, column in enumerate(COLUMNS, start=1):
+            columns[column] = table[:, i].astype(np.int64) if column in INTEGER_COLUMNS else table[:, i]
+        columns["sentence_id"] = table[:, -1].astype(np.int64)
+        return columns
+
+    # word id -> word
+    def words(self) -> dict[int, str]:
+        return dict(self._connection().execute("SELECT id, word FROM review_words"))
+
+
+review_log: Optional[ReviewLogStore] = ReviewLogStore() if REVIEW_LOG_FILE else None
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+from compiled_data import load_compiled
+
+# Resolves a surface form ("Häuser", "ging") to the root words on the word list it is a
+# version of ("Haus", "gehen"), compiled once from the lookup table:
+#   - every root word gets an integer id, a surface form maps to a tuple of root ids,
+#     and forms with the same roots share one tuple. Words that aren't a root of any
+#     form (separable verbs, words only on the word list) get an id with intern(),
+#     ids are never reused or changed while the process runs
+#   - keys are casefolded, so one probe covers every capitalization ("ESSEN", "Essen",
+#     "essen") and ß/ss spellings
+#   - a form that isn't in the table is retried without one of ROOT_PREFIXES
+#     ("Lieblingsessen" -> "essen")
+#   - and after that, if ROOT_COMPOUNDS is on and it is capitalized, as a compound noun:
+#     modifier + optional linking element + head, both parts on the lookup table
+#     ("Haustür" -> "Haus" + "Tür", "Arbeitsplatz" -> "Arbeit" + "Platz").
+#
+# resolve_parts gives the roots of every part, one group for most words and the modifier's
+# and the head's for a compound, and a word is only allowed if every part is. resolve gives
+# the roots of the last part, so a compound is a version of the noun roots of its head, the
+# word that gets inflected. Compounds are off by default: splitting finds heads in words
+# that aren't compounds of them ("Salzburg", "Deutschlands").
+#
+# The rules are configurable, version changes whenever the table or the rules do.
+# The compiled index is cached with compiled_data, so a restart doesn't rebuild it.
+
+ROOT_LOOKUP_FILE = './5009_cd_to_word_lookup.json'
+ROOT_PREFIXES = [prefix for prefix in os.getenv("ROOT_PREFIXES", "Lieblings").split(",") if prefix]
+ROOT_COMPOUNDS = os.getenv("ROOT_COMPOUNDS", "false").lower() == "true"
+# the shortest modifier and head a compound is split into
+ROOT_COMPOUND_MIN_PART = int(os.getenv("ROOT_COMPOUND_MIN_PART", "3"))
+ROOT_COMPOUND_LINKERS = os.getenv("ROOT_COMPOUND_LINKERS", "s,es,n,en,e,er").split(",")
+# resolved forms are memoized, the memo is cleared once it gets this big
+MAX_MEMO_SIZE = 100_000
+
+
+class RootIndex:
+    def __init__(self, lookup: dict[str, list[str]], prefixes: list[str] = ROOT_PREFIXES, compounds: bool = ROOT_COMPOUNDS, min_compound_part: int = ROOT_COMPOUND_MIN_PART, compound_linkers: list[str] = ROOT_COMPOUND_LINKERS, source_hash: str = ""):
+        self.prefixes = [prefix.casefold() for prefix in prefixes]
+        self.compounds = compounds
+        self.min_compound_part = min_compound_part
+        # "" first, so a compound without linking element is tried first, then longest first.
+        # Ties are sorted too, set order changes between processes and version must not
+        self.compound_linkers = [""] + sorted({linker.casefold() for linker in compound_linkers if linker}, key=lambda linker: (-len(linker), linker))
+        rules = json.dumps([self.prefixes, compounds, min_compound_part, self.compound_linkers])
+        self.version = hashlib.sha1((source_hash + rules).encode()).hexdigest()[:12]
+
+        self.root_names: list[str] = []
+        self.root_ids: dict[str, int] = {}
+        self._intern_lock = threading.Lock()
+        root_sets: dict[str, set[int]] = {}
+        for form, roots in lookup.items():
+            ids = root_sets.setdefault(form.casefold(), set())
+            for root in roots:
+                ids.add(self.intern(root))
+
+        self._shared: dict[tuple[int, ...], tuple[int, ...]] = {}
+        self._forms: dict[str, tuple[int, ...]] = {key: self._share(tuple(sorted(ids))) for key, ids in root_sets.items()}
+        self._noun_roots = frozenset(root_id for root, root_id in self.root_ids.items() if root[:1].isupper())
+        # (casefolded form, capitalized) -> root ids of each part
+        self._memo: dict[tuple[str, bool], tuple[tuple[int, ...], ...]] = {}
+
+    @classmethod
+    def from_bytes(cls, data: bytes, **rules) -> "RootIndex":
+        return cls(json.loads(data), source_hash=hashlib.sha1(data).hexdigest(), **rules)
+
+    @classmethod
+    def from_file(cls, path: str = ROOT_LOOKUP_FILE, **rules) -> "RootIndex":
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read(), **rules)
+
+    # the lock and the memo belong to a process, they aren't pickled
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_intern_lock"]
+        state["_memo"] = {}
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._intern_lock = threading.Lock()
+
+    def _share(self, root_ids: tuple[int, ...]) -> tuple[int, ...]:
+        return self._shared.setdefault(root_ids, root_ids)
+
+    # the id of a word, a new one if it doesn't have one yet
+    def intern(self, word: str) -> int:
+        root_id = self.root_ids.get(word)
+        if root_id is None:
+            with self._intern_lock:
+                root_id = self.root_ids.get(word)
+                if root_id is None:
+                    root_id = len(self.root_names)
+                    self.root_names.append(word)
+                    self.root_ids[word] = root_id
+        return root_id
+
+    def __len__(self) -> int:
+        return len(self._forms)
+
+    def root_id(self, root: str) -> Optional[int]:
+        return self.root_ids.get(root)
+
+    def resolve(self, text: str) -> list[str]:
+        return [self.root_names[root_id] for root_id in self.resolve_ids(text)]
+
+    def resolve_ids(self, text: str) -> tuple[int, ...]:
+        parts = self.resolve_parts_ids(text)
+        return parts[-1] if parts else ()
+
+    def resolve_parts(self, text: str) -> list[list[str]]:
+        return [[self.root_names[root_id] for root_id in part] for part in self.resolve_parts_ids(text)]
+
+    def resolve_parts_ids(self, text: str) -> tuple[tuple[int, ...], ...]:
+        memo_key = (text.casefold(), text[:1].isupper())
+        parts = self._memo.get(memo_key)
+        if parts is None:
+            parts = self._resolve(*memo_key)
+            if len(self._memo) >= MAX_MEMO_SIZE:
+                self._memo.clear()
+            self._memo[memo_key] = parts
+        return parts
+
+    # the roots of each part of an analyzed token. A separable verb keeps the roots
+    # tokens_from_doc put together for it (prefix + lemma), its text is only the verb
+    def token_parts(self, text: str, root_words: list[str], is_svp: bool) -> list[list[str]]:
+        if is_svp:
+            return [root_words]
+        return self.resolve_parts(text) or [root_words]
+
+    def _resolve(self, key: str, capitalized: bool) -> tuple[tuple[int, ...], ...]:
+        root_ids = self._forms.get(key)
+        if root_ids is not None:
+            return (root_ids,)
+        for prefix in self.prefixes:
+            if key.startswith(prefix) and len(key) > len(prefix):
+                root_ids = self._forms.get(key[len(prefix):])
+                if root_ids is not None:
+                    return (root_ids,)
+        if self.compounds and capitalized:
+            return self._resolve_compound(key)
+        return ()
+
+    # the longest noun head whose modifier is on the table too, as (modifier roots, head roots)
+    def _resolve_compound(self, key: str) -> tuple[tuple[int, ...], ...]:
+        min_part = self.min_compound_part
+        for split in range(min_part, len(key) - min_part + 1):
+            head = self._share(tuple(root_id for root_id in self._forms.get(key[split:], ()) if root_id in self._noun_roots))
+            if not head:
+                continue
+            modifier = key[:split]
+            for linker in self.compound_linkers:
+                if modifier.endswith(linker) and len(modifier) - len(linker) >= min_part:
+                    modifier_roots = self._forms.get(modifier[:len(modifier) - len(linker)])
+                    if modifier_roots is not None:
+                        return (modifier_roots, head)
+        return ()
+
+
+def load_root_index(rebuild: bool = False) -> RootIndex:
+    rules = json.dumps([ROOT_PREFIXES, ROOT_COMPOUNDS, ROOT_COMPOUND_MIN_PART, ROOT_COMPOUND_LINKERS])
+    return load_compiled("root_index", ROOT_LOOKUP_FILE, RootIndex.from_bytes, key=rules, rebuild=rebuild)
+
+
+root_index = load_root_index()
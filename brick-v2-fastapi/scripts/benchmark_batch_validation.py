@@ -0,0 +1,29 @@
+import json
+import time
+from analysis_cache import analysis_cache
+from sentences import analyze_and_add_roots, analyze_many, get_nlp_de
+
+# PYTHONPATH=. python3 scripts/benchmark_batch_validation.py
+# analysis throughput over the sentences from sentence_results.json, one nlp() call per
+# sentence against nlp.pipe with growing batch sizes
+
+with open("sentence_results.json", "r") as f:
+    sentence_list = [result["sentence"] for result in json.load(f)]
+
+# every run has to go through spaCy
+analysis_cache.max_size = 0
+get_nlp_de()
+analyze_many(sentence_list[:8], "German")  # warm up
+
+started = time.perf_counter()
+one_by_one = [analyze_and_add_roots(sentence, "German") for sentence in sentence_list]
+elapsed = time.perf_counter() - started
+print(f"{len(sentence_list)} sentences")
+print(f"one at a time: {len(sentence_list) / elapsed:.1f} sentences/s")
+
+for batch_size in (1, 8, 32, 128):
+    started = time.perf_counter()
+    batched = analyze_many(sentence_list, "German", batch_size=batch_size)
+    elapsed = time.perf_counter() - started
+    assert batched == one_by_one, "nlp.pipe gave a different analysis"
+    print(f"batch_size {batch_size:>3}: {len(sentence_list) / elapsed:.1f} sentences/s")
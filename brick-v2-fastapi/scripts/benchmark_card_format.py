@@ -0,0 +1,103 @@
+import gc
+import json
+import time
+import tracemalloc
+from datetime import datetime
+from fsrs import Card, State
+from card_store import card_from_stored, card_store
+
+# PYTHONPATH=. python3 scripts/benchmark_card_format.py
+# compares the slotted, epoch-based Card against the previous __dict__ Card with
+# datetime attributes (LegacyCard below): memory per card, and reading and writing
+# cards as ISO dicts (the old db.json format) and in the compact list format.
+# The ISO dict path is slower than before: from_dict converts each parsed datetime
+# to epoch seconds and to_dict converts back before formatting (about 1 µs and 2-4 µs
+# more per card). The stores write the compact format, which is where the speedup is.
+
+
+class LegacyCard:
+    def __init__(self, due, stability, difficulty, elapsed_days, scheduled_days, reps, lapses, state, last_review=None):
+        self.due = due
+        self.stability = stability
+        self.difficulty = difficulty
+        self.elapsed_days = elapsed_days
+        self.scheduled_days = scheduled_days
+        self.reps = reps
+        self.lapses = lapses
+        self.state = state
+        if last_review is not None:
+            self.last_review = last_review
+
+    def to_dict(self) -> dict:
+        return_dict = {
+            "due": self.due.isoformat(),
+            "stability": self.stability,
+            "difficulty": self.difficulty,
+            "elapsed_days": self.elapsed_days,
+            "scheduled_days": self.scheduled_days,
+            "reps": self.reps,
+            "lapses": self.lapses,
+            "state": self.state.value,
+        }
+        if hasattr(self, "last_review"):
+            return_dict["last_review"] = self.last_review.isoformat()
+        return return_dict
+
+    @staticmethod
+    def from_dict(source_dict: dict) -> "LegacyCard":
+        return LegacyCard(
+            datetime.fromisoformat(source_dict["due"]),
+            float(source_dict["stability"]),
+            float(source_dict["difficulty"]),
+            int(source_dict["elapsed_days"]),
+            int(source_dict["scheduled_days"]),
+            int(source_dict["reps"]),
+            int(source_dict["lapses"]),
+            State(int(source_dict["state"])),
+            datetime.fromisoformat(source_dict["last_review"]) if "last_review" in source_dict else None,
+        )
+
+
+DECK_SIZE = 50_000
+base_cards = [card_from_stored(card) for card in card_store.load_words().values()] or [Card()]
+cards = (base_cards * (DECK_SIZE // len(base_cards) + 1))[:DECK_SIZE]
+dicts = [card.to_dict() for card in cards]
+compact = [card.to_compact() for card in cards]
+
+
+def timed(fn):
+    gc.collect()
+    gc.disable()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    gc.enable()
+    return result, elapsed * 1e6 / DECK_SIZE
+
+
+def bytes_per_card(build) -> float:
+    tracemalloc.start()
+    built = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return size / DECK_SIZE
+
+
+legacy_cards, legacy_read_us = timed(lambda: [LegacyCard.from_dict(d) for d in dicts])
+_, legacy_write_us = timed(lambda: [card.to_dict() for card in legacy_cards])
+_, read_us = timed(lambda: [Card.from_dict(d) for d in dicts])
+_, write_us = timed(lambda: [card.to_dict() for card in cards])
+_, compact_read_us = timed(lambda: [Card.from_compact(c) for c in compact])
+_, compact_write_us = timed(lambda: [card.to_compact() for card in cards])
+# a whole deck from its JSON text, as when loading the store
+dicts_json, compact_json = json.dumps(dicts), json.dumps(compact)
+_, legacy_load_us = timed(lambda: [LegacyCard.from_dict(d) for d in json.loads(dicts_json)])
+_, compact_load_us = timed(lambda: [Card.from_compact(c) for c in json.loads(compact_json)])
+
+print(f"{DECK_SIZE} cards")
+print(f"  memory per card      legacy {bytes_per_card(lambda: [LegacyCard.from_dict(d) for d in dicts]):6.0f} B    slotted {bytes_per_card(lambda: [Card.from_compact(c) for c in compact]):6.0f} B")
+print(f"  from_dict            legacy {legacy_read_us:6.2f} µs   slotted {read_us:6.2f} µs   from_compact {compact_read_us:6.2f} µs")
+print(f"  to_dict              legacy {legacy_write_us:6.2f} µs   slotted {write_us:6.2f} µs   to_compact   {compact_write_us:6.2f} µs")
+print(f"  load deck from JSON  legacy {legacy_load_us:6.2f} µs   slotted compact {compact_load_us:6.2f} µs")
+print(f"  JSON per card        dict {len(dicts_json) / DECK_SIZE:6.0f} B   compact {len(compact_json) / DECK_SIZE:6.0f} B")
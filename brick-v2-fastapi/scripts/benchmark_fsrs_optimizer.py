@@ -0,0 +1,61 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from fsrs import FSRS, Card, Rating
+from fsrs.models import DEFAULT_W
+from fsrs.optimizer import ReviewHistory, _replay, log_loss, optimize
+
+# PYTHONPATH=. python3 scripts/benchmark_fsrs_optimizer.py --words 5000 --reviews 20
+# simulates a learner whose memory follows FSRS with other weights than the defaults
+# (words reviewed around their due date, recalled with the predicted probability), then
+# times fitting the weights to those reviews and compares the fitted log loss with the
+# loss of the weights the reviews were simulated with.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--words", type=int, default=5000)
+parser.add_argument("--reviews", type=int, default=20, help="reviews per word")
+parser.add_argument("--steps", type=int, default=100)
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+true_w = (1.0, 2.5, 6.0, 25.0) + DEFAULT_W[4:8] + (1.3, DEFAULT_W[9], 1.4) + DEFAULT_W[11:16] + (2.0,) + DEFAULT_W[17:]
+rng = random.Random(args.seed)
+fsrs = FSRS(w=true_w)
+start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+started = time.perf_counter()
+word_ids, ratings, elapsed_days, states = [], [], [], []
+for word_id in range(args.words):
+    card = Card(due=start)
+    now = start
+    for i in range(args.reviews):
+        if i:
+            now = max(card.due + timedelta(days=rng.uniform(-0.3, 1.0) * card.scheduled_days), card.last_review + timedelta(minutes=1))
+        elapsed = (now - card.last_review).days if i else 0
+        recalled = rng.random() < (fsrs.forgetting_curve(elapsed, card.stability) if i else 1)
+        rating = rng.choice((Rating.Hard, Rating.Good, Rating.Good, Rating.Easy)) if recalled else Rating.Again
+        word_ids.append(word_id)
+        ratings.append(rating)
+        elapsed_days.append(elapsed)
+        states.append(card.state)
+        card, _ = fsrs.review_card(card, rating, now=now)
+print(f"simulated {len(word_ids)} reviews in {time.perf_counter() - started:.2f}s")
+
+started = time.perf_counter()
+history = ReviewHistory(word_ids, ratings, elapsed_days, states)
+print(f"ReviewHistory {(time.perf_counter() - started) * 1000:.1f} ms, {history.predictions} reviews to predict")
+
+for gradient in (False, True):
+    started = time.perf_counter()
+    for _ in range(5):
+        _replay(history, np.asarray(DEFAULT_W), gradient)
+    print(f"one replay{' with gradient' if gradient else ''}: {(time.perf_counter() - started) / 5 * 1000:.1f} ms")
+
+started = time.perf_counter()
+result = optimize(history, steps=args.steps)
+print(f"optimize: {time.perf_counter() - started:.2f}s, {result.steps} steps")
+print(f"log loss: default weights {result.initial_loss:.5f}, fitted {result.loss:.5f}, simulated with {log_loss(history, true_w):.5f}")
+print("fitted w =", tuple(round(weight, 3) for weight in result.w))
+print("true w   =", true_w)
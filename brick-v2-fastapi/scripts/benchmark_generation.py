@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+# PYTHONPATH=. python3 scripts/benchmark_generation.py --sentences 50 --concurrency 4 --latency 0.5 --invalid-rate 0.3
+# runs the generation pipeline (generator call, validation, corrective retries) offline
+# against the local generator and reports latency and attempts per sentence. The
+# sentence bank is bypassed, so every sentence is generated.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--sentences", type=int, default=20)
+parser.add_argument("--concurrency", type=int, default=1)
+parser.add_argument("--latency", type=float, default=0.0, help="seconds per generator call")
+parser.add_argument("--invalid-rate", type=float, default=0.2, help="chance a reply uses a word not on the list")
+parser.add_argument("--candidates", type=int, default=1, help="speculative candidates per sentence")
+parser.add_argument("--stream", action="store_true", help="stream replies and stop them at the first invalid word")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+# the generator is picked when sentences is imported
+os.environ["SENTENCE_GENERATOR"] = "local"
+os.environ["LOCAL_GENERATOR_LATENCY"] = str(args.latency)
+os.environ["LOCAL_GENERATOR_INVALID_RATE"] = str(args.invalid_rate)
+os.environ["LOCAL_GENERATOR_SEED"] = str(args.seed)
+os.environ["STREAM_GENERATION"] = "true" if args.stream else "false"
+
+import sentences  # noqa: E402
+from sentences import (  # noqa: E402
+    MAX_LLM_CALLS_PER_SENTENCE,
+    generate_speculatively,
+    generate_with_retries_async,
+    get_focus_words,
+    load_allowed_word_list,
+    prevalidation_stats,
+    sentence_generator,
+    streaming_stats,
+)
+
+calls = 0
+original_agenerate = sentence_generator.agenerate
+original_astream = sentence_generator.astream
+
+
+async def counting_agenerate(*call_args, **call_kwargs):
+    global calls
+    calls += 1
+    return await original_agenerate(*call_args, **call_kwargs)
+
+
+def counting_astream(*call_args, **call_kwargs):
+    global calls
+    calls += 1
+    return original_astream(*call_args, **call_kwargs)
+
+
+sentence_generator.agenerate = counting_agenerate
+sentence_generator.astream = counting_astream
+
+
+async def generate_one(semaphore: asyncio.Semaphore) -> tuple[float, bool]:
+    async with semaphore:
+        focus_words = get_focus_words()
+        word_list = load_allowed_word_list()
+        word_list.extend(focus_words)
+        started = time.perf_counter()
+        try:
+            if args.candidates > 1:
+                await generate_speculatively(word_list, focus_words, candidates=args.candidates)
+            else:
+                await generate_with_retries_async(word_list, focus_words, max_tries=MAX_LLM_CALLS_PER_SENTENCE)
+            ok = True
+        except Exception:
+            ok = False
+        return time.perf_counter() - started, ok
+
+
+async def main() -> None:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(generate_one(semaphore) for _ in range(args.sentences)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, ok in results if ok)
+    failures = sum(1 for _, ok in results if not ok)
+    print(f"generator: {sentence_generator.name}, latency {args.latency}s, invalid rate {args.invalid_rate}, concurrency {args.concurrency}, candidates {args.candidates}, streaming {args.stream}")
+    print(f"{args.sentences} sentences in {wall:.2f}s ({args.sentences / wall:.1f}/s), {failures} failed")
+    print(f"generator calls: {calls} ({calls / args.sentences:.2f} per sentence)")
+    print(f"answers rejected before parsing: {prevalidation_stats['rejected']} of {prevalidation_stats['checked']}")
+    if args.stream:
+        print(f"streams stopped at an invalid word: {streaming_stats['stopped_early']} of {streaming_stats['streams']}")
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"latency ms: p50 {statistics.median(latencies):.1f}, p95 {p95:.1f}, max {latencies[-1]:.1f}")
+
+
+# corrective retries count invalid words in invalid_word_counts.json, keep benchmark runs out of it
+with open("invalid_word_counts.json") as f:
+    invalid_word_counts = f.read()
+try:
+    asyncio.run(main())
+finally:
+    with open("invalid_word_counts.json", "w") as f:
+        f.write(invalid_word_counts)
+    sentences.nlp_executor.shutdown()
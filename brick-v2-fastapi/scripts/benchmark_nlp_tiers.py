@@ -0,0 +1,68 @@
+import json
+import statistics
+import time
+import spacy
+from sentences import NLP_EXCLUDED_COMPONENTS, NLP_MODELS
+
+# PYTHONPATH=. python3 scripts/benchmark_nlp_tiers.py
+# runs the sentences from sentence_results.json through every installed model tier,
+# with the full pipeline and with the components analyze_and_add_roots doesn't use
+# left out. Reports load time, latency per sentence, and how often each tier finds
+# the same separable verb prefixes (dep_ == "svp") as the transformer.
+
+REFERENCE_TIER = "trf"
+
+with open("sentence_results.json", "r") as f:
+    sentence_list = [result["sentence"] for result in json.load(f)]
+
+
+# (prefix position, verb position) for every separable verb prefix in the sentence
+def svp_pairs(doc) -> set[tuple[int, int]]:
+    return {(token.idx, token.head.idx) for token in doc if token.dep_ == "svp"}
+
+
+def run(model: str, exclude: list[str]) -> dict:
+    started = time.perf_counter()
+    nlp = spacy.load(model, exclude=exclude)
+    load_seconds = time.perf_counter() - started
+
+    latencies = []
+    detections = []
+    for sentence in sentence_list:
+        started = time.perf_counter()
+        doc = nlp(sentence)
+        latencies.append((time.perf_counter() - started) * 1000)
+        detections.append(svp_pairs(doc))
+    latencies.sort()
+    return {
+        "components": nlp.pipe_names,
+        "load_seconds": load_seconds,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95)],
+        "detections": detections,
+    }
+
+
+results = {}
+for tier, model in NLP_MODELS.items():
+    for variant, exclude in (("full", []), ("slim", NLP_EXCLUDED_COMPONENTS)):
+        try:
+            results[(tier, variant)] = run(model, exclude)
+        except OSError:
+            print(f"{model} is not installed, skipping (python -m spacy download {model})")
+            break
+
+reference = results.get((REFERENCE_TIER, "slim"))
+print(f"{len(sentence_list)} sentences")
+for (tier, variant), result in results.items():
+    line = f"{tier:>4} {variant:<5} load {result['load_seconds']:.1f}s, p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, components: {', '.join(result['components'])}"
+    if reference is not None:
+        same = sum(1 for ours, theirs in zip(result["detections"], reference["detections"]) if ours == theirs)
+        found = sum(len(ours & theirs) for ours, theirs in zip(result["detections"], reference["detections"]))
+        ours_total = sum(len(ours) for ours in result["detections"])
+        theirs_total = sum(len(theirs) for theirs in reference["detections"])
+        line += (
+            f"\n     svp agreement with {REFERENCE_TIER}: {same / len(sentence_list):.1%} of sentences,"
+            f" precision {found / ours_total if ours_total else 1:.1%}, recall {found / theirs_total if theirs_total else 1:.1%}"
+        )
+    print(line)
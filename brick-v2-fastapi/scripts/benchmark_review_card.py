@@ -0,0 +1,35 @@
+import time
+from datetime import datetime, timezone
+from fsrs import FSRS, Card, Rating
+from card_store import card_from_stored, card_store
+
+# PYTHONPATH=. python3 scripts/benchmark_review_card.py
+# compares reviewing a card by picking one rating out of the four-way preview (repeat)
+# against review_card, which only schedules the rating given
+
+fsrs = FSRS()
+cards = [card_from_stored(card) for card in card_store.load_words().values()] or [Card()]
+now = datetime.now(timezone.utc)
+
+
+def review_with_repeat(card: Card, rating: Rating):
+    info = fsrs.repeat(card, now)[rating]
+    return info.card, info.review_log
+
+
+def review_one_rating(card: Card, rating: Rating):
+    return fsrs.review_card(card, rating, now=now)
+
+
+def timed(review, rating: Rating) -> float:
+    start = time.perf_counter()
+    for card in cards:
+        review(card, rating)
+    return (time.perf_counter() - start) * 1e6 / len(cards)
+
+
+print(f"{len(cards)} cards")
+for rating in (Rating.Good, Rating.Again):
+    repeat_us = timed(review_with_repeat, rating)
+    review_us = timed(review_one_rating, rating)
+    print(f"  {rating.name:6} repeat {repeat_us:6.2f} µs/review   review_card {review_us:6.2f} µs/review   x{repeat_us / review_us:5.1f}")
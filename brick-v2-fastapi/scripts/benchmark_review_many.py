@@ -0,0 +1,36 @@
+import time
+from datetime import datetime, timedelta, timezone
+from fsrs import FSRS, Card, Rating
+from fsrs.vectorized import CardTable, review_cards
+from card_store import card_from_stored, card_store
+
+# PYTHONPATH=. python3 scripts/benchmark_review_many.py
+# compares reviewing cards one by one with review_card against review_many (one
+# sentence result) and against review_cards on a CardTable (mass re-scheduling)
+
+fsrs = FSRS()
+base_cards = [card_from_stored(card) for card in card_store.load_words().values()] or [Card()]
+# after every card's last review, so no card is reviewed before it was last reviewed
+now = max([card.last_review for card in base_cards if hasattr(card, "last_review")], default=datetime.now(timezone.utc)) + timedelta(days=1)
+
+
+def timed(fn, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+for batch_size in (8, 128, 5_000, 50_000):
+    cards = (base_cards * (batch_size // len(base_cards) + 1))[:batch_size]
+    ratings = [Rating.Good if i % 4 else Rating.Again for i in range(batch_size)]
+    repeat = max(1, 2_000 // batch_size)
+
+    loop_ms = timed(lambda: [fsrs.review_card(card, rating, now=now) for card, rating in zip(cards, ratings)], repeat)
+    many_ms = timed(lambda: fsrs.review_many(cards, ratings, now), repeat)
+    print(f"{batch_size} cards: review_card loop {loop_ms:8.2f} ms   review_many {many_ms:8.2f} ms   x{loop_ms / many_ms:5.1f}")
+
+    if batch_size >= 5_000:
+        table = CardTable.from_cards(cards)
+        kernel_ms = timed(lambda: review_cards(fsrs, table, ratings, now))
+        print(f"  review_cards on a CardTable {kernel_ms:.2f} ms ({kernel_ms * 1000 / batch_size:.2f} µs per card)")
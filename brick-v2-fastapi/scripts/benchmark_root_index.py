@@ -0,0 +1,63 @@
+import json
+import re
+import time
+from root_index import ROOT_LOOKUP_FILE, RootIndex
+
+# PYTHONPATH=. python3 scripts/benchmark_root_index.py
+# resolves every word of sentence_results.json and incorrect_sentence_results.json, and
+# the words that failed validation before (invalid_word_counts.json), with the old
+# three-probe lookup and with the compiled RootIndex, with and without compound splitting
+# (ROOT_COMPOUNDS). Compares speed, misses and the roots found, compounds with the roots
+# of each part.
+
+with open(ROOT_LOOKUP_FILE, "r") as f:
+    lookup_table = json.load(f)
+
+
+# get_roots before the RootIndex
+def legacy_roots(text: str) -> list[str]:
+    if text.startswith("Lieblings"):
+        text = text[len("Lieblings"):]
+    final = []
+    if text in lookup_table:
+        final.extend(lookup_table[text])
+    if text.lower() in lookup_table:
+        final.extend(lookup_table[text.lower()])
+    if text.capitalize() in lookup_table:
+        final.extend(lookup_table[text.capitalize()])
+    return list(set(final))
+
+
+words = []
+for path in ("sentence_results.json", "incorrect_sentence_results.json"):
+    with open(path, "r") as f:
+        for result in json.load(f):
+            words.extend(re.findall(r"[^\W\d_]+", result["sentence"]))
+with open("invalid_word_counts.json", "r") as f:
+    words.extend(json.load(f))
+print(f"{len(words)} words, {len(set(words))} distinct")
+
+started = time.perf_counter()
+index = RootIndex.from_file(compounds=True)
+print(f"RootIndex built in {(time.perf_counter() - started) * 1000:.0f} ms: {len(index)} forms, {len(index.root_names)} roots")
+without_compounds = RootIndex.from_file(compounds=False)
+
+for name, resolve in (("legacy", legacy_roots), ("index", index.resolve), ("index, no compounds", without_compounds.resolve)):
+    started = time.perf_counter()
+    for word in words:
+        resolve(word)
+    elapsed = time.perf_counter() - started
+    misses = {word for word in words if not resolve(word)}
+    print(f"{name:>20}: {elapsed / len(words) * 1e6:.2f} µs/word, {len(misses)} distinct words not found")
+
+# the index should find everything the legacy lookup found, with the same roots unless
+# the word also exists with other capitalizations
+changed = [(word, sorted(legacy_roots(word)), without_compounds.resolve(word)) for word in set(words) if legacy_roots(word) and set(legacy_roots(word)) != set(without_compounds.resolve(word))]
+lost = [entry for entry in changed if not set(entry[1]) <= set(entry[2])]
+print(f"{len(changed)} words resolve to more roots than before, {len(lost)} lost a root")
+for word, before, after in lost[:20]:
+    print(f"  {word}: {before} -> {after}")
+newly_found = sorted({word for word in words if not legacy_roots(word) and index.resolve(word)})
+print(f"{len(newly_found)} words found that weren't before, e.g.:")
+for word in newly_found[:20]:
+    print(f"  {word} -> {' + '.join(map(str, index.resolve_parts(word)))}")
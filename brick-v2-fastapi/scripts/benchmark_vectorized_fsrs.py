@@ -0,0 +1,44 @@
+import time
+from datetime import datetime, timezone
+from fsrs import FSRS
+from fsrs.vectorized import CardTable, approximate_retrievability, next_interval
+from card_store import card_from_stored, card_store
+
+# PYTHONPATH=. python3 scripts/benchmark_vectorized_fsrs.py
+# compares whole-deck analytics done card by card against the numpy batch versions
+
+fsrs = FSRS()
+base_cards = [card_from_stored(card) for card in card_store.load_words().values()]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - start) * 1000
+
+
+for deck_size in (5_000, 50_000):
+    # repeat the real deck until it has deck_size cards
+    cards = (base_cards * (deck_size // len(base_cards) + 1))[:deck_size]
+    now = datetime.now(timezone.utc)
+
+    table, build_ms = timed(lambda: CardTable.from_cards(cards))
+
+    scalar = {
+        "retrievability": timed(lambda: [card.get_retrievability(now) for card in cards]),
+        "approximate_retrievability": timed(lambda: [fsrs.approximate_retrievability(card) for card in cards]),
+        "next_interval": timed(lambda: [fsrs.next_interval(card.stability) for card in cards]),
+        "due": timed(lambda: [card.due <= now for card in cards]),
+    }
+    batch = {
+        "retrievability": timed(lambda: table.get_retrievability(now)),
+        "approximate_retrievability": timed(lambda: approximate_retrievability(fsrs, table)),
+        "next_interval": timed(lambda: next_interval(fsrs, table.stability)),
+        "due": timed(lambda: table.due_mask(now)),
+    }
+
+    print(f"{deck_size} cards (CardTable.from_cards: {build_ms:.1f} ms)")
+    for name in scalar:
+        (scalar_result, scalar_ms), (batch_result, batch_ms) = scalar[name], batch[name]
+        max_diff = max(abs(complex(a).real - float(b)) for a, b in zip(scalar_result, batch_result.tolist()))
+        print(f"  {name:28} scalar {scalar_ms:8.2f} ms   batch {batch_ms:6.2f} ms   x{scalar_ms / batch_ms:7.1f}   max diff {max_diff:.2e}")
@@ -0,0 +1,23 @@
+import json
+from sentences import MessageData, analyze_many
+from sentence_bank import sentence_bank
+
+# PYTHONPATH=. python3 scripts/build_sentence_bank.py
+# adds the sentences from sentence_results.json to the sentence bank, so they can be reused
+
+with open("sentence_results.json", "r") as f:
+    sentence_results = json.load(f)
+
+added = 0
+skipped = 0
+analyzed = analyze_many([result["sentence"] for result in sentence_results], "German")
+for result, tokens_list in zip(sentence_results, analyzed):
+    # only sentences whose every word resolves to a root can ever pass validation
+    if any(token.id is not None and len(token.root_words) == 0 for token in tokens_list):
+        skipped += 1
+        continue
+    before = len(sentence_bank)
+    sentence_bank.add(MessageData(message=result["sentence"], data=tokens_list, focus_words=result.get("focus_words", [])).model_dump())
+    added += len(sentence_bank) - before
+
+print(f"Added {added} sentences, skipped {skipped} with unknown words, the bank now has {len(sentence_bank)} sentences")
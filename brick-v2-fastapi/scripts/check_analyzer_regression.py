@@ -0,0 +1,85 @@
+import io
+import json
+import time
+from contextlib import redirect_stdout
+from rich import print
+from spacy import tokens
+from analysis_cache import analysis_cache
+from sentences import TokenInfo, get_nlp_de, get_roots, tokens_from_doc
+
+# PYTHONPATH=. python3 scripts/check_analyzer_regression.py
+# runs the sentences from sentence_results.json and incorrect_sentence_results.json
+# through tokens_from_doc and through the analyzer as it was before the id index, and
+# fails if any token comes out different. Then times both on longer texts, where the
+# old analyzer's scan of tokens_list for every separable prefix was quadratic.
+
+
+# tokens_from_doc before the id index, kept as the reference
+def legacy_tokens_from_doc(doc: tokens.Doc) -> list[TokenInfo]:
+    tokens_list: list[TokenInfo] = []
+    for token in doc:
+        is_svp = False
+        full_svp_word = None
+        if token.dep_ == "svp":
+            is_svp = True
+            id = token.head.idx
+            full_svp_word = token.text + token.head.text
+            print(token)
+            print(token.head)
+            root_words = [token.text + lemma for lemma in get_roots(token.head)]
+            for t in tokens_list:
+                if t.id == id:
+                    t.root_words = root_words
+                    t.is_svp = True
+        elif token.dep_ != 'punct' and token.pos_ != 'PUNCT' and token.pos_ != 'SPACE':
+            id = token.idx
+            root_words = get_roots(token)
+        else:
+            id = None
+            root_words = []
+        tokens_list.append(TokenInfo(
+            token=token.text,
+            token_ws=token.whitespace_,
+            id=id,
+            root_words=root_words,
+            is_svp=is_svp,
+            full_svp_word=full_svp_word if full_svp_word else None
+        ))
+    return tokens_list
+
+
+def dump(tokens_list: list[TokenInfo]) -> list[dict]:
+    # root_words order comes from a set, it carries no meaning
+    return [dict(token.model_dump(), root_words=sorted(token.root_words)) for token in tokens_list]
+
+
+analysis_cache.max_size = 0
+sentence_list = []
+for path in ("sentence_results.json", "incorrect_sentence_results.json"):
+    with open(path, "r") as f:
+        sentence_list.extend(result["sentence"] for result in json.load(f))
+
+nlp = get_nlp_de()
+docs = list(nlp.pipe(sentence_list))
+svp_count = sum(1 for doc in docs for token in doc if token.dep_ == "svp")
+mismatches = [doc.text for doc in docs if dump(tokens_from_doc(doc)) != dump(legacy_tokens_from_doc(doc))]
+print(f"{len(docs)} sentences, {svp_count} separable prefixes, {len(mismatches)} different")
+for text in mismatches[:10]:
+    print(f"  {text}")
+
+for sentences_per_text in (1, 10, 50, 200):
+    texts = [" ".join(sentence_list[i:i + sentences_per_text]) for i in range(0, len(sentence_list), sentences_per_text)]
+    long_docs = list(nlp.pipe(texts))
+    timings = {}
+    for name, analyze in (("legacy", legacy_tokens_from_doc), ("indexed", tokens_from_doc)):
+        # without the debug output, which would dominate the timing
+        with redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            for doc in long_docs:
+                analyze(doc)
+            timings[name] = (time.perf_counter() - started) * 1000
+    tokens_per_text = sum(len(doc) for doc in long_docs) / len(long_docs)
+    print(f"{sentences_per_text:>3} sentences per text (~{tokens_per_text:.0f} tokens): legacy {timings['legacy']:.1f} ms, indexed {timings['indexed']:.1f} ms")
+
+if mismatches:
+    raise SystemExit(1)
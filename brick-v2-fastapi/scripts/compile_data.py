@@ -0,0 +1,15 @@
+import time
+from compiled_data import COMPILED_DATA_DIR
+from root_index import load_root_index
+from word_data import load_word_data
+
+# PYTHONPATH=. python3 scripts/compile_data.py
+# rebuilds the compiled word data and root index in COMPILED_DATA_DIR, e.g. on deploy so
+# the first start doesn't compile them. The app does the same on its own when they are
+# missing or out of date.
+
+for name, load in [("word data", load_word_data), ("root index", load_root_index)]:
+    started = time.perf_counter()
+    load(rebuild=True)
+    print(f"compiled {name} in {(time.perf_counter() - started) * 1000:.0f} ms")
+print(f"written to {COMPILED_DATA_DIR}/")
@@ -0,0 +1,54 @@
+import argparse
+import time
+from fsrs import FSRS
+from fsrs.models import DEFAULT_W, parameters_file, save_parameters
+from fsrs.optimizer import ReviewHistory, log_loss, optimize
+from card_store import DEFAULT_USER
+from review_log import review_log
+
+# PYTHONPATH=. python3 scripts/fit_fsrs_parameters.py [--user default] [--dry-run]
+# fits the FSRS model weights to a learner's reviews in the review log and writes them to
+# the learner's entry in the parameters file (FSRS_PARAMETERS_FILE, default
+# fsrs_parameters.json), where the app's schedulers for that learner read them from on the
+# next start. Other learners' weights are kept. The fit starts from the learner's weights
+# in use, and nothing is written unless it predicts the reviews better.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--user", default=DEFAULT_USER)
+parser.add_argument("--output", default=parameters_file())
+parser.add_argument("--steps", type=int, default=100)
+parser.add_argument("--min-predictions", type=int, default=1000, help="reviews to predict needed before fitting, fewer overfit")
+parser.add_argument("--dry-run", action="store_true")
+args = parser.parse_args()
+
+if review_log is None:
+    raise SystemExit("The review log is off (REVIEW_LOG_FILE is empty)")
+
+started = time.perf_counter()
+columns = review_log.columns(args.user)
+history = ReviewHistory(
+    columns["word_id"],
+    columns["rating"],
+    columns["elapsed_days"],
+    columns["state"],
+    stability=columns["stability_before"],
+    difficulty=columns["difficulty_before"],
+)
+print(f"{len(columns['word_id'])} reviews in the log, {history.reviews} of {len(history)} words replayed, {history.predictions} to predict ({time.perf_counter() - started:.2f}s)")
+if history.predictions < args.min_predictions:
+    raise SystemExit(f"Not enough reviews to fit the weights yet ({history.predictions} < {args.min_predictions})")
+
+current_w = FSRS(user=args.user).p.w
+started = time.perf_counter()
+result = optimize(history, current_w, steps=args.steps)
+print(f"fitted in {time.perf_counter() - started:.2f}s ({result.steps} steps)")
+print(f"log loss: default weights {log_loss(history, DEFAULT_W):.4f}, current {result.initial_loss:.4f}, fitted {result.loss:.4f}")
+print("w =", tuple(round(weight, 4) for weight in result.w))
+
+if args.dry_run:
+    pass
+elif result.loss < result.initial_loss:
+    path = save_parameters(result.w, args.output, user=args.user, log_loss=result.loss, predictions=result.predictions, fitted_at=time.time())
+    print(f"Wrote {path}, restart the app to use them")
+else:
+    print("The current weights predict the reviews as well, nothing written")
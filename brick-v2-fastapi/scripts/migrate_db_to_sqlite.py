@@ -0,0 +1,20 @@
+import json
+from card_store import JournaledCardStore, SqliteCardStore, SQLITE_DB_FILE
+
+# PYTHONPATH=. python3 scripts/migrate_db_to_sqlite.py
+# then run the server with CARD_STORE=sqlite
+
+# Load the current database (db.json plus anything still sitting in its journal)
+db_data = JournaledCardStore().load()
+
+sqlite_store = SqliteCardStore(SQLITE_DB_FILE)
+for user, user_data in db_data.items():
+    words_data = user_data.get("words", {})
+    sqlite_store.put_cards(words_data, user=user)
+    print(f"Migrated {len(words_data)} cards for {user}")
+
+    # make sure nothing got lost on the way
+    migrated = sqlite_store.load_words(user=user)
+    assert json.dumps(migrated, sort_keys=True) == json.dumps(words_data, sort_keys=True), f"Migration of {user} doesn't match db.json"
+
+print(f"Done, cards are in {SQLITE_DB_FILE}")
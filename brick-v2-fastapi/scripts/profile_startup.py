@@ -0,0 +1,78 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# PYTHONPATH=. python3 scripts/profile_startup.py --top 20 --max-seconds 2
+# imports main in a fresh interpreter with -X importtime and reports how long each
+# import took, the app's own modules separately. With --max-seconds it exits with 1
+# when importing main takes longer, to catch startup regressions. Also times loading
+# the word data and root index from the compiled files against parsing the JSON.
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--module", default="main", help="module to import")
+parser.add_argument("--top", type=int, default=15, help="how many of the slowest imports to list")
+parser.add_argument("--max-seconds", type=float, default=None, help="fail when the import takes longer")
+args = parser.parse_args()
+
+app_modules = {name[:-3] for name in os.listdir(".") if name.endswith(".py")}
+
+
+def profile_import(module: str) -> list[tuple[str, int, int]]:
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True)
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        sys.exit(f"importing {module} failed")
+    # "import time: self [us] | cumulative | imported package", nested imports are indented
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+imports = profile_import(args.module)
+total = next(cumulative for name, _, cumulative in imports if name == args.module) / 1e6
+
+print(f"{'module':<40} {'self ms':>9} {'cumulative ms':>14}")
+for name, self_us, cumulative_us in sorted(imports, key=lambda i: -i[2])[:args.top]:
+    print(f"{name:<40} {self_us / 1000:>9.1f} {cumulative_us / 1000:>14.1f}")
+
+print("\napp modules")
+for name, self_us, cumulative_us in sorted((i for i in imports if i[0] in app_modules), key=lambda i: -i[2]):
+    print(f"{name:<40} {self_us / 1000:>9.1f} {cumulative_us / 1000:>14.1f}")
+
+from compiled_data import load_compiled  # noqa: E402
+from root_index import RootIndex, load_root_index  # noqa: E402
+from word_data import WORD_DATA_FILE, build_word_data  # noqa: E402
+
+
+def timed(load) -> float:
+    started = time.perf_counter()
+    load()
+    return (time.perf_counter() - started) * 1000
+
+
+print(f"\n{'data':<40} {'compiled ms':>11} {'from JSON ms':>13}")
+
+def load_compiled_word_data():
+    return load_compiled("word_data", WORD_DATA_FILE, build_word_data, key=WORD_DATA_FILE)
+
+
+def load_json_word_data():
+    with open(WORD_DATA_FILE, "rb") as f:
+        return build_word_data(f.read())
+
+
+# the first loads compile whatever is missing or out of date
+load_compiled_word_data()
+load_root_index()
+print(f"{'word data':<40} {timed(load_compiled_word_data):>11.1f} {timed(load_json_word_data):>13.1f}")
+print(f"{'root index':<40} {timed(load_root_index):>11.1f} {timed(RootIndex.from_file):>13.1f}")
+
+print(f"\nimporting {args.module} took {total:.2f}s")
+if args.max_seconds is not None and total > args.max_seconds:
+    sys.exit(f"over the budget of {args.max_seconds:.2f}s")
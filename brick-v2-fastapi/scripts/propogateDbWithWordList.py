@@ -1,6 +1,11 @@
 import json
+from card_store import card_store
+from cards import create_new_review_card_multiple_times
 
 # PYTHONPATH=. python3 scripts/propogateDbWithWordList.py
+# adds cards for the first words of the word list through the card store, so it works
+# with every CARD_STORE backend and the journal. Run it while the server is stopped,
+# the server keeps its own copy of the cards in memory.
 
 # Load words from the word list file
 with open("5009_word_and_scraped_cd.json", "r") as word_list_file:
@@ -9,23 +14,15 @@ with open("5009_word_and_scraped_cd.json", "r") as word_list_file:
 # We only need the first 1000 words
 words_to_add = word_list[:100]
 
-# Load the current database
-with open("./db.json", "r+") as db_file:
-    db_data = json.load(db_file)
-    words_data = db_data.get("user", {}).get("words", {})
-
-    # Add new words with correct_attempts: 1 and total_attempts: 1
-    for word_entry in words_to_add:
-        word = word_entry.get("word")
-        if word and word not in words_data:
-            from cards import create_new_review_card_multiple_times
-            card = create_new_review_card_multiple_times()
-            words_data[word] = card.to_dict()
-
-    # Update the database
-    db_file.seek(0)
-    json.dump(db_data, db_file, indent=4)
-    db_file.truncate()
+existing_words = card_store.words()
+new_cards = {}
+for word_entry in words_to_add:
+    word = word_entry.get("word")
+    if word and word not in existing_words and word not in new_cards:
+        new_cards[word] = create_new_review_card_multiple_times().to_compact()
+
+card_store.put_cards(new_cards)
+print(f"Added {len(new_cards)} cards")
 
 from fsrs import FSRS, Card, Rating
 
@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+import time
+from typing import Optional
+from card_store import DEFAULT_USER
+from root_index import root_index
+
+# Every validated sentence is kept in a local bank so it can be served again instead
+# of asking the LLM for a new one. Sentences are indexed by the root words of their
+# tokens, so finding the sentences that contain all focus words is an intersection
+# of a few small posting sets. A stored sentence can be reused when every part of every
+# word token (both the modifier and the head of a compound) still has a root in the
+# learner's allowed words, which is the same check process_and_validate_message does.
+#
+# The bank is an append-only JSON lines file holding two kinds of records:
+#   {"type": "sentence", "id": ..., "message_data": MessageData dict}
+#   {"type": "served", "id": ..., "user": ..., "at": epoch seconds}
+# "served" records drive the cooldown, so a learner doesn't get the same sentence again
+# within SENTENCE_BANK_COOLDOWN seconds, even across restarts.
+
+SENTENCE_BANK_FILE = os.getenv("SENTENCE_BANK_FILE", "sentence_bank.jsonl")
+SENTENCE_BANK_COOLDOWN = float(os.getenv("SENTENCE_BANK_COOLDOWN", str(3 * 24 * 60 * 60)))
+
+
+def normalize_sentence(message: str) -> str:
+    return " ".join(message.split()).casefold()
+
+
+class SentenceBank:
+    def __init__(self, path: str = SENTENCE_BANK_FILE, cooldown: float = SENTENCE_BANK_COOLDOWN):
+        self.path = path
+        self.cooldown = cooldown
+
+        self._sentences: list[dict] = []
+        # the roots of every part of every word token of a sentence, one frozenset per part
+        self._part_roots: list[list[frozenset[str]]] = []
+        # root word -> ids of the sentences with a token that has that root
+        self._index: dict[str, set[int]] = {}
+        self._ids_by_text: dict[str, int] = {}
+        self._last_served: dict[tuple[str, int], float] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def load(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                with open(self.path, "r") as bank_file:
+                    for line in bank_file:
+                        if not line.strip():
+                            continue
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            # a torn write from a crash, only that record is lost
+                            continue
+                        if record["type"] == "sentence":
+                            self._add(record["message_data"])
+                        elif record["type"] == "served":
+                            self._last_served[(record["user"], record["id"])] = record["at"]
+            except FileNotFoundError:
+                pass
+            self._loaded = True
+
+    def __len__(self) -> int:
+        self.load()
+        return len(self._sentences)
+
+    def _add(self, message_data: dict) -> Optional[int]:
+        text = normalize_sentence(message_data["message"])
+        if text in self._ids_by_text:
+            return None
+        sentence_id = len(self._sentences)
+        self._sentences.append(message_data)
+        self._ids_by_text[text] = sentence_id
+
+        word_tokens = [token for token in message_data["data"] if token["id"] is not None]
+        self._part_roots.append([frozenset(part) for token in word_tokens for part in root_index.token_parts(token["token"], token["root_words"], token["is_svp"])])
+        for token in word_tokens:
+            for root in token["root_words"]:
+                self._index.setdefault(root, set()).add(sentence_id)
+        return sentence_id
+
+    def _append_record(self, record: dict) -> None:
+        with open(self.path, "a") as bank_file:
+            bank_file.write(json.dumps(record) + "\n")
+
+    # stores a validated sentence (a MessageData dict) unless it's already in the bank, returns its id
+    def add(self, message_data: dict) -> int:
+        self.load()
+        with self._lock:
+            sentence_id = self._add(message_data)
+            if sentence_id is None:
+                return self._ids_by_text[normalize_sentence(message_data["message"])]
+            self._append_record({"type": "sentence", "id": sentence_id, "message_data": message_data})
+            return sentence_id
+
+    def mark_served(self, sentence_id: int, user: str = DEFAULT_USER) -> None:
+        self.load()
+        now = time.time()
+        with self._lock:
+            self._last_served[(user, sentence_id)] = now
+            self._append_record({"type": "served", "id": sentence_id, "user": user, "at": now})
+
+    # a stored sentence that uses all focus words and only allowed words, and that the user
+    # hasn't been served within the cooldown, as (id, MessageData dict). None on a miss.
+    def find(self, focus_words: list[str], allowed_words: set[str], user: str = DEFAULT_USER) -> Optional[tuple[int, dict]]:
+        self.load()
+        now = time.time()
+        with self._lock:
+            postings = [self._index.get(word, set()) for word in focus_words]
+            if not postings:
+                return None
+            postings.sort(key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+
+            # prefer the sentences served longest ago (never served first)
+            for sentence_id in sorted(candidates, key=lambda i: self._last_served.get((user, i), 0)):
+                if now - self._last_served.get((user, sentence_id), float("-inf")) < self.cooldown:
+                    continue
+                if all(not roots.isdisjoint(allowed_words) for roots in self._part_roots[sentence_id]):
+                    return sentence_id, dict(self._sentences[sentence_id], focus_words=list(focus_words))
+            return None
+
+
+sentence_bank = SentenceBank()
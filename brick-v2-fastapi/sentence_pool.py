@@ -0,0 +1,181 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+from rich import print
+from learner_state import learner_state
+from sentences import MessageData, generate_sentence_async, get_focus_words
+
+# Generating a sentence takes several LLM round trips, so a few validated sentences
+# are generated ahead of time by background workers and GET /sentence just pops one.
+# There is one pool per learner.
+#
+# Every sentence in the pool has its own focus words: before a refill starts, the pool
+# picks the next words due (get_focus_words) leaving out every word it has reserved, and
+# reserves the new ones. Words stay reserved while their sentence is being generated,
+# while it waits in the pool, and after it was served until /sentence_result reviews
+# them, so the learner never gets the same focus words twice in a row and reviewing one
+# sentence doesn't make the next one stale. Once a word is reviewed, pooled sentences
+# built around it are dropped, since that word is no longer due.
+#
+# SENTENCE_POOL_DEPTH=0 turns the pool off and generates every sentence inline.
+
+SENTENCE_POOL_DEPTH = int(os.getenv("SENTENCE_POOL_DEPTH", "2"))
+SENTENCE_POOL_WORKERS = int(os.getenv("SENTENCE_POOL_WORKERS", "1"))
+# how long a worker waits before retrying after a failed generation
+SENTENCE_POOL_RETRY_DELAY = float(os.getenv("SENTENCE_POOL_RETRY_DELAY", "5"))
+
+
+class SentencePool:
+    def __init__(self, user: str, generate: Callable[[list[str]], Awaitable[MessageData]], pick_focus_words: Callable[[set[str]], list[str]], depth: int = SENTENCE_POOL_DEPTH, workers: int = SENTENCE_POOL_WORKERS):
+        self.user = user
+        self.generate = generate
+        self.pick_focus_words = pick_focus_words
+        self.depth = depth
+        self.workers = workers
+
+        self._sentences: deque[MessageData] = deque()
+        # the focus words of the sentences being generated, and of the served sentences
+        # that weren't reviewed yet (the oldest are forgotten if results never come)
+        self._in_flight: list[list[str]] = []
+        self._served: deque[set[str]] = deque(maxlen=max(depth, 1))
+        # when each word was last reviewed, sentences generated before that are stale
+        self._reviewed_at: dict[str, float] = {}
+        # invalidate() is called from FastAPI's thread pool, the workers run on the event loop
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._refill_needed: Optional[asyncio.Event] = None
+        self._worker_tasks: list[asyncio.Task] = []
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.refills = 0
+        self.refill_failures = 0
+        self.refill_seconds_total = 0.0
+        self.last_refill_seconds: Optional[float] = None
+
+    def start(self) -> None:
+        if self.depth <= 0 or self._worker_tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._refill_needed = asyncio.Event()
+        self._refill_needed.set()
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._loop = None
+
+    async def get(self) -> MessageData:
+        with self._lock:
+            pooled = self._sentences.popleft() if self._sentences else None
+            if pooled is not None:
+                self._served.append(set(pooled.focus_words))
+        self._wake_workers()
+
+        if pooled is not None:
+            self.hits += 1
+            return pooled
+
+        self.misses += 1
+        print("[yellow]Sentence pool is empty, generating inline[/yellow]")
+        focus_words = self._reserve_focus_words()
+        try:
+            return await self.generate(focus_words)
+        finally:
+            with self._lock:
+                self._in_flight.remove(focus_words)
+                self._served.append(set(focus_words))
+
+    # drop every pooled sentence built around one of the reviewed words, and release the words
+    def invalidate(self, words: list[str]) -> None:
+        now = time.monotonic()
+        reviewed = set(words)
+        with self._lock:
+            for word in reviewed:
+                self._reviewed_at[word] = now
+            kept = deque(s for s in self._sentences if reviewed.isdisjoint(s.focus_words))
+            self.invalidated += len(self._sentences) - len(kept)
+            self._sentences = kept
+            self._served = deque((served - reviewed for served in self._served if served - reviewed), maxlen=self._served.maxlen)
+        self._wake_workers()
+
+    # the next focus words that no sentence of the pool uses, reserved until their sentence is done
+    def _reserve_focus_words(self) -> list[str]:
+        with self._lock:
+            reserved = set().union(*(s.focus_words for s in self._sentences), *self._in_flight, *self._served)
+            focus_words = self.pick_focus_words(reserved)
+            self._in_flight.append(focus_words)
+        return focus_words
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._sentences)
+        requests = self.hits + self.misses
+        return {
+            "user": self.user,
+            "depth": self.depth,
+            "size": size,
+            "in_flight": len(self._in_flight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else None,
+            "invalidated": self.invalidated,
+            "refills": self.refills,
+            "refill_failures": self.refill_failures,
+            "avg_refill_seconds": self.refill_seconds_total / self.refills if self.refills else None,
+            "last_refill_seconds": self.last_refill_seconds,
+        }
+
+    def _wake_workers(self) -> None:
+        if self._loop is not None and self._refill_needed is not None:
+            self._loop.call_soon_threadsafe(self._refill_needed.set)
+
+    def _needs_refill(self) -> bool:
+        with self._lock:
+            return len(self._sentences) + len(self._in_flight) < self.depth
+
+    async def _worker(self) -> None:
+        while True:
+            await self._refill_needed.wait()
+            if not self._needs_refill():
+                self._refill_needed.clear()
+                continue
+
+            started = time.monotonic()
+            focus_words = None
+            try:
+                focus_words = self._reserve_focus_words()
+                message_data = await self.generate(focus_words)
+            except Exception as e:
+                if focus_words is not None:
+                    with self._lock:
+                        self._in_flight.remove(focus_words)
+                self.refill_failures += 1
+                print(f"[red]Sentence pool refill failed: {e}[/red]")
+                await asyncio.sleep(SENTENCE_POOL_RETRY_DELAY)
+                continue
+
+            elapsed = time.monotonic() - started
+            self.refills += 1
+            self.refill_seconds_total += elapsed
+            self.last_refill_seconds = elapsed
+
+            with self._lock:
+                self._in_flight.remove(focus_words)
+                # a focus word may have been reviewed while the sentence was being generated
+                if any(self._reviewed_at.get(word, 0) > started for word in message_data.focus_words):
+                    self.invalidated += 1
+                else:
+                    self._sentences.append(message_data)
+            print(f"[blue]Sentence pool refilled in {elapsed:.1f}s ({self.stats()['size']}/{self.depth})[/blue]")
+
+
+# the pool of the learner this app serves
+sentence_pool = SentencePool(learner_state.user, generate_sentence_async, get_focus_words)
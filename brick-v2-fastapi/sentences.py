@@ -1,67 +1,55 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 import json
 import random
+import re
+import threading
+from collections import OrderedDict
 from pprint import pprint
-from typing import Any, Optional, TypedDict 
+from typing import TYPE_CHECKING, Collection, Optional
 from rich import print
-import openai
-import spacy
 from pydantic import BaseModel
-from spacy import tokens
 import os
 from dotenv import load_dotenv
-import anthropic
-from fsrs import Card, FSRS
-fsrs = FSRS()
+from fsrs import FSRS
+from learner_state import NewWordCursor, learner_state
+from sentence_bank import sentence_bank
+from generators import sentence_generator
+from analysis_cache import analysis_cache, normalize_text
+from root_index import root_index
+from vocabulary import AllowedVocabulary, Vocabulary, as_vocabulary
+from word_data import load_full_word_list
+# spaCy takes a second to import, it is imported when the model is loaded
+if TYPE_CHECKING:
+    import spacy
+    from spacy import tokens
+fsrs = FSRS(user=learner_state.user)
 
 load_dotenv()
-CLAUDE_API_KEY = os.getenv('CLAUDE_API_KEY')
-
-
-
-# must use build constraint when install spacy
-# must install numpy<2
-def create_system_prompt(focus_word: str, word_list: str, language: str = 'German') -> str:
-
-    wordList = '\n'.join(word_list)
-    return f"""
-    You are an expert in the {language} language. You are creative, playful, witty. Your job is to help the learner learn by generating whimsical practice sentences that meet the specified requirements. You will be given a word list, and asked to only generate 
-    Only use words based on the following word list: 
-    {wordList}
-
-    It can be different versions of each of these words, including different case, plurality, gender, or conjugation.
-    For instance, "das" or "dem" would count as a version of "der". 
-    If "Sie" is on the list, you could use "Ihnen".
-    If "sein" is on the list, you could use "bin" or "ist".
-    If "Berg" is on the list, you could use "Bergen".
-    If "Haus" is on the list, you could use "Hause".
-    If "verstecken" is on the list, you could use "Verstecke".
-    If "essen" is on the list, you could use "aß".
-    If "unterer" is on the list, you could use "untere".
-    If "nächster" is on the list, you could use "nächste".
-    If "dieser" is on the list, you could use "dies".
-    
-
-    But *ONLY* use words and versions of words from this list. DO NOT use any other words. Let me reiterate, do NOT, use any other words.
-    
-    Additionally, your main requirement is to use the focus words specified. Create a great example sentence with these focus words in context in order for the user to get a good grasp on how they might be used.
-    You are a native speaker, and you actually don't know English. Make sure that your <answer> always contains only German. Make sure that you only provide one, great sentence, and not an alternative or several sentences.
-    
-    Before you reply, consider the word list and how you might structure your reply given your limited vocabulary. Write out this thinking within <thinking> tags.
-    Always reply in this XML format:
-    ```
-    <thinking></thinking>
-    <answer></answer>
-    ```
-    """
-
-
-
 
 # Constants and Configuration
-GERMAN_MODEL = 'de_dep_news_trf'
-WORD_DATA_FILE = '5009_word_and_scraped_cd.json'
-LOOKUP_TABLE_FILE = './5009_cd_to_word_lookup.json'
+# spaCy model per NLP_TIER: the CNN models (sm, md) are fast enough to validate every
+# candidate while serving, the transformer (trf) is the most accurate, for offline
+# verification. scripts/benchmark_nlp_tiers.py compares them. GERMAN_MODEL overrides the tier.
+NLP_MODELS = {"sm": "de_core_news_sm", "md": "de_core_news_md", "trf": "de_dep_news_trf"}
+NLP_TIER = os.getenv("NLP_TIER", "trf")
+GERMAN_MODEL = os.getenv("GERMAN_MODEL", NLP_MODELS[NLP_TIER])
+# analyze_and_add_roots only uses the tokens, pos_ and dep_ (for svp), so nothing else is loaded
+NLP_EXCLUDED_COMPONENTS = ["lemmatizer", "ner", "entity_ruler", "entity_linker", "senter", "textcat"]
+# how many candidate sentences to request at once, 1 generates one attempt at a time
+SPECULATIVE_CANDIDATES = int(os.getenv("SPECULATIVE_CANDIDATES", "1"))
+# cost cap: the most LLM requests made for a single sentence, candidates and retries together
+MAX_LLM_CALLS_PER_SENTENCE = int(os.getenv("MAX_LLM_CALLS_PER_SENTENCE", "5"))
+# whether to continue with corrective retries when every candidate is invalid
+SPECULATIVE_FALLBACK = os.getenv("SPECULATIVE_FALLBACK", "true").lower() == "true"
+# stream replies and stop them at the first word of the answer that can't be valid
+STREAM_GENERATION = os.getenv("STREAM_GENERATION", "false").lower() == "true"
+# reject answers with words that plainly can't be valid before spaCy runs
+LEXICAL_PREVALIDATION = os.getenv("LEXICAL_PREVALIDATION", "true").lower() == "true"
+# nlp.pipe settings for validating many candidates at once
+NLP_BATCH_SIZE = int(os.getenv("NLP_BATCH_SIZE", "32"))
+NLP_N_PROCESS = int(os.getenv("NLP_N_PROCESS", "1"))
 
 # Data Models
 class TokenizeRequest(BaseModel):
@@ -98,65 +86,68 @@ class ValidationResult(BaseModel):
     messageData: Optional[MessageData] = None
 
 # Initialize clients and models
-client = openai.OpenAI()
-nlp_de = spacy.load(GERMAN_MODEL)
+def load_nlp(model: str = GERMAN_MODEL) -> "spacy.Language":
+    import spacy
+    return spacy.load(model, exclude=NLP_EXCLUDED_COMPONENTS)
+
+# the model is loaded on first use rather than at import, main.py warms it up at startup
+_nlp_de: Optional["spacy.Language"] = None
+_nlp_de_lock = threading.Lock()
+
+def get_nlp_de() -> "spacy.Language":
+    global _nlp_de
+    if _nlp_de is None:
+        with _nlp_de_lock:
+            if _nlp_de is None:
+                print(f"[green]Loading spaCy model {GERMAN_MODEL}[/green]")
+                _nlp_de = load_nlp(GERMAN_MODEL)
+    return _nlp_de
+
+# spaCy work from async code runs here, one worker since the pipeline isn't meant to be shared across threads
+nlp_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nlp")
 
 # Data loading functions
-def load_full_word_list():
-    with open(WORD_DATA_FILE) as f:
-        data = json.load(f)
-    return [word_obj['word'] for word_obj in data]
-
 full_word_list: list[str] = load_full_word_list()
+new_word_cursor = NewWordCursor(full_word_list, learner_state)
+allowed_vocabulary = AllowedVocabulary(full_word_list, root_index)
 
 
 
 # currently all allowed words are in all tracked words (rounded down to nearest 25 to save on tokens)
 # ideally in the future, we'd only allow words that they know well
-def load_allowed_word_list():
-    with open("db.json", "r") as db_file:
-        db_data = json.load(db_file)
-        num_words = len(db_data["user"]["words"])
-        # Round down to nearest 25
-        rounded_num = 25 * (num_words // 25)
-        # Get that many words from full word list
-        return full_word_list[:rounded_num]
-
-def load_lookup_table():
-    with open(LOOKUP_TABLE_FILE, "r") as file:
-        return json.load(file)
-full_lookup_table: dict[str, list[str]] = load_lookup_table()
-
-
-# get a random sample of words from the words that are due soon
-def get_focus_words(): 
+def load_allowed_word_list() -> Vocabulary:
+    num_words = learner_state.count()
+    # Round down to nearest 25
+    rounded_num = 25 * (num_words // 25)
+    # Get that many words from full word list
+    return allowed_vocabulary.first(rounded_num)
+
+# cached analyses are only valid for the lookup table, root rules and model that produced them
+analysis_cache.set_version(f"{root_index.version}:{GERMAN_MODEL}")
+
+
+# get a random sample of words from the words that are due soon, leaving out the excluded
+# ones (the sentence pool excludes the focus words of the sentences it already holds)
+def get_focus_words(exclude: Collection[str] = ()):
     NUMBER_OF_WORDS = 2
     NUMBER_OF_SAMPLE_WORDS = NUMBER_OF_WORDS * 4
     
-    with open("db.json", "r") as db_file:
-        db_data = json.load(db_file)
-        words_data = db_data.get("user", {}).get("words", {})
-        # Sort words by due
-        sorted_words = sorted(words_data.items(), key=lambda x: x[1]['due'])
-        
-        print('sorted words')
-        print(sorted_words[:10])
-        
-        words_to_sample_from = []
-        for _ in range(NUMBER_OF_SAMPLE_WORDS):
-            # Choose the word with the soonest due date
-            if datetime.fromisoformat(sorted_words[len(words_to_sample_from)][1]["due"]) < datetime.now(timezone.utc):
-                words_to_sample_from.append(sorted_words[len(words_to_sample_from)][0])
-            else:
-                # or the next word in the full list
-                for word in full_word_list:
-                    if word not in words_data and word not in words_to_sample_from:
-                        words_to_sample_from.append(word)
-                        break
-        if len(words_to_sample_from) < NUMBER_OF_WORDS:
-            raise Exception(f"Not enough words to meet focus_words requirement. Requested {NUMBER_OF_WORDS} words, but only found {len(words_to_sample_from)} words.")
-        
-        return random.sample(words_to_sample_from, NUMBER_OF_WORDS)
+    # Choose the words with the soonest due dates that are already due
+    sorted_words = learner_state.soonest_due(NUMBER_OF_SAMPLE_WORDS + len(exclude))
+    
+    print('sorted words')
+    print([word for word, _ in sorted_words])
+    
+    now = datetime.now(timezone.utc)
+    words_to_sample_from = [word for word, card in sorted_words if card.due < now and word not in exclude][:NUMBER_OF_SAMPLE_WORDS]
+    # or the next words in the full list
+    missing = NUMBER_OF_SAMPLE_WORDS - len(words_to_sample_from)
+    if missing > 0:
+        words_to_sample_from += [word for word in new_word_cursor.next_words(missing + len(exclude)) if word not in exclude][:missing]
+    if len(words_to_sample_from) < NUMBER_OF_WORDS:
+        raise Exception(f"Not enough words to meet focus_words requirement. Requested {NUMBER_OF_WORDS} words, but only found {len(words_to_sample_from)} words.")
+    
+    return random.sample(words_to_sample_from, NUMBER_OF_WORDS)
             
     
         
@@ -164,26 +155,15 @@ def get_focus_words():
 
 # Helper functions
 # Get all potential roots from the look up table based on the list of tokens
-def get_roots(token: tokens.Token) -> list[str]:
-    text = token.text
-    if text.startswith("Lieblings"):
-        text = text[len("Lieblings"):]
-        
-    final = []
-    if text in full_lookup_table:
-        final.extend(full_lookup_table[text])
-        
-    if text.lower() in full_lookup_table:
-        final.extend(full_lookup_table[text.lower()])
-        
-    if text.capitalize() in full_lookup_table:
-        final.extend(full_lookup_table[text.capitalize()])
-        
+def get_roots(token: "tokens.Token") -> list[str]:
+    final = get_roots_for_text(token.text)
     if len(final) == 0:
         # raise Exception(f"{token.text} not in lookup table")
         print(f"{token.text} not in lookup table")
-    
-    return list(set(final))
+    return final
+
+def get_roots_for_text(text: str) -> list[str]:
+    return root_index.resolve(text)
   
   
 
@@ -215,16 +195,43 @@ def parse_claude_response(resp: str):
 
 # process a normal message => split it into tokens and determine what root words it traces back to.
 def analyze_and_add_roots(input_str, language): 
+    input_str = normalize_text(input_str)
+    cached = analysis_cache.get(input_str, language)
+    if cached is not None:
+        return [TokenInfo(**token) for token in cached]
+    tokens_list = tokens_from_doc(get_nlp(language)(input_str))
+    analysis_cache.put(input_str, language, [token.model_dump() for token in tokens_list])
+    return tokens_list
+
+# same as analyze_and_add_roots for many strings at once, the ones not in the cache go through nlp.pipe in batches
+def analyze_many(input_strs: list[str], language: str, batch_size: int = NLP_BATCH_SIZE, n_process: int = NLP_N_PROCESS) -> list[list[TokenInfo]]:
+    input_strs = [normalize_text(input_str) for input_str in input_strs]
+    analyzed: dict[str, list[dict]] = {}
+    missing: list[str] = []
+    for input_str in dict.fromkeys(input_strs):
+        cached = analysis_cache.get(input_str, language)
+        if cached is None:
+            missing.append(input_str)
+        else:
+            analyzed[input_str] = cached
+    for input_str, doc in zip(missing, get_nlp(language).pipe(missing, batch_size=batch_size, n_process=n_process)):
+        analyzed[input_str] = [token.model_dump() for token in tokens_from_doc(doc)]
+        analysis_cache.put(input_str, language, analyzed[input_str])
+    return [[TokenInfo(**token) for token in analyzed[input_str]] for input_str in input_strs]
+
+def get_nlp(language: str) -> "spacy.Language":
     if language == 'German':
-        nlp = nlp_de
-    else:
-        raise ValueError("language not allowed")
-    doc = nlp(input_str)
+        return get_nlp_de()
+    raise ValueError("language not allowed")
 
+def tokens_from_doc(doc: "tokens.Doc") -> list[TokenInfo]:
     tokens_list: list[TokenInfo] = []
     # idx is used as a unique identifier for words. 
     # svp's will have one unique identifier. 
     # punctuation/other non-word tokens will have None/null id value.
+    # the tokens added so far by id, so an svp finds its head (and the head's other
+    # particles) without scanning tokens_list
+    tokens_by_id: dict[int, list[TokenInfo]] = {}
 
     # pprint(doc.to_json())
     for token in doc:
@@ -245,11 +252,9 @@ def analyze_and_add_roots(input_str, language):
             root_words = [token.text + lemma for lemma in get_roots(token.head)]
             # print(f"spv lemmas: {root_words}")
             # set token head's lemmas to lemmas of current (spv) token
-            for t in tokens_list:
-                # should only match tokens head
-                if t.id == id:
-                    t.root_words = root_words
-                    t.is_svp = True
+            for t in tokens_by_id.get(id, []):
+                t.root_words = root_words
+                t.is_svp = True
             
         elif token.dep_ != 'punct' and token.pos_ != 'PUNCT' and token.pos_ != 'SPACE':
             id = token.idx
@@ -259,41 +264,154 @@ def analyze_and_add_roots(input_str, language):
             id = None
             root_words = []
         
-        tokens_list.append(TokenInfo(
+        token_info = TokenInfo(
             token=token.text,
             token_ws=token.whitespace_,
             id=id,
             root_words=root_words,
             is_svp=is_svp,
             full_svp_word=full_svp_word if full_svp_word else None
-        ))
+        )
+        tokens_list.append(token_info)
+        if id is not None:
+            tokens_by_id.setdefault(id, []).append(token_info)
   
     # pprint(tokens_list)
     return tokens_list
 
+# Checks the words of an answer against the lookup table and the allowed words with a
+# plain whitespace split, no spaCy. It errs on the side of letting a word through: only
+# plain alphabetic words are checked (spaCy may split anything else differently), and
+# a word that could still become valid as part of a separable verb ("stehe ... auf"
+# validates as "aufstehen") passes. Whatever it rejects, the full validation would too.
+# Verdicts are kept per word, lexical_checker hands out one checker per vocabulary.
+class LexicalChecker:
+  WORD_EDGES = re.compile(r"^\W+|\W+$")
+  LEADING_EDGE = re.compile(r"^\W+")
+
+  def __init__(self, word_list: list[str]):
+    self.allowed = as_vocabulary(word_list)
+    self._verdicts: dict[str, bool] = {}
+    self._size = len(self.allowed)
+
+  def can_be_valid(self, word: str) -> bool:
+    # words added to the vocabulary since can make rejected words valid
+    if len(self.allowed) != self._size:
+      self._verdicts = {}
+      self._size = len(self.allowed)
+    verdict = self._verdicts.get(word)
+    if verdict is None:
+      verdict = self._verdicts[word] = self._can_be_valid(word)
+    return verdict
+
+  def _can_be_valid(self, word: str) -> bool:
+    # every part of a compound needs an allowed root
+    parts = root_index.resolve_parts(word)
+    if parts and all(any(root in self.allowed for root in part) for part in parts):
+      return True
+    roots = get_roots_for_text(word)
+    # the verb of a separable verb validates as prefix + lemma
+    if any(root in self.allowed.verb_suffixes for root in roots):
+      return True
+    # and so does the prefix
+    return word.lower() in self.allowed.particle_prefixes
+
+  # a whitespace-separated piece of the answer starting at position, as a TokenInfo if it can't be valid
+  def check(self, piece: str, position: int) -> Optional[TokenInfo]:
+    word = self.WORD_EDGES.sub("", piece)
+    # abbreviations like "bspw." are looked up with their period
+    if word.isalpha() and not self.can_be_valid(word) and not self.can_be_valid(self.LEADING_EDGE.sub("", piece)):
+      return TokenInfo(token=word, token_ws=" ", id=position, root_words=get_roots_for_text(word), is_svp=False, full_svp_word=None)
+    return None
+
+  def invalid_words(self, answer: str) -> list[TokenInfo]:
+    invalid_words = []
+    for match in re.finditer(r"\S+", answer):
+      invalid_word = self.check(match.group(), match.start())
+      if invalid_word is not None:
+        invalid_words.append(invalid_word)
+    return invalid_words
+
+# the LexicalCheckers of the latest vocabularies, so the attempts and streams for one
+# sentence share one. Keyed by id, a cached checker keeps its vocabulary alive.
+LEXICAL_CHECKERS = 8
+_lexical_checkers: OrderedDict[int, LexicalChecker] = OrderedDict()
+_lexical_checkers_lock = threading.Lock()
+
+def lexical_checker(word_list: list[str]) -> LexicalChecker:
+    vocabulary = as_vocabulary(word_list)
+    with _lexical_checkers_lock:
+        checker = _lexical_checkers.get(id(vocabulary))
+        if checker is None:
+            checker = _lexical_checkers[id(vocabulary)] = LexicalChecker(vocabulary)
+            if len(_lexical_checkers) > LEXICAL_CHECKERS:
+                _lexical_checkers.popitem(last=False)
+        else:
+            _lexical_checkers.move_to_end(id(vocabulary))
+    return checker
+
+prevalidation_stats = {"checked": 0, "rejected": 0}
+
+# the invalid ValidationResult for an answer with words that plainly can't be valid, None if it needs the full validation
+def prevalidate_message(message: str, word_list: list[str]) -> Optional[ValidationResult]:
+    if not LEXICAL_PREVALIDATION:
+        return None
+    prevalidation_stats["checked"] += 1
+    invalid_words = lexical_checker(word_list).invalid_words(message)
+    if not invalid_words:
+        return None
+    prevalidation_stats["rejected"] += 1
+    print(f"[red]Rejected before parsing, not on the list: {', '.join(invalid_word.token for invalid_word in invalid_words)}[/red]")
+    return ValidationResult(is_valid=False, reason="words not on word_list found", invalid_words=invalid_words)
+
 def process_and_validate_message(preprocessed_message: str, focus_words: list[str], word_list: list[str]) -> ValidationResult:
     message = parse_claude_response(preprocessed_message)
 
     pprint("message:\n")
     pprint(message)
-    invalid_words: list[TokenInfo] = []
+    rejected = prevalidate_message(message, word_list)
+    if rejected is not None:
+        return rejected
     # Process and validate the generated message
     tokens_list = analyze_and_add_roots(input_str=message, language="German")
-    for token in tokens_list:
-      # if token isn't punctuation
-      if token.id is not None:
+    return validate_tokens(message, tokens_list, focus_words, word_list)
+
+# Validates many replies for the same focus words at once, one ValidationResult per
+# reply in the same order. Replies without an <answer> are invalid instead of raising,
+# so one bad reply doesn't take the others down with it.
+def process_and_validate_messages(preprocessed_messages: list[str], focus_words: list[str], word_list: list[str], batch_size: int = NLP_BATCH_SIZE, n_process: int = NLP_N_PROCESS) -> list[ValidationResult]:
+    results: list[Optional[ValidationResult]] = [None] * len(preprocessed_messages)
+    messages: dict[int, str] = {}
+    for i, preprocessed_message in enumerate(preprocessed_messages):
+        try:
+            message = parse_claude_response(preprocessed_message)
+        except ValueError:
+            results[i] = ValidationResult(is_valid=False, reason="answer missing")
+            continue
+        # only the answers that survive the cheap check go through spaCy
+        results[i] = prevalidate_message(message, word_list)
+        if results[i] is None:
+            messages[i] = message
+
+    for i, tokens_list in zip(messages, analyze_many(list(messages.values()), "German", batch_size=batch_size, n_process=n_process)):
+        results[i] = validate_tokens(messages[i], tokens_list, focus_words, word_list)
+    return results
+
+def validate_tokens(message: str, tokens_list: list[TokenInfo], focus_words: list[str], word_list: list[str]) -> ValidationResult:
+    invalid_words: list[TokenInfo] = []
+    # tokens that aren't punctuation
+    word_tokens = [token for token in tokens_list if token.id is not None]
+    # whether each part of each token (modifier and head of a compound) has a root in the word_list, in one mask lookup
+    allowed = as_vocabulary(word_list).allows_every_part([root_index.token_parts(token.token, token.root_words, token.is_svp) for token in word_tokens])
+    for token, is_allowed in zip(word_tokens, allowed):
         # either there are no root words
         if len(token.root_words) == 0:
           print(f'couldnt identify roots for: {token.token}')
           invalid_words.append(token)
-        else: 
-          # make sure that some word in token["root_words"] is in the word_list, else add the token to invalid words
-          if any(root_word in word_list for root_word in token.root_words):
-            continue
-          else:
-            print(f'no root word of {token.token} found in word list')
-            print(token)
-            invalid_words.append(token)
+        elif not is_allowed:
+          print(f'no root word of {token.token} found in word list')
+          print(token)
+          invalid_words.append(token)
     # print('data:\n')
     # pprint(tokens_list)
     
@@ -325,6 +443,33 @@ def process_and_validate_message(preprocessed_message: str, focus_words: list[st
     return ValidationResult(is_valid=True, messageData=MessageData(message=message, data=tokens_list, focus_words=focus_words))
 
 
+def create_initial_messages(focus_words: list[str]) -> list[dict]:
+  return [
+          {"role": "user", 
+           "content": [{
+              "type": "text",
+              "text": f"Generate a sentence using only words from the list and the focus words: {' and '.join(focus_words)}.",
+              "cache_control": {"type": "ephemeral"}
+        }]}
+      ]
+
+# record the invalid words and append the corrective message for the next attempt to messages
+def add_retry_message(result: ValidationResult, focus_words: list[str], messages: list[dict]) -> None:
+    if result.reason == "words not on word_list found":
+        with open('invalid_word_counts.json', 'r+') as f:
+          counts = json.loads(f.read() or '{}')
+          counts.update({invalid_word.full_svp_word if invalid_word.is_svp else invalid_word.token: counts.get(invalid_word.full_svp_word if invalid_word.full_svp_word else invalid_word.token, 0) + 1 for invalid_word in result.invalid_words})
+          f.seek(0); json.dump(counts, f, indent=2); f.truncate()
+        add_svp_message = any(invalid_word.is_svp for invalid_word in result.invalid_words)
+        messages.append({"role": "user", "content": f"Unfortunately, you used: {', '.join([invalid_word.full_svp_word if invalid_word.full_svp_word else invalid_word.token for invalid_word in result.invalid_words])} which are not on the list. {'If the word you were assigned is also a separable prefix, make sure to use it in a context that it is not a separable prefix.' if add_svp_message else ''} "})
+    elif result.reason == "focus_words missing":
+      messages.append({"role": "user", "content": f"Unfortunately, the focus words are missing. Make sure to use {' and '.join(focus_words)} in the response!"})
+    elif result.reason == "answer missing":
+      messages.append({"role": "user", "content": "Unfortunately, your reply has no <answer>. Make sure to always reply in the XML format."})
+    else:
+      raise Exception(f"An unaccounted for reason occurred: {result.reason}")
+
+
 def generate_with_retries(word_list, focus_words: list[str], max_tries=5, attempts=0, messages=None) -> MessageData:
   print(f"[red]Attempt #{attempts} to generate valid sentence...[/red]")
   
@@ -332,78 +477,214 @@ def generate_with_retries(word_list, focus_words: list[str], max_tries=5, attemp
     raise Exception(f"Failed to generate valid sentence after {max_tries} attempts")
 
   if messages is None:
-    messages = [
-            {"role": "user", 
-             "content": [{
-                "type": "text",
-                "text": f"Generate a sentence using only words from the list and the focus words: {' and '.join(focus_words)}.",
-                "cache_control": {"type": "ephemeral"}
-          }]}
-        ]
+    messages = create_initial_messages(focus_words)
     
-  print("messages to claude: ")
+  print(f"messages to {sentence_generator.name}: ")
   print(messages)
-  message_block = anthropic.Anthropic(api_key=CLAUDE_API_KEY).beta.prompt_caching.messages.create(
-      model="claude-3-5-sonnet-20241022", 
-      max_tokens=1024,
-      temperature=1,
-      system=[{
-        "text": create_system_prompt(focus_word=focus_words, word_list=word_list),
-        "type": "text",
-        "cache_control": {"type": "ephemeral"}
-        }],
-      messages=messages,
-      extra_headers={"anthropic-beta": "prompt-caching-2024-07-31"}
-  )
-  
-#   print(message_block)
-  
-  # handle edge case
-  if len(message_block.content) == 0:
-    raise Exception(f"message_block has no content. See: {message_block}")
-    # print("[red] message_block.content is None. see:  [/red]")
-    # print(message_block)
-    # return generate_with_retries(word_list=word_list, focus_word=focus_word, attempts=attempts+1, messages=messages)
-  
-  preprocessed_message = message_block.content[0].text
+  preprocessed_message = sentence_generator.generate(word_list, focus_words, messages)
   
   messages.append({"role": "assistant", "content": preprocessed_message})
-  
-  # print("pre-processed message:\n")
-  # print(preprocessed_message)
-  
-
 
   result = process_and_validate_message(preprocessed_message, focus_words, word_list)
   
   if result.is_valid:
     return result.messageData
   else:
-    if result.reason == "words not on word_list found":
-        with open('invalid_word_counts.json', 'r+') as f:
-          counts = json.loads(f.read() or '{}')
-          counts.update({invalid_word.full_svp_word if invalid_word.is_svp else invalid_word.token: counts.get(invalid_word.full_svp_word if invalid_word.full_svp_word else invalid_word.token, 0) + 1 for invalid_word in result.invalid_words})
-          f.seek(0); json.dump(counts, f, indent=2); f.truncate()
-        add_svp_message = any(invalid_word.is_svp for invalid_word in result.invalid_words)
-        messages.append({"role": "user", "content": f"Unfortunately, you used: {', '.join([invalid_word.full_svp_word if invalid_word.full_svp_word else invalid_word.token for invalid_word in result.invalid_words])} which are not on the list. {'If the word you were assigned is also a separable prefix, make sure to use it in a context that it is not a separable prefix.' if add_svp_message else ''} "})
-    elif result.reason == "focus_words missing":
-      messages.append({"role": "user", "content": f"Unfortunately, the focus words are missing. Make sure to use {' and '.join(focus_words)} in the response!"})
-    else:
-      raise Exception(f"An unaccounted for reason occurred: {result.reason}")
-    
+    add_retry_message(result, focus_words, messages)
     return generate_with_retries(word_list=word_list, focus_words=focus_words, attempts=attempts+1, messages=messages)
 
+
+# Watches a streamed reply and returns the first word of the <answer> that a
+# LexicalChecker rejects. Focus words can only be checked once the whole answer is in,
+# so that stays with the full validation.
+class AnswerStreamChecker:
+  def __init__(self, word_list: list[str]):
+    self.lexical = lexical_checker(word_list)
+    self.text = ""
+    self._checked = 0
+
+  def _answer(self) -> Optional[str]:
+    start = self.text.find("<answer>")
+    if start == -1:
+      return None
+    answer = self.text[start + len("<answer>"):]
+    end = answer.find("</answer>")
+    return answer if end == -1 else answer[:end]
+
+  @property
+  def answer_complete(self) -> bool:
+    start = self.text.find("<answer>")
+    return start != -1 and self.text.find("</answer>", start) != -1
+
+  # add the next chunk of the reply, returns the first word that can't be valid, if any
+  def feed(self, chunk: str) -> Optional[TokenInfo]:
+    self.text += chunk
+    answer = self._answer()
+    if answer is None:
+      return None
+    complete = self.answer_complete
+    for match in re.finditer(r"\S+", answer[self._checked:]):
+      start, end = self._checked + match.start(), self._checked + match.end()
+      # the last word may still be growing
+      if end == len(answer) and not complete:
+        break
+      invalid_word = self.lexical.check(match.group(), start)
+      if invalid_word is not None:
+        return invalid_word
+      self._checked = end
+    return None
+
+streaming_stats = {"streams": 0, "stopped_early": 0, "stopped_at_answer_end": 0}
+
+# streams one reply through an AnswerStreamChecker, returns the reply (cut short if a
+# word couldn't be valid) and that word
+async def stream_until_invalid(word_list, focus_words: list[str], messages: list[dict]) -> tuple[str, Optional[TokenInfo]]:
+  checker = AnswerStreamChecker(word_list)
+  stream = sentence_generator.astream(word_list, focus_words, messages)
+  streaming_stats["streams"] += 1
+  try:
+    async for chunk in stream:
+      invalid_word = checker.feed(chunk)
+      if invalid_word is not None:
+        streaming_stats["stopped_early"] += 1
+        return checker.text, invalid_word
+      # nothing after </answer> is used
+      if checker.answer_complete:
+        streaming_stats["stopped_at_answer_end"] += 1
+        break
+  finally:
+    # closing the stream cancels the request
+    await stream.aclose()
+  return checker.text, None
+
+# one generator call plus validation, appends the reply to messages
+async def generate_attempt(word_list, focus_words: list[str], messages: list[dict]) -> ValidationResult:
+  loop = asyncio.get_running_loop()
+  if STREAM_GENERATION:
+    preprocessed_message, invalid_word = await stream_until_invalid(word_list, focus_words, messages)
+    messages.append({"role": "assistant", "content": preprocessed_message})
+    if invalid_word is not None:
+      print(f"[red]Stopped the reply at {invalid_word.token}, which is not on the list[/red]")
+      return ValidationResult(is_valid=False, reason="words not on word_list found", invalid_words=[invalid_word])
+  else:
+    preprocessed_message = await sentence_generator.agenerate(word_list, focus_words, messages)
+    messages.append({"role": "assistant", "content": preprocessed_message})
+  return await loop.run_in_executor(nlp_executor, process_and_validate_message, preprocessed_message, focus_words, word_list)
+
+
+# Same as generate_with_retries, but never blocks the event loop: the LLM call goes
+# through the generator's async path, and spaCy plus the file writes run on nlp_executor.
+async def generate_with_retries_async(word_list, focus_words: list[str], max_tries=5, messages=None) -> MessageData:
+  loop = asyncio.get_running_loop()
+  if messages is None:
+    messages = create_initial_messages(focus_words)
+
+  for attempts in range(max_tries):
+    print(f"[red]Attempt #{attempts} to generate valid sentence...[/red]")
+    result = await generate_attempt(word_list, focus_words, messages)
+    if result.is_valid:
+      return result.messageData
+    await loop.run_in_executor(nlp_executor, add_retry_message, result, focus_words, messages)
+
+  raise Exception(f"Failed to generate valid sentence after {max_tries} attempts")
+
+
+# Sends SPECULATIVE_CANDIDATES independent requests for the same focus words at once
+# and validates each one as soon as it arrives. The first valid sentence wins and
+# the other requests are cancelled. If every candidate fails, the first failed
+# conversation continues with the usual corrective retries (unless
+# SPECULATIVE_FALLBACK is off). No more than MAX_LLM_CALLS_PER_SENTENCE requests
+# are made in total.
+async def generate_speculatively(word_list, focus_words: list[str], candidates=SPECULATIVE_CANDIDATES, max_calls=MAX_LLM_CALLS_PER_SENTENCE, fallback=SPECULATIVE_FALLBACK) -> MessageData:
+  loop = asyncio.get_running_loop()
+  candidates = max(1, min(candidates, max_calls))
+
+  async def generate_candidate() -> tuple[ValidationResult, list[dict]]:
+    messages = create_initial_messages(focus_words)
+    result = await generate_attempt(word_list, focus_words, messages)
+    return result, messages
+
+  print(f"[red]Generating {candidates} candidate sentences at once...[/red]")
+  tasks = [asyncio.create_task(generate_candidate()) for _ in range(candidates)]
+  first_failure = None
+  try:
+    for next_candidate in asyncio.as_completed(tasks):
+      try:
+        result, messages = await next_candidate
+      except Exception as e:
+        print(f"[red]Candidate request failed: {e}[/red]")
+        continue
+      if result.is_valid:
+        return result.messageData
+      if first_failure is None:
+        first_failure = (result, messages)
+  finally:
+    # the first valid candidate won, the rest are not needed anymore
+    for task in tasks:
+      task.cancel()
+
+  remaining_calls = max_calls - candidates
+  if first_failure is None:
+    raise Exception(f"All {candidates} candidate requests failed")
+  if not fallback or remaining_calls <= 0:
+    raise Exception(f"Failed to generate valid sentence with {candidates} candidates")
+
+  result, messages = first_failure
+  await loop.run_in_executor(nlp_executor, add_retry_message, result, focus_words, messages)
+  return await generate_with_retries_async(word_list, focus_words, max_tries=remaining_calls, messages=messages)
+
+
+# a previously validated sentence with these focus words that only uses allowed words, if there is one
+def find_banked_sentence(focus_words: list[str], word_list: list[str]) -> Optional[MessageData]:
+    banked = sentence_bank.find(focus_words, set(word_list))
+    if banked is None:
+        return None
+    sentence_id, message_data = banked
+    sentence_bank.mark_served(sentence_id)
+    print("[blue]reusing stored sentence: [/blue]")
+    print(message_data["message"])
+    return MessageData(**message_data)
+
+def store_generated_sentence(messageData: MessageData) -> None:
+    sentence_id = sentence_bank.add(messageData.model_dump())
+    sentence_bank.mark_served(sentence_id)
+
 def generate_sentence():
     # Load data
     focus_words = get_focus_words()
     word_list = load_allowed_word_list()
     word_list.extend(focus_words)
     print(focus_words)
+
+    # only ask the LLM when no stored sentence fits
+    banked = find_banked_sentence(focus_words, word_list)
+    if banked is not None:
+        return banked
     
-    # Generate sentence using OpenAI
     messageData = generate_with_retries(word_list, focus_words)
     print("[blue]final message: [/blue]")
     print(messageData.message)
+    store_generated_sentence(messageData)
+    return messageData
+
+async def generate_sentence_async(focus_words: Optional[list[str]] = None):
+    if focus_words is None:
+        focus_words = get_focus_words()
+    word_list = load_allowed_word_list()
+    word_list.extend(focus_words)
+    print(focus_words)
+
+    banked = find_banked_sentence(focus_words, word_list)
+    if banked is not None:
+        return banked
+
+    if SPECULATIVE_CANDIDATES > 1:
+        messageData = await generate_speculatively(word_list, focus_words)
+    else:
+        messageData = await generate_with_retries_async(word_list, focus_words, max_tries=MAX_LLM_CALLS_PER_SENTENCE)
+    print("[blue]final message: [/blue]")
+    print(messageData.message)
+    await asyncio.get_running_loop().run_in_executor(nlp_executor, store_generated_sentence, messageData)
     return messageData
 
 if __name__ == "__main__":
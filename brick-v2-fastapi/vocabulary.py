@@ -0,0 +1,121 @@
+import threading
+from itertools import chain
+from typing import Iterable, Iterator, Optional
+import numpy as np
+from root_index import RootIndex, root_index
+
+# A set of allowed words stored as a NumPy bool mask over the root index's word ids,
+# so checking whether a token has an allowed root is an array lookup instead of a
+# scan through a list of thousands of words. It also keeps the words in order, and
+# supports iteration, len(), `in` and extend(), so it can go anywhere the plain word
+# list went (the prompt, the sentence bank, the local generator).
+#
+# allowed_vocabulary is the learner's vocabulary, the first words of the full word
+# list. It grows incrementally as the learner gets more cards, load_allowed_word_list
+# hands out copies that the focus words are added to.
+#
+# It also keeps the proper prefixes and suffixes of its words, for the LexicalChecker:
+# a detached particle ("auf" of "aufstehen") is a prefix of an allowed word, and the verb
+# left behind ("stehe", lemma "stehen") has a root that is a suffix of one.
+
+
+class Vocabulary:
+    def __init__(self, words: Iterable[str] = (), index: RootIndex = root_index):
+        self.index = index
+        self.words: list[str] = []
+        self.mask = np.zeros(len(index.root_names), dtype=bool)
+        self.particle_prefixes: set[str] = set()
+        self.verb_suffixes: set[str] = set()
+        self.extend(words)
+
+    def _fit(self) -> None:
+        # words interned after the mask was made have ids past its end
+        if len(self.mask) < len(self.index.root_names):
+            self.mask = np.concatenate([self.mask, np.zeros(len(self.index.root_names) - len(self.mask), dtype=bool)])
+
+    def extend(self, words: Iterable[str]) -> None:
+        words = list(words)
+        ids = [self.index.intern(word) for word in words]
+        self._fit()
+        self.mask[ids] = True
+        self.words.extend(words)
+        for word in words:
+            self.particle_prefixes.update(word[:i] for i in range(1, len(word)))
+            self.verb_suffixes.update(word[i:] for i in range(1, len(word)))
+
+    def append(self, word: str) -> None:
+        self.extend([word])
+
+    def copy(self) -> "Vocabulary":
+        vocabulary = Vocabulary(index=self.index)
+        vocabulary.words = list(self.words)
+        vocabulary.mask = self.mask.copy()
+        vocabulary.particle_prefixes = set(self.particle_prefixes)
+        vocabulary.verb_suffixes = set(self.verb_suffixes)
+        return vocabulary
+
+    def __contains__(self, word: object) -> bool:
+        word_id = self.index.root_id(word) if isinstance(word, str) else None
+        return word_id is not None and word_id < len(self.mask) and bool(self.mask[word_id])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.words)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __getitem__(self, i):
+        return self.words[i]
+
+    # for each token's root words, whether any of them is allowed
+    def allows_any(self, root_words_per_token: list[list[str]]) -> np.ndarray:
+        self._fit()
+        ids_per_token = [[word_id for word_id in map(self.index.root_id, root_words) if word_id is not None] for root_words in root_words_per_token]
+        counts = np.fromiter(map(len, ids_per_token), dtype=np.int64, count=len(ids_per_token))
+        allowed = np.zeros(len(ids_per_token), dtype=bool)
+        if counts.sum() == 0:
+            return allowed
+        flat_ids = np.fromiter(chain.from_iterable(ids_per_token), dtype=np.int64, count=int(counts.sum()))
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        has_ids = counts > 0
+        # any() over each token's slice of the flat array
+        allowed[has_ids] = np.logical_or.reduceat(self.mask[flat_ids], starts[has_ids])
+        return allowed
+
+    # for each token's parts (see RootIndex.token_parts), whether every part has an allowed root
+    def allows_every_part(self, parts_per_token: list[list[list[str]]]) -> np.ndarray:
+        counts = np.fromiter(map(len, parts_per_token), dtype=np.int64, count=len(parts_per_token))
+        allowed_parts = self.allows_any([part for parts in parts_per_token for part in parts])
+        allowed = np.zeros(len(parts_per_token), dtype=bool)
+        has_parts = counts > 0
+        if not has_parts.any():
+            return allowed
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        # all() over each token's slice of the parts
+        allowed[has_parts] = np.logical_and.reduceat(allowed_parts, starts[has_parts])
+        return allowed
+
+
+# the learner's allowed words, a prefix of a fixed word list that only ever grows
+class AllowedVocabulary:
+    def __init__(self, word_list: list[str], index: RootIndex = root_index):
+        self.word_list = word_list
+        self.index = index
+        self._vocabulary = Vocabulary(index=index)
+        self._lock = threading.Lock()
+
+    # the first size words of the word list, as a copy the caller can extend
+    def first(self, size: int) -> Vocabulary:
+        with self._lock:
+            current = len(self._vocabulary)
+            if size < current:
+                self._vocabulary = Vocabulary(self.word_list[:size], index=self.index)
+            elif size > current:
+                self._vocabulary.extend(self.word_list[current:size])
+            return self._vocabulary.copy()
+
+
+def as_vocabulary(word_list: Iterable[str], index: Optional[RootIndex] = None) -> Vocabulary:
+    if isinstance(word_list, Vocabulary):
+        return word_list
+    return Vocabulary(word_list, index=index or root_index)
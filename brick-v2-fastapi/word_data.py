@@ -0,0 +1,44 @@
+import json
+from typing import NamedTuple, Optional
+from compiled_data import load_compiled
+
+# The word data file (~800 KB of JSON), reduced to the parts the app uses and cached
+# with compiled_data. Light on purpose: cards.py needs the word list without pulling
+# in spaCy and the generation pipeline through sentences.py.
+
+WORD_DATA_FILE = '5009_word_and_scraped_cd.json'
+
+
+class WordData(NamedTuple):
+    # in list order, the few duplicates included
+    words: list[str]
+    # the first entry of a word wins
+    pos: dict[str, str]
+    versions: dict[str, list[str]]
+
+
+def build_word_data(data: bytes) -> WordData:
+    words: list[str] = []
+    pos: dict[str, str] = {}
+    versions: dict[str, list[str]] = {}
+    for word_obj in json.loads(data):
+        words.append(word_obj['word'])
+        pos.setdefault(word_obj['word'], word_obj['pos'])
+        versions.setdefault(word_obj['word'], word_obj['versions'] or [word_obj['word']])
+    return WordData(words, pos, versions)
+
+
+_word_data: Optional[WordData] = None
+
+
+def load_word_data(path: str = WORD_DATA_FILE, rebuild: bool = False) -> WordData:
+    global _word_data
+    if path != WORD_DATA_FILE or rebuild:
+        return load_compiled("word_data", path, build_word_data, key=path, rebuild=rebuild)
+    if _word_data is None:
+        _word_data = load_compiled("word_data", path, build_word_data, key=path)
+    return _word_data
+
+
+def load_full_word_list() -> list[str]:
+    return list(load_word_data().words)